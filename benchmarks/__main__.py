@@ -0,0 +1,57 @@
+import argparse
+import json
+import sys
+
+from benchmarks import harness
+from benchmarks.suite import BenchmarkEnvironment
+
+
+def main(argv: list = None) -> int:
+    """
+    Runs the benchmark suite offline, against a stub of the TDX API, and writes the results as JSON.
+
+    :param argv: command line arguments (Default: sys.argv)
+
+    :return: exit status: 1 if --compare found a regression, otherwise 0
+
+    :rtype: int
+
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmark tdxlib's hot paths offline.")
+    parser.add_argument('names', nargs='*', help="run only benchmarks whose names contain one of these")
+    parser.add_argument('--output', '-o', help="file to write the JSON results to (Default: standard output)")
+    parser.add_argument('--scale', type=float, default=1, help="how much synthetic data to generate (Default: 1)")
+    parser.add_argument('--repeat', type=int, default=5, help="how many times to time each benchmark (Default: 5)")
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help="shortest time, in seconds, to time each repeat for (Default: 0.2)")
+    parser.add_argument('--compare', help="JSON results of an earlier run to check for regressions against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="slowdown, as a fraction, that counts as a regression (Default: 0.1)")
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for entry in harness.BENCHMARKS:
+            print(f"{entry['group']:12} {entry['name']}")
+        return 0
+
+    environment = BenchmarkEnvironment(scale=args.scale)
+    try:
+        results = harness.run(environment, args.names, args.repeat, args.min_time,
+                              log=lambda line: print(line, file=sys.stderr))
+    finally:
+        environment.close()
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline:
+            results['comparison'] = harness.compare(results, json.load(baseline), args.threshold)
+        regressions = [entry for entry in results['comparison'] if entry['regression']]
+        for entry in regressions:
+            print(f"Regression: {entry['name']} is {entry['ratio']:.2f}x slower than the baseline", file=sys.stderr)
+    harness.write(results, args.output)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
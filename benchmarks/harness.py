@@ -0,0 +1,153 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import tdxlib
+
+# Benchmarks registered with @benchmark, in the order they were defined
+BENCHMARKS = []
+
+
+def benchmark(name: str, group: str):
+    """
+    Registers a benchmark. The decorated function takes a BenchmarkEnvironment and returns a tuple of a function
+    to time (called with no arguments) and how many operations each call of it does, so results can be reported
+    per operation (for example per ticket, for a benchmark that imports 100 tickets per call).
+
+    :param name: name of the benchmark, unique within the suite
+    :param group: what the benchmark measures, for grouping results (such as 'requests' or 'lookups')
+
+    :return: the decorator
+
+    """
+    def register(function):
+        BENCHMARKS.append({'name': name, 'group': group, 'setup': function})
+        return function
+    return register
+
+
+def time_benchmark(function, operations: int = 1, repeat: int = 5, min_time: float = 0.2) -> dict:
+    """
+    Times a function. It's first called repeatedly to find how many calls take at least min_time, and then that
+    many calls are timed, repeat times over.
+
+    :param function: the function to time, called with no arguments
+    :param operations: how many operations each call does (Default: 1)
+    :param repeat: how many times to time the calls (Default: 5)
+    :param min_time: shortest time, in seconds, to time calls for in each repeat (Default: 0.2)
+
+    :return: dict of timings per operation, in seconds (min, median, mean and stdev), operations per second (from
+             the median), and how many calls and operations were timed in each repeat
+
+    :rtype: dict
+
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / (number * operations))
+    median = statistics.median(timings)
+    return {
+        'calls': number,
+        'operations': number * operations,
+        'min': min(timings),
+        'median': median,
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'ops_per_sec': 1 / median if median else None
+    }
+
+
+def run(environment, names: list = None, repeat: int = 5, min_time: float = 0.2, log=None) -> dict:
+    """
+    Runs the registered benchmarks.
+
+    :param environment: the BenchmarkEnvironment to run them in
+    :param names: run only benchmarks whose names contain one of these (Default: all of them)
+    :param repeat: how many times to time each benchmark (Default: 5)
+    :param min_time: shortest time, in seconds, to time each repeat for (Default: 0.2)
+    :param log: function to call with a line of progress for each benchmark (Default: None)
+
+    :return: dict of the results and the environment they were measured in, ready to be written as JSON
+
+    :rtype: dict
+
+    """
+    results = []
+    for entry in BENCHMARKS:
+        if names and not any(name in entry['name'] for name in names):
+            continue
+        function, operations = entry['setup'](environment)
+        result = dict({'name': entry['name'], 'group': entry['group']},
+                      **time_benchmark(function, operations, repeat, min_time))
+        results.append(result)
+        if log:
+            log(f"{entry['name']:45} {result['median'] * 1e6:12.1f} us/op  {result['ops_per_sec']:12.1f} ops/s")
+    return {
+        'tdxlib_version': tdxlib.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'scale': environment.scale,
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> list:
+    """
+    Compares results with a baseline from an earlier run, such as the results from the last release.
+
+    :param results: results from run()
+    :param baseline: earlier results from run(), loaded from JSON
+    :param threshold: how much slower (as a fraction of the baseline) a benchmark must be to count as a
+                      regression (Default: 0.1, 10% slower)
+
+    :return: list of dicts of the name, baseline and current median time per operation, their ratio, and whether
+             it's a regression, for benchmarks in both
+
+    :rtype: list
+
+    """
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    comparison = []
+    for result in results['results']:
+        if result['name'] not in previous:
+            continue
+        before = previous[result['name']]['median']
+        ratio = result['median'] / before if before else None
+        comparison.append({'name': result['name'], 'baseline': before, 'current': result['median'], 'ratio': ratio,
+                           'regression': ratio is not None and ratio > 1 + threshold})
+    return comparison
+
+
+def write(results: dict, path: str = None):
+    """
+    Writes results as JSON.
+
+    :param results: results from run()
+    :param path: file to write them to (Default: standard output)
+
+    """
+    text = json.dumps(results, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
@@ -0,0 +1,267 @@
+import asyncio
+
+import tdxlib.tdx_asset_integration
+import tdxlib.tdx_async_asset_integration
+import tdxlib.tdx_async_integration
+import tdxlib.tdx_async_ticket_integration
+import tdxlib.tdx_client_portal_integration
+import tdxlib.tdx_integration
+import tdxlib.tdx_replay
+import tdxlib.tdx_report_integration
+import tdxlib.tdx_stub_server
+import tdxlib.tdx_ticket
+import tdxlib.tdx_ticket_integration
+from benchmarks.harness import benchmark
+
+
+class CannedTransport:
+    """Answers every request with the same small JSON response, so only tdxlib's own overhead is measured."""
+
+    def __init__(self):
+        self.response = tdxlib.tdx_replay.build_response('', 200, b'{"ID": 1000001, "Title": "Canned"}',
+                                                         {'Content-Type': 'application/json'})
+
+    def request(self, method, url, **kwargs):
+        return self.response
+
+    def close(self):
+        pass
+
+
+class BenchmarkEnvironment:
+    """
+    Everything the benchmarks run against: synthetic TDX data from a stub server, and integrations that talk to it.
+    Integrations are answered in-process (with a TDXStubTransport), except in the cold-start benchmarks, which
+    connect to the stub over the loopback interface the way they would to TDX.
+    """
+
+    def __init__(self, scale: float = 1, seed: int = 0):
+        """
+        :param scale: how much synthetic data to generate, see TDXStubData (Default: 1)
+        :param seed: seed for the synthetic data (Default: 0)
+
+        """
+        self.scale = scale
+        self.stub = tdxlib.tdx_stub_server.TDXStubServer(scale=scale, seed=seed, rate_limit=0)
+        self.server = None
+        self._integrations = []
+        self._classes = dict()
+
+    def config(self, **overrides) -> dict:
+        return self.stub.config(**dict({'log_level': 'CRITICAL'}, **overrides))
+
+    def integration(self, cls, **config):
+        """
+        Builds an integration whose requests are answered in-process by the stub.
+
+        :param cls: the integration class, such as TDXTicketIntegration
+        :param config: config values to set, on top of the stub's
+
+        :return: the integration
+
+        """
+        if cls not in self._classes:
+            stub = self.stub
+
+            class Offline(cls):
+                def setup_transport(self):
+                    return tdxlib.tdx_stub_server.TDXStubTransport(stub)
+
+            Offline.__name__ = cls.__name__
+            self._classes[cls] = Offline
+        integration = self._classes[cls](config=self.config(**config))
+        self._integrations.append(integration)
+        return integration
+
+    def served_config(self, **overrides) -> dict:
+        """
+        Builds a config for an integration that connects to the stub over the network, starting it if needed.
+
+        :param overrides: config values to set, on top of the stub's
+
+        :return: the config
+
+        :rtype: dict
+
+        """
+        if self.server is None:
+            self.server = tdxlib.tdx_stub_server.TDXStubServer(scale=self.scale, rate_limit=0).start()
+        return self.server.config(**dict({'log_level': 'CRITICAL'}, **overrides))
+
+    def close(self):
+        for integration in self._integrations:
+            integration.close()
+        if self.server:
+            self.server.stop()
+
+
+# #### REQUESTS #### #
+
+@benchmark('make_get', 'requests')
+def bench_make_get(env):
+    tdx = env.integration(tdxlib.tdx_integration.TDXIntegration)
+    tdx.transport = CannedTransport()
+    return lambda: tdx.make_get('/12/tickets/1000001'), 1
+
+
+@benchmark('make_post', 'requests')
+def bench_make_post(env):
+    tdx = env.integration(tdxlib.tdx_integration.TDXIntegration)
+    tdx.transport = CannedTransport()
+    body = {'SearchText': 'printer', 'MaxResults': 25, 'StatusIDs': [4001, 4002, 4003]}
+    return lambda: tdx.make_post('/12/tickets/search', body), 1
+
+
+# #### TICKETS #### #
+
+def _ticket_data(env, count: int = 100) -> list:
+    return list(env.stub.data.tickets.values())[:count]
+
+
+@benchmark('ticket.import_data', 'tickets')
+def bench_ticket_import(env):
+    tdx = env.integration(tdxlib.tdx_ticket_integration.TDXTicketIntegration)
+    data = _ticket_data(env)
+    ticket = tdxlib.tdx_ticket.TDXTicket(tdx, data[0])
+
+    def run():
+        for ticket_data in data:
+            ticket.import_data(ticket_data)
+    return run, len(data)
+
+
+@benchmark('ticket.export', 'tickets')
+def bench_ticket_export(env):
+    tdx = env.integration(tdxlib.tdx_ticket_integration.TDXTicketIntegration)
+    tickets = [tdxlib.tdx_ticket.TDXTicket(tdx, ticket_data) for ticket_data in _ticket_data(env)]
+
+    def run():
+        for ticket in tickets:
+            ticket.export()
+    return run, len(tickets)
+
+
+@benchmark('ticket.validate', 'tickets')
+def bench_ticket_validate(env):
+    tdx = env.integration(tdxlib.tdx_ticket_integration.TDXTicketIntegration)
+    tickets = [tdxlib.tdx_ticket.TDXTicket(tdx, ticket_data) for ticket_data in _ticket_data(env)]
+
+    def run():
+        for ticket in tickets:
+            ticket.validate()
+    return run, len(tickets)
+
+
+@benchmark('search_tickets', 'tickets')
+def bench_search_tickets(env):
+    tdx = env.integration(tdxlib.tdx_ticket_integration.TDXTicketIntegration)
+    max_results = len(env.stub.data.tickets)
+    found = len(tdx.search_tickets('', max_results=max_results, closed=True, cancelled=True))
+    return lambda: tdx.search_tickets('', max_results=max_results, closed=True, cancelled=True), found
+
+
+@benchmark('edit_tickets', 'tickets')
+def bench_edit_tickets(env):
+    tdx = env.integration(tdxlib.tdx_ticket_integration.TDXTicketIntegration)
+    ticket_ids = [ticket['ID'] for ticket in _ticket_data(env, 20)]
+    return lambda: tdx.edit_tickets(ticket_ids, {'Title': 'Edited by benchmark'}), len(ticket_ids)
+
+
+# #### ASSETS #### #
+
+@benchmark('search_assets.full_record', 'assets')
+def bench_search_assets_full_record(env):
+    tdx = env.integration(tdxlib.tdx_asset_integration.TDXAssetIntegration, caching=True)
+    found = len(tdx.search_assets('', max_results=50, full_record=True))
+    return lambda: tdx.search_assets('', max_results=50, full_record=True), found
+
+
+@benchmark('update_assets', 'assets')
+def bench_update_assets(env):
+    tdx = env.integration(tdxlib.tdx_asset_integration.TDXAssetIntegration, caching=True)
+    asset_ids = list(env.stub.data.assets)[:20]
+    return lambda: tdx.update_assets(asset_ids, {'Name': 'Updated by benchmark'}), len(asset_ids)
+
+
+# #### NAME LOOKUPS #### #
+
+@benchmark('get_product_model_by_name_id', 'lookups')
+def bench_product_model_lookup(env):
+    tdx = env.integration(tdxlib.tdx_asset_integration.TDXAssetIntegration, caching=True)
+    name = env.stub.data.product_models[-1]['Name']
+    tdx.get_product_model_by_name_id(name)
+    return lambda: tdx.get_product_model_by_name_id(name), 1
+
+
+@benchmark('get_product_model_by_name_id.uncached', 'lookups')
+def bench_product_model_lookup_uncached(env):
+    tdx = env.integration(tdxlib.tdx_asset_integration.TDXAssetIntegration, caching=False)
+    name = env.stub.data.product_models[-1]['Name']
+    return lambda: tdx.get_product_model_by_name_id(name), 1
+
+
+@benchmark('get_vendor_by_name_id', 'lookups')
+def bench_vendor_lookup(env):
+    tdx = env.integration(tdxlib.tdx_asset_integration.TDXAssetIntegration, caching=True)
+    name = env.stub.data.vendors[-1]['Name']
+    tdx.get_vendor_by_name_id(name)
+    return lambda: tdx.get_vendor_by_name_id(name), 1
+
+
+@benchmark('get_asset_status_by_name_id', 'lookups')
+def bench_asset_status_lookup(env):
+    tdx = env.integration(tdxlib.tdx_asset_integration.TDXAssetIntegration, caching=True)
+    tdx.get_asset_status_by_name_id('Disposed')
+    return lambda: tdx.get_asset_status_by_name_id('Disposed'), 1
+
+
+@benchmark('get_ticket_type_by_name_id', 'lookups')
+def bench_ticket_type_lookup(env):
+    tdx = env.integration(tdxlib.tdx_ticket_integration.TDXTicketIntegration, caching=True)
+    tdx.get_ticket_type_by_name_id('Problem')
+    return lambda: tdx.get_ticket_type_by_name_id('Problem'), 1
+
+
+@benchmark('get_account_by_name', 'lookups')
+def bench_account_lookup(env):
+    tdx = env.integration(tdxlib.tdx_integration.TDXIntegration, caching=True)
+    name = env.stub.data.accounts[-1]['Name']
+    tdx.get_account_by_name(name)
+    return lambda: tdx.get_account_by_name(name), 1
+
+
+@benchmark('get_person_by_name_email', 'lookups')
+def bench_person_lookup(env):
+    tdx = env.integration(tdxlib.tdx_integration.TDXIntegration, caching=True)
+    email = env.stub.data.people[-1]['PrimaryEmail']
+    tdx.get_person_by_name_email(email)
+    return lambda: tdx.get_person_by_name_email(email), 1
+
+
+# #### COLD STARTS #### #
+
+def _cold_start(env, cls):
+    def run():
+        cls(config=env.served_config(caching=True)).close()
+    return run, 1
+
+
+def _async_cold_start(env, cls):
+    async def start():
+        tdx = cls(config=env.served_config(caching=True))
+        await tdx.auth(use_cache=False)
+        await tdx.close()
+    return lambda: asyncio.run(start()), 1
+
+
+for _cls in (tdxlib.tdx_integration.TDXIntegration, tdxlib.tdx_ticket_integration.TDXTicketIntegration,
+             tdxlib.tdx_asset_integration.TDXAssetIntegration,
+             tdxlib.tdx_client_portal_integration.TDXClientPortalIntegration,
+             tdxlib.tdx_report_integration.TDXReportIntegration):
+    benchmark(f'cold_start.{_cls.__name__}', 'cold_start')(lambda env, cls=_cls: _cold_start(env, cls))
+
+if tdxlib.tdx_async_integration.httpx is not None:
+    for _cls in (tdxlib.tdx_async_integration.TDXAsyncIntegration,
+                 tdxlib.tdx_async_ticket_integration.TDXAsyncTicketIntegration,
+                 tdxlib.tdx_async_asset_integration.TDXAsyncAssetIntegration):
+        benchmark(f'cold_start.{_cls.__name__}', 'cold_start')(lambda env, cls=_cls: _async_cold_start(env, cls))
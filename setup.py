@@ -15,5 +15,7 @@ setup(
     long_description_content_type='text/markdown',
     long_description=outer_long_description,
     install_requires=['python-dateutil','requests', 'PYjwt', 'typing-extensions'],
-    python_requires='>=3.6'
+    extras_require={'async': ['httpx'], 'fast-json': ['orjson'], 'http2': ['httpx[http2]'],
+                    'tracing': ['opentelemetry-api']},
+    python_requires='>=3.7'
 )
@@ -6,12 +6,17 @@ __all__ = [
     "tdx_api_exceptions",
     "tdx_utils",
     "tdx_constants",
-    "tdx_config"
+    "tdx_config",
+    "tdx_transport",
+    "tdx_async_integration",
+    "tdx_async_ticket_integration",
+    "tdx_async_asset_integration"
 ]
 
 import tdxlib.tdx_api_exceptions
 import tdxlib.tdx_constants
 import tdxlib.tdx_config
+import tdxlib.tdx_transport
 import tdxlib.tdx_integration
 import tdxlib.tdx_asset_integration
 import tdxlib.tdx_ticket_integration
@@ -20,6 +25,9 @@ import tdxlib.tdx_ticket
 import tdxlib.tdx_report_integration
 import tdxlib.tdx_report
 import tdxlib.tdx_utils
+import tdxlib.tdx_async_integration
+import tdxlib.tdx_async_ticket_integration
+import tdxlib.tdx_async_asset_integration
 
 
 __version__ = "0.6.0"
@@ -24,3 +24,7 @@ class TdxApiObjectTypeError(Exception):
 
 class TdxApiDuplicateError(Exception):
     pass
+
+
+class TdxApiCircuitOpenError(TdxApiHTTPError):
+    pass
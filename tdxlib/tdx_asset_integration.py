@@ -1,33 +1,43 @@
 import copy
 import datetime
+import tdxlib.tdx_cache
 import tdxlib.tdx_utils
 import tdxlib.tdx_integration
+import tdxlib.tdx_deadline
+import tdxlib.tdx_stream
+import tdxlib.tdx_tracing
 from typing import Union
 from tdxlib.tdx_api_exceptions import *
 
 
+@tdxlib.tdx_tracing.traced
 class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
-    def __init__(self, filename: str = None, skip_initial_auth: bool = False) -> None:
-        tdxlib.tdx_integration.TDXIntegration.__init__(self, filename, skip_initial_auth=skip_initial_auth)
+    def __init__(self, filename: str = None, config=None, skip_initial_auth: bool = False) -> None:
+        tdxlib.tdx_integration.TDXIntegration.__init__(self, filename, config, skip_initial_auth=skip_initial_auth)
         if self.config.asset_app_id is None:
             raise RuntimeError("Asset App Id is required. Check your configuration.")
-        self.clean_cache()
 
     def clean_cache(self) -> None:
         """
         Internal method to refresh the cache in a tdxlib object.
         """
         super().clean_cache()
-        if not self.config.caching:
-            return
-        self.cache['product_model'] = {}
-        self.cache['product_type'] = {}
-        self.cache['vendor'] = {}
-        self.cache['asset_form'] = {}
-        self.cache['asset_status'] = {}
-        self.cache['custom_attributes'] = self.get_all_asset_custom_attributes()
-        self.cache['custom_attributes'].append(self.get_all_custom_attributes(
-            tdxlib.tdx_integration.TDXIntegration.component_ids['configuration_item'], app_id=self.config.asset_app_id))
+        for region in ['product_model', 'product_type', 'vendor', 'asset_form', 'asset_status',
+                       'asset_custom_attributes']:
+            self.cache.add_region(region, whole_list=True, persist=str(self.config.asset_app_id))
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that adds the asset lookup tables to the reference data warm_cache() fetches.
+        """
+        return super()._reference_loaders() + [
+            ('asset_status', tdxlib.tdx_cache.ALL, self.get_all_asset_statuses),
+            ('asset_form', tdxlib.tdx_cache.ALL, self.get_all_asset_forms),
+            ('product_type', tdxlib.tdx_cache.ALL, self.get_all_product_types),
+            ('product_model', tdxlib.tdx_cache.ALL, self.get_all_product_models),
+            ('vendor', tdxlib.tdx_cache.ALL, self.get_all_vendors),
+            ('asset_custom_attributes', tdxlib.tdx_cache.ALL, self._get_asset_and_ci_custom_attributes)
+        ]
 
     def _make_asset_call(self, url: str, action: str, post_body: Union[dict, list] = None) -> Union[list, dict]:
         """
@@ -79,17 +89,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         :return: list of form data
 
         """
-        if not self.config.caching or not self.cache['asset_form']:
-            forms = self.get_all_asset_forms()
-            if self.config.caching:
-                self.cache['asset_form'] = forms
-        else:
-            forms = self.cache['asset_form']
-        for asset_form in forms:
-            if str(key).lower() in asset_form['Name'].lower():
-                return asset_form
-            if str(asset_form['ID']).lower() == str(key):
-                return asset_form
+        asset_form = self.cache.lookup('asset_form', self.get_all_asset_forms).find(key)
+        if asset_form:
+            return asset_form
         raise TdxApiObjectNotFoundError(
             "No asset form found for " + str(key))
 
@@ -111,15 +113,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         :return: dict of status data
 
         """
-        if not self.config.caching or not self.cache['asset_status']:
-            statuses = self.get_all_asset_statuses()
-            if self.config.caching:
-                self.cache['asset_status'] = statuses
-        else:
-            statuses = self.cache['asset_status']
-        for status in statuses:
-            if status['Name'].lower() == str(key).lower() or str(status['ID']) == str(key):
-                return status
+        status = self.cache.lookup('asset_status', self.get_all_asset_statuses).find(key, partial=False)
+        if status:
+            return status
         raise TdxApiObjectNotFoundError(f'No asset status found for {str(key)}')
 
     # TODO: def update_asset_status(self, updated_values)-> dict:
@@ -148,15 +144,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         :return: dict of product type data
 
         """
-        if not self.config.caching or not self.cache['product_type']:
-            types = self.get_all_product_types()
-            if self.config.caching:
-                self.cache['product_type'] = types
-        else:
-            types = self.cache['product_type']
-        for product_type in types:
-            if str(key).lower() == product_type['Name'].lower() or str(product_type['ID']) == str(key):
-                return product_type
+        product_type = self.cache.lookup('product_type', self.get_all_product_types).find(key, partial=False)
+        if product_type:
+            return product_type
         raise TdxApiObjectNotFoundError(f'No product type found for {str(key)}')
 
     def create_product_type(self, name: str, description: str = None, parent=None, order: int = 1,
@@ -182,7 +172,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
                 data['ParentID'] = parent
         if description:
             data['Description'] = description
-        return self.make_call('models/types', 'post', data)
+        created = self.make_call('models/types', 'post', data)
+        self.cache.invalidate('product_type')
+        return created
 
     def update_product_type(self, product_type: Union[str, dict], updated_values: dict) -> dict:
         """
@@ -204,7 +196,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
                 raise TdxApiObjectTypeError(f'Account attribute {i} is not editable')
         product_type.update(updated_values)
         product_type_id = product_type['ID']
-        return self.make_call(f'models/types/{product_type_id}', 'put', product_type)
+        updated = self.make_call(f'models/types/{product_type_id}', 'put', product_type)
+        self.cache.invalidate('product_type')
+        return updated
 
     def search_product_types(self, search_string: str = '*', active: bool = True, root_only: bool = False,
                              parent=None) -> list:
@@ -249,15 +243,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         :return: dict of model data
 
         """
-        if not self.config.caching or not self.cache['product_model']:
-            cache = self.get_all_product_models()
-            if self.config.caching:
-                self.cache['product_model'] = cache
-        else:
-            cache = self.cache['product_model']
-        for product_model in cache:
-            if str(key).lower() in product_model['Name'].lower() or str(product_model['ID']) == str(key):
-                return product_model
+        product_model = self.cache.lookup('product_model', self.get_all_product_models).find(key)
+        if product_model:
+            return product_model
         raise TdxApiObjectNotFoundError(f'No product model found for {str(key)}')
 
     def get_all_product_models_of_type(self, product_type: Union[str, dict]) -> list:
@@ -313,7 +301,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
             data['PartNumber'] = part_number
         if description:
             data['Description'] = description
-        return self.make_call('models', 'post', data)
+        created = self.make_call('models', 'post', data)
+        self.cache.invalidate('product_model')
+        return created
 
     # TODO: def update_product_model(self, updated_values)-> dict:
 
@@ -336,15 +326,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         :return: dict of vendor data
 
         """
-        if not self.config.caching or not self.cache['vendor']:
-            cache = self.get_all_vendors()
-            if self.config.caching:
-                self.cache['vendor'] = cache
-        else:
-            cache = self.cache['vendor']
-        for vendor in cache:
-            if str(key).lower() in vendor['Name'].lower() or str(vendor['ID']) == str(key):
-                return vendor
+        vendor = self.cache.lookup('vendor', self.get_all_vendors).find(key)
+        if vendor:
+            return vendor
         raise TdxApiObjectNotFoundError(f'No vendor found for {str(key)}')
 
     # TODO: def update_vendor(self, updated_values)-> dict:
@@ -376,7 +360,9 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
             data['AccountNumber'] = account_number
         if description:
             data['Description'] = description
-        return self.make_call('vendors', 'post', data)
+        created = self.make_call('vendors', 'post', data)
+        self.cache.invalidate('vendor')
+        return created
 
     # TODO: def delete_vendor(self)-> dict:
 
@@ -438,7 +424,8 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
             results.append(self.make_call(f'{asset_id}/users/{id_to_delete}', 'delete'))
 
     def search_assets(self, criteria: Union[str, dict], max_results=25, retired=False, disposed=False,
-                      full_record=False, all_statuses: bool = False) -> list:
+                      full_record=False, all_statuses: bool = False, deadline: float = None,
+                      stream: bool = False) -> list:
         """
         Searches for assets, based on criteria
 
@@ -459,47 +446,64 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         :param full_record: get full asset record (Default: False). Takes more time, but returns full asset record(s)
         :param all_statuses: gets assets, regardless of what their status is (default: False)
                (overridden if "StatusIDs" in criteria)
+        :param deadline: seconds to allow for the whole search. If full records are still being fetched when
+               it passes, only the records fetched so far are returned. (Default: no deadline)
+        :param stream: yield each asset as soon as it's downloaded, instead of waiting for the whole response, which
+               keeps memory use flat for very large searches. With full_record, each full record is fetched as
+               its search result arrives. The deadline only applies to starting the search. (Default: False)
 
-        :return: list of asset info, or None if no assets found matching criteria.
-                (by default, NOT FULL ASSET RECORDS, pass full_record=True to get full record)
+        :return: list of asset info, or None if no assets found matching criteria (or a TDXResponseStream of asset
+                info, if stream is True). (by default, NOT FULL ASSET RECORDS, pass full_record=True to get full record)
 
         
         """
-        # Set default statuses
-        default_statuses = list()
-        if all_statuses:
-            for status in self.get_all_asset_statuses():
-                default_statuses.append(status['ID'])
-        else:
-            default_statuses.append(self.get_asset_status_by_name_id("Inventory")['ID'])
-            default_statuses.append(self.get_asset_status_by_name_id("In Use")['ID'])
-            default_statuses.append(self.get_asset_status_by_name_id("Broken")['ID'])
-            # Set conditional statuses
-            if retired:
-                default_statuses.append(self.get_asset_status_by_name_id("Retired")['ID'])
-            if disposed:
-                default_statuses.append(self.get_asset_status_by_name_id("Disposed")['ID'])
-
-        # Set up search body
-        search_body = {'MaxResults': str(max_results)}
-        if isinstance(criteria, str):
-            search_body['SearchText'] = criteria
-            search_body['StatusIDs'] = default_statuses
-        elif isinstance(criteria, dict):
-            search_body.update(criteria)
-            if 'StatusIDs' not in search_body:
+        with tdxlib.tdx_deadline.deadline(deadline):
+            # Set default statuses
+            default_statuses = list()
+            if all_statuses:
+                for status in self.get_all_asset_statuses():
+                    default_statuses.append(status['ID'])
+            else:
+                default_statuses.append(self.get_asset_status_by_name_id("Inventory")['ID'])
+                default_statuses.append(self.get_asset_status_by_name_id("In Use")['ID'])
+                default_statuses.append(self.get_asset_status_by_name_id("Broken")['ID'])
+                # Set conditional statuses
+                if retired:
+                    default_statuses.append(self.get_asset_status_by_name_id("Retired")['ID'])
+                if disposed:
+                    default_statuses.append(self.get_asset_status_by_name_id("Disposed")['ID'])
+
+            # Set up search body
+            search_body = {'MaxResults': str(max_results)}
+            if isinstance(criteria, str):
+                search_body['SearchText'] = criteria
                 search_body['StatusIDs'] = default_statuses
-        else:
-            raise TdxApiObjectTypeError("Can't search assets with" +
-                                        str(type(criteria)) + " as criteria.")
-        asset_list = self.make_call('search', 'post', search_body)
-        if full_record and asset_list:
-            full_assets = []
-            for asset in asset_list:
-                full_assets.append(self.get_asset_by_id(asset['ID']))
-            return full_assets
-        else:
-            return asset_list
+            elif isinstance(criteria, dict):
+                search_body.update(criteria)
+                if 'StatusIDs' not in search_body:
+                    search_body['StatusIDs'] = default_statuses
+            else:
+                raise TdxApiObjectTypeError("Can't search assets with" +
+                                            str(type(criteria)) + " as criteria.")
+            if stream:
+                asset_stream = self.make_post('/' + str(self.config.asset_app_id) + '/assets/search', search_body,
+                                              stream=True)
+                if asset_stream is None or not full_record:
+                    return asset_stream
+                return tdxlib.tdx_stream.TDXResponseStream(
+                    (self.get_asset_by_id(asset['ID']) for asset in asset_stream), asset_stream.close)
+            asset_list = self.make_call('search', 'post', search_body)
+            if full_record and asset_list:
+                full_assets = []
+                for asset in asset_list:
+                    if tdxlib.tdx_deadline.expired():
+                        self.logger.warning(f"Deadline passed after fetching {len(full_assets)} of "
+                                            f"{len(asset_list)} full asset records. Returning partial results.")
+                        break
+                    full_assets.append(self.get_asset_by_id(asset['ID']))
+                return full_assets
+            else:
+                return asset_list
 
     def find_asset_by_tag(self, tag: str, full_record: bool = False, all_statuses: bool = True) -> dict:
         """
@@ -697,65 +701,58 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
                                   disposed=disposed, retired=retired, all_statuses=all_statuses)
 
     def update_assets(self, assets: Union[dict, str, int, list], changed_attributes: dict,
-                      clear_custom_attributes: bool = False) -> list:
+                      clear_custom_attributes: bool = False, deadline: float = None) -> list:
         """
-        Updates data in a list of assets
+        Updates data in a list of assets. Assets are updated concurrently, as many at a time as the adaptive
+        concurrency limit allows (see concurrency and max_concurrency in the config).
 
         :param assets: a list of assets (maybe from search_assets()) or a single asset (only ID required)
         :param changed_attributes: a dict of attributes in the ticket to be changed
         :param clear_custom_attributes: (default: False) Indicates whether custom attributes not specified
                                         in the changed_attributes argument should be cleared
+        :param deadline: seconds to allow for the whole update. Assets not yet started when it passes are
+                         left alone. (Default: no deadline)
 
-        :return: list of updated assets
+        :return: list of updated assets, in the same order as assets (only those updated before the deadline, if
+                 one was set)
 
         """
-        changed_custom_attributes = False
         # Get everything into a list
         if not isinstance(assets, list):
             asset_list = list()
             asset_list.append(assets)
         else:
             asset_list = assets
-        updated_assets = list()
         # Separate CA changes into their own object: 'changed_custom_attributes'.
-        # need to make a full copy of this dict, so we can reuse it
-        changed_attributes_copy = copy.deepcopy(changed_attributes)
-        if 'Attributes' in changed_attributes:
-            if isinstance(changed_attributes['Attributes'], list):
-                changed_custom_attributes = changed_attributes['Attributes']
-            else:
-                changed_custom_attributes = [changed_attributes['Attributes']]
-            # Remove attributes field of "changed_attributes" so it doesn't mess up the existing asset(s) CA's
-            # need to set it to an empty list first, so it doesn't delete the object that was passed in
-            del changed_attributes_copy['Attributes']
-        for this_asset in asset_list:
+        changed_attributes_copy, changed_custom_attributes = \
+            tdxlib.tdx_utils.split_custom_attributes(changed_attributes)
+
+        def update(this_asset):
             # Need to get the full record so that we can see existing CA's
             if isinstance(this_asset, str) or isinstance(this_asset, int):
                 full_asset = self.get_asset_by_id(this_asset)
             else:
                 full_asset = self.get_asset_by_id(this_asset['ID'])
-            # not totally sure the first part is necessary. I think it always comes through as an empty list if no CA's
+            if full_asset is None and tdxlib.tdx_deadline.expired():
+                # Ran out of time while fetching this one
+                return self._SKIPPED
+            # not totally sure the first part is necessary.
+            # I think it always comes through as an empty list if no CA's
             if 'Attributes' not in full_asset.keys() or clear_custom_attributes:
                 full_asset['Attributes'] = []
             # we take this branch if we have attributes to update, and we're not clobbering existing CA's
             if changed_custom_attributes:
-                # Loop through each of the CAs to be changed
-                for new_attrib in changed_custom_attributes:
-                    # Drop a marker so we know if
-                    new_attrib_marker = True
-                    # Loop through the existing CA's, to look for stuff to update
-                    for attrib in full_asset['Attributes']:
-                        # if we find a match, we update it in the existing asset record
-                        if str(new_attrib['ID']) == str(attrib['ID']):
-                            attrib['Value'] = new_attrib['Value']
-                            new_attrib_marker = False
-                    # if we go through all the asset's  CA's, and haven't updated something, we just put it in.
-                    if new_attrib_marker:
-                        full_asset['Attributes'].append(new_attrib)
+                tdxlib.tdx_utils.merge_custom_attributes(full_asset['Attributes'], changed_custom_attributes)
             # incorporate the non-custom changed attributes to the existing asset record
             full_asset.update(changed_attributes_copy)
             # Call a post with the existing asset record to update the values
-            updated_assets.append(self.make_call(str(full_asset['ID']), 'post', full_asset))
+            return self.make_call(str(full_asset['ID']), 'post', full_asset)
+
+        with tdxlib.tdx_deadline.deadline(deadline):
+            updated_assets = self._run_concurrently(update, asset_list)
+            if len(updated_assets) < len(asset_list) and tdxlib.tdx_deadline.expired():
+                self.logger.warning(f"Deadline passed after updating {len(updated_assets)} of "
+                                    f"{len(asset_list)} assets. Returning partial results.")
         return updated_assets
 
     def change_asset_owner(self, asset: Union[dict, str, int, list], new_owner, new_dept=None) -> list:
@@ -847,6 +844,15 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
         return self.get_all_custom_attributes(TDXAssetIntegration.component_ids['asset'],
                                               app_id=self.config.asset_app_id)
 
+    def _get_asset_and_ci_custom_attributes(self) -> list:
+        """
+        Internal method to get all asset custom attributes, followed by all configuration item custom attributes.
+        """
+        custom_attributes = self.get_all_asset_custom_attributes()
+        custom_attributes.extend(self.get_all_custom_attributes(
+            tdxlib.tdx_integration.TDXIntegration.component_ids['configuration_item'], app_id=self.config.asset_app_id))
+        return custom_attributes
+
     def get_asset_custom_attribute_by_name_id(self, key: str) -> dict:
         """
         Gets a specific Asset Custom Attribute object
@@ -857,21 +863,15 @@ class TDXAssetIntegration(tdxlib.tdx_integration.TDXIntegration):
 
         """
         search_key = str(key) + "_asset_ci"
-        if self.config.caching and search_key in self.cache['ca_search']:
-            return self.cache['ca_search'][search_key]
+        cached = self.cache['ca_search'].get(search_key)
+        if cached is not None:
+            return cached
         # There is no API for searching attributes -- the only way is to get them all.
-        if self.config.caching:
-            custom_attributes = self.cache['custom_attributes']
-        else:
-            custom_attributes = self.get_all_asset_custom_attributes()
-            custom_attributes.append(self.get_all_custom_attributes(
-                tdxlib.tdx_integration.TDXIntegration.component_ids['configuration_item'],
-                app_id=self.config.asset_app_id))
-        for item in custom_attributes:
-            if type(item) == dict:
-                if str(key).lower() == item['Name'].lower() or str(key) == str(item['ID']):
-                    self.cache['ca_search'][search_key] = item
-                    return item
+        item = self.cache.lookup('asset_custom_attributes',
+                                 self._get_asset_and_ci_custom_attributes).find(key, partial=False)
+        if item:
+            self.cache['ca_search'][search_key] = item
+            return item
         raise TdxApiObjectNotFoundError(
             "No custom asset or CI attribute found for " + str(key))
 
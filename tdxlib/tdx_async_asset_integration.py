@@ -0,0 +1,262 @@
+from typing import Union
+
+import tdxlib.tdx_async_integration
+import tdxlib.tdx_cache
+import tdxlib.tdx_deadline
+import tdxlib.tdx_priority
+import tdxlib.tdx_tracing
+import tdxlib.tdx_utils
+from tdxlib.tdx_api_exceptions import *
+
+
+@tdxlib.tdx_tracing.traced
+class TDXAsyncAssetIntegration(tdxlib.tdx_async_integration.TDXAsyncIntegration):
+    """
+    Async versions of the TDXAssetIntegration methods that benefit most from running many requests at once.
+    """
+
+    def __init__(self, filename: str = None, config=None, max_in_flight: int = None):
+        tdxlib.tdx_async_integration.TDXAsyncIntegration.__init__(self, filename, config, max_in_flight)
+        if self.config.asset_app_id is None:
+            raise RuntimeError("Asset App Id is required. Check your configuration.")
+
+    def clean_cache(self) -> None:
+        """
+        Internal method to refresh the cache in a tdxlib object.
+        """
+        super().clean_cache()
+        self.cache.add_region('asset_status', whole_list=True, persist=str(self.config.asset_app_id))
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that adds the asset statuses to the reference data warm_cache() fetches.
+        """
+        return super()._reference_loaders() + [
+            ('asset_status', tdxlib.tdx_cache.ALL, self.get_all_asset_statuses)
+        ]
+
+    async def make_call(self, url: str, action: str, post_body: Union[dict, list] = None) -> Union[list, dict]:
+        """
+        Makes an HTTP call using the Assets API information.
+
+        :param url: The URL (everything after assets/) to call
+        :param action: The HTTP action (get, put, post, delete, patch) to perform.
+        :param post_body: A python dict of the information to post, put, or patch. Not used for get/delete.
+
+        :return: the API response as a python dict or list
+
+        """
+        url_string = '/' + str(self.config.asset_app_id) + '/assets'
+        if len(url) > 0:
+            url_string += '/' + url
+        if action == 'get':
+            return await self.make_get(url_string)
+        if action == 'delete':
+            return await self.make_delete(url_string)
+        if action == 'post' and post_body:
+            return await self.make_post(url_string, post_body)
+        if action == 'put' and post_body:
+            return await self.make_put(url_string, post_body)
+        if action == 'patch' and post_body:
+            return await self.make_patch(url_string, post_body)
+        raise TdxApiHTTPRequestError('No method' + action + 'or no post information')
+
+    async def get_all_asset_statuses(self) -> list:
+        """
+        Gets a list asset statuses
+
+        :return: list of status data
+
+        """
+        return await self.make_call('statuses', 'get')
+
+    async def get_asset_status_by_name_id(self, key: str) -> dict:
+        """
+        Gets a specific asset status object
+
+        :param key: name of an asset status to search for
+
+        :return: dict of status data
+
+        """
+        statuses = self.cache.region('asset_status').get(tdxlib.tdx_cache.ALL)
+        if statuses is None:
+            statuses = await self.get_all_asset_statuses()
+            self.cache['asset_status'] = statuses
+        status = self.cache.region('asset_status').index(tdxlib.tdx_cache.ALL, statuses).find(key, partial=False)
+        if status:
+            return status
+        raise TdxApiObjectNotFoundError(f'No asset status found for {str(key)}')
+
+    async def get_asset_by_id(self, asset_id: Union[str, int]) -> dict:
+        """
+        Gets a specfic asset object, including the full list of attributes.
+
+        :param asset_id: asset ID from TDX
+
+        :return: dict of asset data
+
+        """
+        return await self.make_call(str(asset_id), 'get')
+
+    async def get_assets_by_id(self, asset_ids: list) -> list:
+        """
+        Gets several full asset records concurrently.
+
+        :param asset_ids: list of asset IDs from TDX
+
+        :return: list of dicts of asset data, in the same order as asset_ids
+
+        """
+        return await self.gather(*[self.get_asset_by_id(asset_id) for asset_id in asset_ids])
+
+    async def search_assets(self, criteria: Union[str, dict], max_results=25, retired=False, disposed=False,
+                            full_record=False, all_statuses: bool = False, deadline: float = None,
+                            stream: bool = False) -> list:
+        """
+        Searches for assets, based on criteria. See TDXAssetIntegration.search_assets() for details.
+        Full records are fetched concurrently.
+
+        :param max_results: maximum number of results to return
+        :param criteria: a string or dict to search for assets with. If a string, use as 'SearchString'
+        :param retired: include retired assets in search if true
+        :param disposed: include disposed assets in search if true
+        :param full_record: get full asset record (Default: False)
+        :param all_statuses: gets assets, regardless of what their status is (default: False)
+        :param deadline: seconds to allow for the whole search. Full records not fetched in time are left out.
+                         (Default: no deadline)
+        :param stream: yield each asset as soon as it's downloaded, instead of waiting for the whole response. With
+                       full_record, each full record is fetched as its search result arrives. The deadline only
+                       applies to starting the search. (Default: False)
+
+        :return: list of asset info (or an async generator of asset info, if stream is True)
+
+        """
+        with tdxlib.tdx_deadline.deadline(deadline):
+            return await self._search_assets(criteria, max_results, retired, disposed, full_record, all_statuses,
+                                             stream)
+
+    async def _search_assets(self, criteria: Union[str, dict], max_results: int, retired: bool, disposed: bool,
+                             full_record: bool, all_statuses: bool, stream: bool = False) -> list:
+        if all_statuses:
+            default_statuses = [status['ID'] for status in await self.get_all_asset_statuses()]
+        else:
+            status_names = ["Inventory", "In Use", "Broken"]
+            if retired:
+                status_names.append("Retired")
+            if disposed:
+                status_names.append("Disposed")
+            default_statuses = [(await self.get_asset_status_by_name_id(name))['ID'] for name in status_names]
+
+        search_body = {'MaxResults': str(max_results)}
+        if isinstance(criteria, str):
+            search_body['SearchText'] = criteria
+            search_body['StatusIDs'] = default_statuses
+        elif isinstance(criteria, dict):
+            search_body.update(criteria)
+            if 'StatusIDs' not in search_body:
+                search_body['StatusIDs'] = default_statuses
+        else:
+            raise TdxApiObjectTypeError("Can't search assets with" +
+                                        str(type(criteria)) + " as criteria.")
+        if stream:
+            asset_stream = await self.make_post('/' + str(self.config.asset_app_id) + '/assets/search', search_body,
+                                                stream=True)
+            if asset_stream is None or not full_record:
+                return asset_stream
+            return (await self.get_asset_by_id(asset['ID']) async for asset in asset_stream)
+        asset_list = await self.make_call('search', 'post', search_body)
+        if full_record and asset_list:
+            return await self.get_assets_by_id([asset['ID'] for asset in asset_list])
+        return asset_list
+
+    async def find_asset_by_sn(self, sn: str, full_record: bool = False, all_statuses: bool = True) -> dict:
+        """
+        Gets an asset based on its serial number
+
+        :param sn: serial number as a string
+        :param full_record: boolean indicating whether to fetch the full Asset record, or just summary info
+        :param all_statuses: gets assets, regardless of what their status is (default: True)
+
+        :return: the single asset with the corresponding serial number
+
+        """
+        result = await self.search_assets({'SerialLike': sn}, disposed=True, retired=True,
+                                          full_record=full_record, all_statuses=all_statuses)
+        if len(result) == 1:
+            return result[0]
+        raise TdxApiObjectNotFoundError(
+            f"{str(len(result))} assets with SN {str(sn)} found.")
+
+    async def _update_asset(self, asset: Union[dict, str, int], changed_attributes: dict,
+                            changed_custom_attributes: list, clear_custom_attributes: bool) -> dict:
+        if isinstance(asset, str) or isinstance(asset, int):
+            full_asset = await self.get_asset_by_id(asset)
+        else:
+            full_asset = await self.get_asset_by_id(asset['ID'])
+        if full_asset is None:
+            # Already logged by _make_request (maybe the deadline passed)
+            return None
+        if 'Attributes' not in full_asset.keys() or clear_custom_attributes:
+            full_asset['Attributes'] = []
+        if changed_custom_attributes:
+            tdxlib.tdx_utils.merge_custom_attributes(full_asset['Attributes'], changed_custom_attributes)
+        full_asset.update(changed_attributes)
+        return await self.make_call(str(full_asset['ID']), 'post', full_asset)
+
+    async def update_assets(self, assets: Union[dict, str, int, list], changed_attributes: dict,
+                            clear_custom_attributes: bool = False, deadline: float = None) -> list:
+        """
+        Updates data in a list of assets concurrently
+
+        :param assets: a list of assets (maybe from search_assets()) or a single asset (only ID required)
+        :param changed_attributes: a dict of attributes in the asset to be changed
+        :param clear_custom_attributes: (default: False) Indicates whether custom attributes not specified
+                                        in the changed_attributes argument should be cleared
+        :param deadline: seconds to allow for the whole update. Updates still running when it passes are
+                         cancelled. (Default: no deadline)
+
+        :return: list of updated assets, in the same order (only those finished before the deadline, if one was set)
+
+        """
+        if not isinstance(assets, list):
+            assets = [assets]
+        changed_attributes_copy, changed_custom_attributes = \
+            tdxlib.tdx_utils.split_custom_attributes(changed_attributes)
+        with tdxlib.tdx_deadline.deadline(deadline), \
+                tdxlib.tdx_priority.priority(tdxlib.tdx_priority.BULK, override=False):
+            return await self.gather(*[self._update_asset(asset, changed_attributes_copy, changed_custom_attributes,
+                                                          clear_custom_attributes) for asset in assets])
+
+    async def create_asset(self, asset: dict, check_duplicate: bool = True) -> dict:
+        """
+        Creates an asset
+
+        :param asset: a dict of asset info (maybe from TDXAssetIntegration.build_asset()) to use in creation
+        :param check_duplicate: boolean of whether we should check to see if this is a duplicate asset
+
+        :return: dict of created asset details
+
+        """
+        if check_duplicate:
+            duplicate = None
+            serial = asset['SerialNumber']
+            try:
+                duplicate = await self.find_asset_by_sn(serial)
+            except TdxApiObjectNotFoundError:
+                pass  # Duplicate not found
+            if duplicate:
+                raise TdxApiDuplicateError(f"Asset with Serial Number {serial} already exists")
+        return await self.make_call('', 'post', asset)
+
+    async def create_assets(self, assets: list, check_duplicate: bool = True) -> list:
+        """
+        Creates several assets concurrently
+
+        :param assets: a list of dicts of asset info (maybe from TDXAssetIntegration.build_asset())
+        :param check_duplicate: boolean of whether we should check to see if each asset is a duplicate
+
+        :return: list of dicts of created asset details, in the same order
+
+        """
+        return await self.gather(*[self.create_asset(asset, check_duplicate) for asset in assets])
@@ -0,0 +1,741 @@
+import asyncio
+import datetime
+import functools
+import json
+import logging
+import time
+from typing import BinaryIO
+
+import jwt
+
+import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_cache
+import tdxlib.tdx_circuit_breaker
+import tdxlib.tdx_concurrency
+import tdxlib.tdx_config
+import tdxlib.tdx_constants
+import tdxlib.tdx_deadline
+import tdxlib.tdx_json
+import tdxlib.tdx_metrics
+import tdxlib.tdx_priority
+import tdxlib.tdx_rate_limit
+import tdxlib.tdx_replay
+import tdxlib.tdx_request
+import tdxlib.tdx_retry
+import tdxlib.tdx_single_flight
+import tdxlib.tdx_stream
+import tdxlib.tdx_token_cache
+import tdxlib.tdx_tracing
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+@tdxlib.tdx_tracing.traced
+class TDXAsyncIntegration:
+    """
+    An asyncio-based sibling of TDXIntegration.
+
+    All of the make_* methods are coroutines that share one pooled httpx.AsyncClient, so many requests can be
+    in flight at once from a single event loop. Use gather() (or asyncio.gather) to fan out calls. Requests go
+    through the same retries, rate limiting, adaptive concurrency limit, circuit breaker, metrics and tracing as
+    TDXIntegration, and can be recorded and replayed the same way.
+
+    Requires the optional httpx package.
+    """
+    component_ids = tdxlib.tdx_constants.component_ids
+
+    def __init__(self, filename: str = None, config: dict = None, max_in_flight: int = None):
+        """
+        Creates an async integration. Authentication happens on the first request.
+
+        :param filename: name of a tdxlib configuration file (see TDXConfig)
+        :param config: dict of configuration values (see TDXConfig)
+        :param max_in_flight: most requests the adaptive concurrency limit may grow to (Default: max_concurrency
+                              from config)
+
+        """
+        if httpx is None:
+            raise ImportError("TDXAsyncIntegration requires the httpx package. Install it with 'pip install httpx'.")
+        self.cache = dict()
+        self.logger = logging.getLogger('tdx_integration')
+        self.config = tdxlib.tdx_config.TDXConfig(filename, config)
+        self.setup_logs()
+        self.tracer = tdxlib.tdx_tracing.tracer_from_config(self.config)
+        if not max_in_flight:
+            max_in_flight = self.config.max_concurrency
+        self.max_in_flight = max_in_flight
+        self.concurrency = tdxlib.tdx_concurrency.TDXAsyncConcurrencyLimiter(initial=self.config.concurrency,
+                                                                             maximum=max_in_flight)
+        self.client = self.setup_client()
+        # Made on first use, inside the event loop: before Python 3.10, an asyncio.Lock belongs to the loop that was
+        # current when it was made
+        self._auth_lock = None
+        self._refresh_task = None
+        self.rate_limiter = tdxlib.tdx_rate_limit.limiter_from_config(self.config)
+        self.circuit_breaker = tdxlib.tdx_circuit_breaker.breaker_from_config(self.config)
+        self.retry_policy = tdxlib.tdx_retry.policy_from_config(self.config)
+        self.token_cache = tdxlib.tdx_token_cache.cache_from_config(self.config)
+        self.codec = tdxlib.tdx_json.codec_from_config(self.config)
+        self.single_flight = tdxlib.tdx_single_flight.TDXAsyncSingleFlight()
+        self.metrics = tdxlib.tdx_metrics.metrics_from_config(self.config)
+        self.metrics.add_collector(self._collect_metrics)
+        self.clean_cache()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def setup_logs(self):
+        if self.config.log_level:
+            self.logger = logging.getLogger('tdx_integration')
+            self.logger.setLevel(logging.getLevelName(self.config.log_level))
+
+    def setup_client(self) -> 'httpx.AsyncClient':
+        """
+        Builds the pooled async HTTP client shared by all requests this integration makes. With transport set to
+        http2 in the config, concurrent requests are multiplexed over one connection (this needs the h2 package).
+        If replay_file is set, recorded responses are served from it instead, and if record_file is set, every
+        request and response is recorded to it.
+
+        :return: an httpx.AsyncClient
+
+        """
+        if self.config.replay_file:
+            replay = tdxlib.tdx_replay.replay_from_config(self.config)
+            return httpx.AsyncClient(transport=tdxlib.tdx_replay.TDXAsyncReplayTransport(replay), timeout=None)
+        if self.config.transport not in (None, '', 'http1', 'http2'):
+            raise ValueError(f"Unknown transport {self.config.transport}. Use http1 or http2.")
+        limits = httpx.Limits(max_connections=self.max_in_flight,
+                              max_keepalive_connections=self.config.pool_maxsize if self.config.keep_alive else 0)
+        http2 = self.config.transport == 'http2'
+        if self.config.record_file:
+            transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+            return httpx.AsyncClient(transport=tdxlib.tdx_replay.TDXAsyncRecordingTransport(
+                transport, self.config.record_file), timeout=None)
+        return httpx.AsyncClient(limits=limits, timeout=None, http2=http2)
+
+    async def close(self):
+        """
+        Closes the pooled connections held by this integration, and stops the background token refresh task if one
+        is running.
+
+        :return: None
+
+        """
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        await self.client.aclose()
+
+    def clean_cache(self):
+        """
+        Internal method to refresh the cache in a tdxlib object.
+        """
+        self.cache = tdxlib.tdx_cache.cache_from_config(self.config)
+        self.cache.add_region('people')
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that lists the reference data warm_cache() fetches, as (cache region, key, loader) tuples,
+        where loader is an async function. Integrations add their own lookup tables to the list.
+        """
+        return []
+
+    async def warm_cache(self) -> dict:
+        """
+        Fetches every reference list this integration looks names up in (such as all ticket or asset statuses)
+        concurrently, and caches them, so a bulk job doesn't wait for each list in turn the first time it needs it.
+        Lists that are already cached aren't fetched again.
+
+        :return: dict of cache region to the number of items cached, or None if fetching them failed
+
+        :rtype: dict
+
+        """
+        async def load(region, key, loader):
+            items = self.cache.region(region).get(key)
+            if items is None:
+                try:
+                    items = await loader()
+                except (tdxlib.tdx_api_exceptions.TdxApiHTTPError,
+                        tdxlib.tdx_api_exceptions.TdxApiHTTPRequestError) as e:
+                    self.logger.warning(f"Couldn't warm the {region} cache. {str(e)}")
+                    return region, None
+                self.cache.region(region)[key] = items
+            return region, items
+
+        if not self.config.caching:
+            self.logger.warning("Not warming the cache, since caching is turned off.")
+            return dict()
+        results = await self.gather(*[load(*item) for item in self._reference_loaders()])
+        return {region: None if items is None else len(items) for region, items in results}
+
+    async def gather(self, *aws) -> list:
+        """
+        Runs several coroutines concurrently and returns their results in order. The requests they make are kept
+        within the adaptive concurrency limit, which can grow up to max_in_flight.
+
+        If a deadline is set (see deadline()), coroutines that haven't finished when it passes are cancelled,
+        and only the results of those that finished are returned. Coroutines that failed because they ran out of
+        time are left out too.
+
+        :param aws: coroutines (such as calls to make_get or get_ticket_by_id) to run
+
+        :return: list of results, in the same order as the coroutines passed in
+
+        :rtype: list
+
+        """
+        left = tdxlib.tdx_deadline.remaining()
+        if left is None:
+            return list(await asyncio.gather(*aws))
+        tasks = [asyncio.ensure_future(aw) for aw in aws]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=left)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+            self.logger.warning(f"Deadline passed with {len(done)} of {len(tasks)} operations finished. "
+                                f"Returning partial results.")
+        expired = tdxlib.tdx_deadline.expired()
+        return [task.result() for task in tasks
+                if task in done and not (expired and task.exception() is not None)]
+
+    def deadline(self, seconds: float):
+        """
+        Sets a deadline for everything done inside a with block. See TDXIntegration.deadline() for details.
+        Concurrent operations still running when it passes are cancelled.
+
+        :param seconds: seconds from now until the deadline
+
+        :return: a context manager
+
+        """
+        return tdxlib.tdx_deadline.deadline(seconds)
+
+    def priority(self, lane: str):
+        """
+        Puts every request made inside a with block into a priority lane. See TDXIntegration.priority() for
+        details. Interactive requests are paced ahead of bulk ones by the rate limiter, and update_assets() and
+        edit_tickets() use the bulk lane unless they are called inside a priority block.
+
+        :param lane: 'interactive' or 'bulk'
+
+        :return: a context manager
+
+        """
+        return tdxlib.tdx_priority.priority(lane)
+
+    def _request_timeout(self, timeout: float = None) -> 'httpx.Timeout':
+        """
+        Internal method to work out the timeouts for a request, from the config or a per-call override, shortened
+        so they don't run past the current deadline.
+        """
+        if timeout is not None:
+            return httpx.Timeout(tdxlib.tdx_deadline.clamp(timeout))
+        read_timeout = tdxlib.tdx_deadline.clamp(self.config.read_timeout)
+        return httpx.Timeout(read_timeout, connect=tdxlib.tdx_deadline.clamp(self.config.connect_timeout),
+                             pool=None)
+
+    # #### AUTHENTICATION & TRANSPORT #### #
+
+    async def auth(self, use_cache: bool = True) -> bool:
+        """
+        Internal method to authenticate to the TDX api using the selected method
+        Stores a token in the token property, used for future calls. Returns true for success, false for failure.
+        If token_cache is configured (and use_cache is True), a still-valid token from an earlier run is reused
+        instead.
+        """
+        if not self.config.auth_type or self.config.auth_type == 'password':
+            if use_cache and self.token_cache and self.token_cache.load(self.config):
+                return True
+            started = time.monotonic()
+            try:
+                response = await self.client.post(
+                    str(self.config.api_url) + '/auth',
+                    headers={
+                        "Content-Type": "application/json; charset=utf-8",
+                    },
+                    content=json.dumps({
+                        "username": self.config.username,
+                        "password": self.config.password
+                    }),
+                    timeout=self._request_timeout()
+                )
+                self.metrics.record_auth(response.status_code, time.monotonic() - started)
+                if response.status_code != 200:
+                    raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(" Response code: " + str(response.status_code) +
+                                                                    " " + response.reason_phrase + " " +
+                                                                    " Returned: " + response.text)
+                self.config.token = response.text
+            except httpx.HTTPError as e:
+                self.metrics.record_auth(tdxlib.tdx_retry.classify_error(e) or 'error', time.monotonic() - started)
+                self.logger.warning(f"Auth request Failed. Exception: {str(e)}")
+                return False
+            except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
+                self.logger.error(str(e))
+                return False
+        elif self.config.auth_type != 'token' or self.config.token is None:
+            return False
+        # Decode token to identify expiration date
+        decoded = jwt.decode(self.config.token,
+                             algorithms=['HS256'],
+                             options={'verify_signature': False},
+                             audience="https://www.teamdynamix.com/")
+        self.config.token_exp = decoded['exp']
+        if self.token_cache:
+            self.token_cache.save(self.config)
+        return True
+
+    def _invalidate_token(self):
+        """
+        Internal method to forget the current token (and its cached copy) after TDX rejects it, so the next
+        request authenticates again.
+        """
+        self.config.token_exp = None
+        if self.token_cache:
+            self.token_cache.clear(self.config)
+
+    async def _check_auth_exp(self) -> bool:
+        """
+        Internal method to check the expiration of the stored access token.
+        If it is expired, call auth() to get a new token. Only one renewal runs at a time.
+        """
+        if self.config.token_exp and self.config.token_exp >= time.time() + 60:
+            return True
+        async with self._get_auth_lock():
+            # Another task may have renewed the token while we waited for the lock
+            if self.config.token_exp and self.config.token_exp >= time.time() + 60:
+                return True
+            if self.config.token_exp:
+                self.logger.info(f"Token expires at {str(datetime.datetime.utcfromtimestamp(self.config.token_exp))}. "
+                                 f"Getting new token...")
+            authenticated = await self.auth()
+        if authenticated:
+            self._start_token_refresh()
+        return authenticated
+
+    def _get_auth_lock(self) -> asyncio.Lock:
+        """
+        Internal method that returns the lock token renewals share, making it the first time it's needed.
+        """
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        return self._auth_lock
+
+    def _start_token_refresh(self):
+        """
+        Internal method to start renewing the token in a background task, if background_token_refresh is set.
+        """
+        if self._refresh_task or not self.config.background_token_refresh:
+            return
+        if self.config.auth_type and self.config.auth_type != 'password':
+            return
+        self._refresh_task = asyncio.ensure_future(self._refresh_token_loop(self.config.token_refresh_margin))
+
+    async def _refresh_token_loop(self, margin: float, retry_interval: float = 30):
+        """
+        Internal task that renews the token margin seconds before it expires, so requests never wait for /auth.
+        Shares the auth lock with _check_auth_exp(), so a token is never renewed twice.
+        """
+        while True:
+            wait = 0
+            if self.config.token_exp:
+                wait = self.config.token_exp - margin - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            async with self._get_auth_lock():
+                if self.config.token_exp and self.config.token_exp >= time.time() + margin:
+                    continue
+                if self.token_cache and self.token_cache.load(self.config, min_validity=margin):
+                    continue
+                self.logger.info("Renewing token in the background...")
+                renewed = await self.auth(use_cache=False)
+            if not renewed or self.config.token_exp < time.time() + margin:
+                # Failed, or TDX handed out a token that's already inside the margin. Don't spin.
+                await asyncio.sleep(retry_interval)
+
+    async def _rate_limit(self, request_url: str = None):
+        """
+        Internal method to pace requests according to the rate-limit headers from TDX, without blocking the
+        event loop.
+        """
+        wait = await self._call_rate_limiter(self.rate_limiter.reserve, request_url, tdxlib.tdx_priority.current())
+        if wait > 0:
+            self.metrics.record_rate_limit_wait(tdxlib.tdx_metrics.endpoint_template(request_url or ''), wait)
+            if wait >= 1:
+                self.logger.info(f"Rate-limited by TeamDynamix. Sleeping {wait:.1f} seconds.")
+            await asyncio.sleep(wait)
+
+    async def _update_rate_limit(self, response: 'httpx.Response', request_url: str):
+        await self._call_rate_limiter(self.rate_limiter.update, response.headers, request_url)
+
+    async def _call_rate_limiter(self, method, *args):
+        """
+        Internal method that calls one of the rate limiter's methods. A shared SQLite store takes a lock that other
+        processes may hold for a while, so the call is made on a worker thread, and only the in-memory store is
+        called on the event loop.
+        """
+        if isinstance(self.rate_limiter.store, tdxlib.tdx_rate_limit.TDXMemoryRateLimitStore):
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(method, *args))
+
+    def rate_limit_state(self) -> dict:
+        """
+        Reports the current TDX rate-limit budget, as seen by this integration.
+
+        :return: dict with the limit, remaining requests, seconds until the window resets ('reset_in'), the
+                 current spacing between requests ('interval'), and seconds until the next request may be sent
+
+        :rtype: dict
+
+        """
+        return self.rate_limiter.state()
+
+    def rate_limit_usage(self, since: float = None) -> list:
+        """
+        Reports which processes have consumed the shared TDX rate-limit budget. See
+        TDXIntegration.rate_limit_usage() for details.
+
+        :param since: only count requests after this unix timestamp
+
+        :return: list of dicts with the owner, number of requests, seconds spent waiting and last request time
+
+        :rtype: list
+
+        """
+        return self.rate_limiter.usage(since)
+
+    def circuit_state(self) -> dict:
+        """
+        Reports the state of the circuit breaker for each family of endpoints this integration has called. See
+        TDXIntegration.circuit_state() for details.
+
+        :return: dict of endpoint family to a dict with the state, failures in a row, number of times the circuit
+                 has opened, requests refused, and seconds until the next probe
+
+        :rtype: dict
+
+        """
+        return self.circuit_breaker.state()
+
+    def _collect_metrics(self) -> list:
+        """
+        Internal method that reports the current circuit breaker, concurrency, rate-limit and cache gauges to the
+        metrics registry when it's read.
+        """
+        gauges = tdxlib.tdx_metrics.circuit_gauges(self.circuit_breaker)
+        gauges.append(('tdxlib_concurrency_limit', {}, self.concurrency.limit))
+        gauges.append(('tdxlib_requests_in_flight', {}, self.concurrency.in_flight))
+        remaining = self.rate_limiter.state()['remaining']
+        if remaining is not None:
+            gauges.append(('tdxlib_rate_limit_remaining', {}, remaining))
+        gauges.extend(tdxlib.tdx_metrics.cache_gauges(self.cache))
+        return gauges
+
+    def metrics_text(self) -> str:
+        """
+        Exports the request metrics of this integration in the Prometheus text format. See
+        TDXIntegration.metrics_text() for details.
+
+        :return: the metrics, in the Prometheus text exposition format
+
+        :rtype: str
+
+        """
+        return self.metrics.to_prometheus()
+
+    async def _make_request(self, method: str, request_url: str, ok_codes: list, body=None, files: dict = None,
+                            retries: int = None, timeout: float = None, raw: bool = False,
+                            label: str = None, stream: bool = False, stream_key: str = None):
+        """
+        Internal method that sends a request to the TDX API, retrying according to the retry policy. Failures
+        (including running out of time before the current deadline) are logged and None is returned for them, the
+        same way the synchronous integration does, and requests to endpoints whose circuit breaker is open raise
+        TdxApiCircuitOpenError. With raw=True, the response body is returned as bytes. With stream=True, an async
+        generator is returned that decodes the elements of the array in the response (or the array under
+        stream_key) as they arrive. Every attempt, and the call as a whole, is recorded in self.metrics,
+        and the call is traced as a span with its endpoint template, status and retries. Everything but sending the
+        request and waiting between attempts is shared with TDXIntegration, in tdx_request.TDXRequest.
+        """
+        with tdxlib.tdx_request.TDXRequest(self, method, request_url, ok_codes, body=body, files=files,
+                                           retries=retries, label=label, stream=stream,
+                                           transport_errors=(httpx.HTTPError,)) as call:
+            while call.begin():
+                await self._rate_limit(request_url)
+                response = None
+                try:
+                    if not (await self._check_auth_exp()):
+                        raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
+                            f"Login Failed. Username or password in config likely incorrect.")
+                    headers = call.headers(self.config.token)
+                    if not (await self.concurrency.acquire(tdxlib.tdx_deadline.remaining())):
+                        call.out_of_time("Deadline passed while waiting for other requests to finish.")
+                        return None
+                    started = time.monotonic()
+                    try:
+                        request = self.client.build_request(method, call.url, headers=headers, content=call.data,
+                                                            files=files, timeout=self._request_timeout(timeout))
+                        response = await self.client.send(request, stream=stream)
+                    except BaseException as e:
+                        self.concurrency.release(error_kind=call.failed(e, time.monotonic() - started))
+                        raise
+                    latency = time.monotonic() - started
+                    call.answered(response, latency)
+                    # Unlike the synchronous integration, the slot is given up once the response headers are in,
+                    # since an async generator that's never iterated can't be relied on to hand it back
+                    self.concurrency.release(latency, response.status_code, response.headers)
+                    await self._update_rate_limit(response, request_url)
+                    if call.reauthenticate(response):
+                        if stream:
+                            await response.aclose()
+                        continue
+                    if stream and not call.ok(response):
+                        await response.aread()
+                    call.check(response)
+                    if stream:
+                        return self._stream_response(response, request_url, stream_key, call.label)
+                    return call.decode(response, raw)
+                except call.errors as e:
+                    delay = call.retry_delay(e, response)
+                if delay is None:
+                    return None
+                await asyncio.sleep(delay)
+        return None
+
+    async def _stream_response(self, response, request_url: str, stream_key: str = None, label: str = 'GET'):
+        """
+        Internal async generator that decodes array elements from a streamed response as they arrive, and closes
+        the response when it's done. A connection that drops partway through raises TdxApiHTTPError.
+        """
+        parser = tdxlib.tdx_stream.TDXJSONArrayStream(stream_key, self.codec)
+        template = tdxlib.tdx_metrics.endpoint_template(request_url)
+        try:
+            async for chunk in response.aiter_bytes(self.config.stream_chunk_size):
+                self.metrics.record_received(label, template, len(chunk))
+                for element in parser.feed(chunk):
+                    yield element
+                if parser.done:
+                    return
+            parser.close()
+        except (httpx.HTTPError, ValueError) as e:
+            message = f"Streamed response from {label} to {request_url} failed partway through. {str(e)}"
+            self.logger.error(message)
+            raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(message)
+        finally:
+            await response.aclose()
+
+    async def make_get(self, request_url: str, retries: int = None, timeout: float = None, raw: bool = False,
+                       stream: bool = False, stream_key: str = None):
+        """
+        Makes an HTTP GET request to the TDX Api. If another task is already getting the same URL, this waits for
+        its result instead of sending a duplicate request (unless coalesce_gets is turned off in the config).
+
+        :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+        :param raw: return the response body as undecoded JSON bytes, for passing straight through (Default: False)
+        :param stream: return an async generator that yields the elements of the array in the response as they are
+                       downloaded (Default: False)
+        :param stream_key: with stream, the key in the response object whose array should be streamed, if the
+                           response isn't an array itself (Default: None)
+
+        :return: the API's response as a python dict or list (or bytes, if raw is True, or an async generator, if
+                 stream is True)
+
+        """
+        if raw or stream or not self.config.coalesce_gets:
+            return await self._make_request('GET', request_url, [200], retries=retries, timeout=timeout, raw=raw,
+                                            stream=stream, stream_key=stream_key)
+        return await self.single_flight.do(request_url, self._make_request, 'GET', request_url, [200],
+                                           retries=retries, timeout=timeout)
+
+    async def make_post(self, request_url: str, body: dict, retries: int = None, timeout: float = None,
+                        raw: bool = False, stream: bool = False, stream_key: str = None):
+        """
+        Makes an HTTP POST request to the TDX Api
+
+        :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param body: dumped JSON data to send with the POST
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+        :param raw: return the response body as undecoded JSON bytes, for passing straight through (Default: False)
+        :param stream: return an async generator that yields the elements of the array in the response as they are
+                       downloaded (Default: False)
+        :param stream_key: with stream, the key in the response object whose array should be streamed, if the
+                           response isn't an array itself (Default: None)
+
+        :return: the API's response as a python dict or list (or bytes, if raw is True, or an async generator, if
+                 stream is True)
+
+        """
+        return await self._make_request('POST', request_url, [200, 201], body=body, retries=retries,
+                                        timeout=timeout, raw=raw, stream=stream, stream_key=stream_key)
+
+    async def make_file_post(self, request_url: str, file: BinaryIO, filename: str = None,
+                             retries: int = None, timeout: float = None):
+        """
+        Makes an HTTP POST request to the TDX Api with a Multipart-Encoded File
+
+        :param request_url: the path (everything after /TDWebApi/api/) to call
+        :param file: BinaryIO object opened in read mode to upload as attachment.
+        :param filename: (optional), allows to explicitly specify filename header.
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+
+        :return: the API's response as a python dict
+        """
+        if filename:
+            files = {'file': (filename, file)}
+        else:
+            files = {'file': file}
+        return await self._make_request('POST', request_url, [200, 201], files=files, retries=retries,
+                                        timeout=timeout, label='POST File')
+
+    async def make_put(self, request_url: str, body: dict, retries: int = None, timeout: float = None):
+        """
+        Makes an HTTP PUT request to the TDX API.
+
+        :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param body: dumped JSON data to send with the PUT
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+
+        :return: the API's response as a python dict or list
+
+        """
+        return await self._make_request('PUT', request_url, [200, 201, 202, 204], body=body, retries=retries,
+                                        timeout=timeout)
+
+    async def make_delete(self, request_url: str, retries: int = None, timeout: float = None):
+        """
+        Makes an HTTP DELETE request to the TDX Api.
+
+        :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+
+        :return: None
+
+        """
+        await self._make_request('DELETE', request_url, [200, 201], retries=retries, timeout=timeout)
+
+    async def make_patch(self, request_url: str, body: list, retries: int = None, timeout: float = None):
+        """
+        Makes an HTTP PATCH request to the TDX API.
+
+        :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param body: a list of PATCH operations as dictionaries, each including the keys "op", "path", and "value"
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+
+        :return: the API's response, as a python dict or list
+
+        """
+        return await self._make_request('PATCH', request_url, [200, 201], body=body, retries=retries,
+                                        timeout=timeout)
+
+    # #### GETTING TDX OBJECTS #### #
+
+    async def get_tdx_item_by_id(self, obj_type: str, key):
+        """
+        A generic function to get something from the TDX API using its ID/UID.
+
+        :param obj_type: the type of object to get.
+        :param key: the ID number of an object to get, as a string
+
+        :return: dict of object data
+
+        """
+        url_string = f'/{obj_type}/{str(key)}'
+        return await self.make_get(url_string)
+
+    async def get_location_by_id(self, location_id: int) -> dict:
+        """
+        Gets a location by the location ID.
+
+        :param location_id: ID number of location to get information about
+
+        :return: dict of location data
+
+        :rtype: dict
+        """
+        return await self.get_tdx_item_by_id('locations', location_id)
+
+    async def get_account_by_id(self, account_id: int) -> dict:
+        """
+        Gets an account by the account ID.
+
+        :param account_id: ID number of account to get information about
+
+        :return: dict of account data
+
+        :rtype: dict
+        """
+        return await self.get_tdx_item_by_id('accounts', account_id)
+
+    async def get_group_by_id(self, group_id: int) -> dict:
+        """
+        Gets a group by the group ID.
+
+        :param group_id: ID number of group to get information about
+
+        :return: dict of group data, including members
+
+        :rtype: dict
+        """
+        return await self.get_tdx_item_by_id('groups', group_id)
+
+    async def get_person_by_uid(self, uid: str) -> dict:
+        """
+        Gets a person by their UID.
+
+        :param uid: UID string corresponding to a person
+
+        :return: dict of person data
+
+        :rtype: dict
+        """
+        return await self.get_tdx_item_by_id('people', uid)
+
+    async def search_people(self, key: str, max_results: int = 20) -> list:
+        """
+        Gets a list of people, based on a simple text search, which may match Name, Email, Username or ID
+
+        :param key: string with search text of person to search with
+        :param max_results: maximum number of matches to return (Default: 20)
+
+        :return: list of dicts of person data
+
+        :rtype: list
+        """
+        cached = self.cache['people'].get(key)
+        if cached is not None:
+            return cached
+        url_string = "/people/lookup?searchText=" + str(key) + "&maxResults=" + str(max_results)
+        people = await self.make_get(url_string)
+        if not people:
+            raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError("No person found for " + key)
+        self.cache['people'][key] = people
+        return people
+
+    async def get_person_by_name_email(self, key: str) -> dict:
+        """
+        Gets the top match of people with based on a simple text search (Name, Email, Username, Org ID)
+
+        :param key: string with search text of person to search with
+
+        :return: dict of person data
+
+        :rtype: dict
+
+        """
+        return (await self.search_people(key, 1))[0]
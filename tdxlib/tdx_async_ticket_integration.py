@@ -0,0 +1,278 @@
+from typing import Union
+
+import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_async_integration
+import tdxlib.tdx_cache
+import tdxlib.tdx_deadline
+import tdxlib.tdx_priority
+import tdxlib.tdx_ticket
+import tdxlib.tdx_ticket_integration
+import tdxlib.tdx_tracing
+import tdxlib.tdx_utils
+
+
+@tdxlib.tdx_tracing.traced
+class TDXAsyncTicketIntegration(tdxlib.tdx_async_integration.TDXAsyncIntegration):
+    """
+    Async versions of the TDXTicketIntegration methods that benefit most from running many requests at once.
+    """
+    ticket_classifications = tdxlib.tdx_ticket_integration.TDXTicketIntegration.ticket_classifications
+    ticket_status_classes = tdxlib.tdx_ticket_integration.TDXTicketIntegration.ticket_status_classes
+
+    def __init__(self, filename: str = None, config=None, max_in_flight: int = None):
+        tdxlib.tdx_async_integration.TDXAsyncIntegration.__init__(self, filename, config, max_in_flight)
+        if self.config.ticket_app_id is None:
+            raise RuntimeError("Ticket App Id is required. Check your configuration.")
+
+    def clean_cache(self):
+        """
+        Clears the tdx_async_ticket_integration cache.
+
+        :return:  None
+
+        """
+        super().clean_cache()
+        self.cache.add_region('ticket_status', persist=str(self.config.ticket_app_id))
+        self.cache.add_region('ticket_statuses', whole_list=True, persist=str(self.config.ticket_app_id))
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that adds the ticket statuses to the reference data warm_cache() fetches.
+        """
+        return super()._reference_loaders() + [
+            ('ticket_statuses', tdxlib.tdx_cache.ALL, self.get_all_ticket_statuses)
+        ]
+
+    def get_url_string(self):
+        return '/' + str(self.config.ticket_app_id) + '/tickets'
+
+    async def make_call(self, url: str, action: str, post_body: dict = None):
+        """
+        Makes an HTTP call using the Tickets API information.
+
+        :param url: The URL (everything after tickets/) to call
+        :param action: The HTTP action (get, put, post, delete, patch) to perform.
+        :param post_body: A dict of the information to post, put, or patch. Not used for get/delete.
+
+        :return: the API response as a python dict or list
+
+        """
+        url_string = self.get_url_string()
+        if len(url) > 0:
+            url_string += '/' + url
+        if action == 'get':
+            return await self.make_get(url_string)
+        if action == 'delete':
+            return await self.make_delete(url_string)
+        if action == 'post' and post_body:
+            return await self.make_post(url_string, post_body)
+        if action == 'put' and post_body:
+            return await self.make_put(url_string, post_body)
+        if action == 'patch' and post_body:
+            return await self.make_patch(url_string, post_body)
+        raise tdxlib.tdx_api_exceptions.TdxApiHTTPRequestError('No method ' + action + ' or no post information')
+
+    # #### GETTING TICKETS #### #
+
+    async def get_ticket_by_id(self, ticket_id: int) -> Union[tdxlib.tdx_ticket.TDXTicket, None]:
+        """
+        Gets a ticket, based on its ID
+
+        :param ticket_id: ticket ID of required ticket
+
+        :return: ticket as a TDXTicket object
+
+        :rtype: tdxlib.tdx_ticket.TDXTicket
+        """
+        ticket_data = await self.make_call(str(ticket_id), 'get')
+        if ticket_data:
+            return tdxlib.tdx_ticket.TDXTicket(self, ticket_data)
+
+    async def get_tickets_by_id(self, ticket_ids: list) -> list:
+        """
+        Gets several tickets concurrently, based on their IDs
+
+        :param ticket_ids: list of ticket IDs to get
+
+        :return: list of TDXTicket objects (or None for tickets that couldn't be retrieved), in the same order
+
+        :rtype: list
+        """
+        return await self.gather(*[self.get_ticket_by_id(ticket_id) for ticket_id in ticket_ids])
+
+    async def get_all_ticket_statuses(self) -> list:
+        """
+        Gets a list of all ticket statuses from TDX
+
+        :return: list of status data in python dicts
+
+        :rtype: list
+
+        """
+        return await self.make_call('statuses', 'get')
+
+    async def get_ticket_status_by_status_class(self, status_class: list) -> list:
+        """
+        Gets ticket statuses based on status class.
+
+        :param status_class: Status class to search for
+
+        :return: list of status data in python dicts
+
+        :rtype: list
+
+        """
+        all_statuses = self.cache.region('ticket_statuses').get(tdxlib.tdx_cache.ALL)
+        if all_statuses is None:
+            all_statuses = await self.get_all_ticket_statuses()
+            self.cache['ticket_statuses'] = all_statuses
+        return [x for x in all_statuses if x['StatusClass'] in status_class]
+
+    async def get_ticket_feed(self, ticket_id: Union[str, int]) -> list:
+        """
+        Gets the feed entries from a ticket.
+
+        :param ticket_id: The ticket ID on which the ticket task exists.
+
+        :return: list of feed entries from the task as python dicts, if any exist
+
+        :rtype: list
+
+        """
+        return await self.make_call(f'{ticket_id}/feed', 'get')
+
+    async def search_tickets(self, criteria: Union[dict, str], max_results: int = 25, closed: bool = False,
+                             cancelled: bool = False, other_status: int = None, stream: bool = False) -> list:
+        """
+        Gets tickets, based on a variety of criteria. See TDXTicketIntegration.search_tickets() for details.
+
+        :param max_results: maximum number of results to return
+        :param criteria: a string or dict to search for tickets with
+        :param cancelled: include cancelled tickets in search if true
+        :param closed: include closed tickets in search if true
+        :param other_status: Status ID of a custom status
+        :param stream: yield each ticket as soon as it's downloaded, instead of waiting for the whole response
+                       (Default: False)
+
+        :return: list of TDXTicket objects (or an async generator of them, if stream is True)
+
+        :rtype: list
+
+        """
+        # Open, closed and cancelled statuses all come from one list, so only get it once
+        status_classes = [1, 2, 5]
+        if closed:
+            status_classes.append(3)
+        if cancelled:
+            status_classes.append(4)
+        statuses = [x['ID'] for x in await self.get_ticket_status_by_status_class(status_classes)]
+        if other_status:
+            statuses.append(other_status)
+
+        # Set up search body
+        search_body = {'MaxResults': max_results, 'StatusIDs': statuses}
+        if type(criteria) is str:
+            search_body['SearchText'] = criteria
+        elif type(criteria) is dict:
+            search_body.update(criteria)
+        else:
+            raise TypeError("Can't search tickets with" + str(type(criteria)))
+        if stream:
+            ticket_data_stream = await self.make_post(self.get_url_string() + '/search', search_body, stream=True)
+            if ticket_data_stream is None:
+                return None
+            return (tdxlib.tdx_ticket.TDXTicket(self, ticket_data) async for ticket_data in ticket_data_stream)
+        ticket_data_list = await self.make_call('search', 'post', search_body)
+        return [tdxlib.tdx_ticket.TDXTicket(self, ticket_data) for ticket_data in ticket_data_list]
+
+    # #### CHANGING TICKETS #### #
+
+    async def edit_ticket(self, ticket: Union[tdxlib.tdx_ticket.TDXTicket, str, int], changed_attributes: dict,
+                          notify: bool = False) -> tdxlib.tdx_ticket.TDXTicket:
+        """
+        Edits one ticket, based on a dict of parameters to change.
+
+        :param ticket: a TDXTicket object or a Ticket ID
+        :param changed_attributes: Attributes to alter in the ticket
+        :param notify: If true, will notify newly-responsible resource if changed because of edit (default: false)
+
+        :return: edited ticket as TDXTicket
+
+        :rtype: tdxlib.tdx_ticket.TDXTicket
+
+        """
+        if not isinstance(ticket, tdxlib.tdx_ticket.TDXTicket):
+            full_ticket = await self.get_ticket_by_id(ticket)
+            if not full_ticket:
+                raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(
+                    f'Full body of ticket with ID {ticket} not found')
+        else:
+            full_ticket = ticket
+        changed_attributes_copy, changed_custom_attributes = \
+            tdxlib.tdx_utils.split_custom_attributes(changed_attributes)
+        if 'Attributes' not in full_ticket.ticket_data.keys():
+            full_ticket.ticket_data['Attributes'] = []
+        if changed_custom_attributes:
+            tdxlib.tdx_utils.merge_custom_attributes(full_ticket.ticket_data['Attributes'], changed_custom_attributes)
+        if changed_attributes_copy:
+            full_ticket.update(changed_attributes_copy, validate=True)
+        url_string = f'{full_ticket.get_id()}?notifyNewResponsible={notify}'
+        edited_dict = await self.make_call(url_string, 'post', full_ticket.export(validate=True))
+        return tdxlib.tdx_ticket.TDXTicket(self, json=edited_dict)
+
+    async def edit_tickets(self, ticket_list: list, changed_attributes: dict, notify: bool = False,
+                           deadline: float = None) -> list:
+        """
+        Edits one or more tickets concurrently, based on a dict of parameters to change
+
+        :param ticket_list: list of TDXTicket objects or ticket IDs, maybe from search_tickets
+        :param changed_attributes: Attributes to alter in selected tickets
+        :param notify: If true, will notify newly-responsible resource(s) if changed because of edit
+        :param deadline: seconds to allow for the whole edit. Edits still running when it passes are cancelled.
+                         (Default: no deadline)
+
+        :return: list of edited TDXTicket objects, in the same order as ticket_list (only those finished before
+                 the deadline, if one was set)
+
+        :rtype: list
+
+        """
+        with tdxlib.tdx_deadline.deadline(deadline), \
+                tdxlib.tdx_priority.priority(tdxlib.tdx_priority.BULK, override=False):
+            return await self.gather(*[self.edit_ticket(ticket, changed_attributes, notify)
+                                       for ticket in ticket_list])
+
+    # #### CREATING TICKETS #### #
+
+    async def create_ticket(self, ticket: tdxlib.tdx_ticket.TDXTicket, silent: bool = True) \
+            -> tdxlib.tdx_ticket.TDXTicket:
+        """
+        Creates a ticket in TeamDynamix using a TdxTicket object
+
+        :param ticket: TDXTicket Object
+        :param silent: Boolean -- if False, notifications are sent to requestor and responsible, default: True
+
+        :returns: Created ticket, if successful
+
+        :rtype: tdxlib.tdx_ticket.TDXTicket
+
+        """
+        notify = str(not silent)
+        request_params = f"?EnableNotifyReviewer=False&NotifyRequestor={notify}&" \
+                         f"NotifyResponsible={notify}&AllowRequestorCreation=False"
+        created_ticket_data = await self.make_call(request_params, 'post', ticket.export(validate=True))
+        return tdxlib.tdx_ticket.TDXTicket(self, created_ticket_data)
+
+    async def create_tickets(self, tickets: list, silent: bool = True) -> list:
+        """
+        Creates several tickets concurrently
+
+        :param tickets: list of TDXTicket objects, maybe from TDXTicketIntegration.generate_ticket()
+        :param silent: Boolean -- if False, notifications are sent to requestor and responsible, default: True
+
+        :returns: list of created tickets, in the same order
+
+        :rtype: list
+
+        """
+        return await self.gather(*[self.create_ticket(ticket, silent) for ticket in tickets])
@@ -0,0 +1,581 @@
+import collections
+import collections.abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import tdxlib
+import tdxlib.tdx_tracing
+
+# Key that whole-list regions (such as all ticket types) keep their list under
+ALL = '*'
+
+# Bumped when the layout of what's kept on disk changes, so older files are ignored instead of misread
+STORE_FORMAT = 1
+
+
+def _parse_region_ttls(text: str) -> dict:
+    # Parses "people=600, ticket_status=86400" into {'people': 600.0, 'ticket_status': 86400.0}
+    ttls = dict()
+    for item in (text or '').split(','):
+        if not item.strip():
+            continue
+        name, separator, seconds = item.partition('=')
+        try:
+            ttls[name.strip()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"Can't read cache TTL {item.strip()!r}. Use region=seconds, like people=600.")
+    return ttls
+
+
+def _normalize(name) -> str:
+    return str(name).strip().lower()
+
+
+class TDXLookupIndex:
+    """
+    Hash indexes over a list of TDX objects (such as all ticket types), for looking them up by ID or name without
+    scanning the list. IDs and normalized (trimmed, lower-case) names are indexed when the index is built, and
+    partial name matches are remembered once they've been found.
+    """
+
+    def __init__(self, items: list, active_only: bool = False):
+        """
+        :param items: list of dicts of TDX objects, each with an ID and a Name
+        :param active_only: whether to leave out objects whose IsActive is False (Default: False)
+
+        """
+        self.by_id = dict()
+        self.by_name = dict()
+        # Secondary index for partial matches: normalized names in list order, and the results of earlier searches
+        self._names = []
+        self._partial = dict()
+        for item in items or []:
+            if not isinstance(item, dict) or (active_only and item.get('IsActive') is False):
+                continue
+            name = _normalize(item.get('Name', ''))
+            self.by_id.setdefault(str(item.get('ID')), item)
+            self.by_name.setdefault(name, item)
+            self._names.append((name, item))
+
+    def find(self, key, partial: bool = True, ids: bool = True):
+        """
+        Finds an object by its ID, its name, or (if partial is True) part of its name. An ID match wins over a name
+        match, and an exact name match over a partial one. Of several partial matches, the first in the list wins.
+
+        :param key: ID, name or part of a name to look for
+        :param partial: whether to fall back to objects whose name contains key (Default: True)
+        :param ids: whether to match IDs too (Default: True)
+
+        :return: the object, or None if nothing matches
+
+        """
+        if ids and str(key) in self.by_id:
+            return self.by_id[str(key)]
+        name = _normalize(key)
+        if name in self.by_name or not partial:
+            return self.by_name.get(name)
+        if name not in self._partial:
+            self._partial[name] = next((item for item_name, item in self._names if name in item_name), None)
+        return self._partial[name]
+
+
+class TDXCacheRegion(collections.abc.MutableMapping):
+    """
+    One named region of an integration's cache, such as 'people' or 'ticket_status'. Entries expire ttl seconds
+    after they're stored, and once the region holds max_size entries, the least recently used one is evicted to make
+    room. Hits, misses, evictions and expirations are counted.
+
+    Looking an entry up with get() or load() counts a hit or a miss, and notes which it was on the current tracing
+    span (as tdx.cache_hit). Reading with [] or `in` doesn't.
+    """
+
+    def __init__(self, name: str, ttl: float = None, max_size: int = None, enabled: bool = True,
+                 whole_list: bool = False, clock=time.monotonic, store=None, scope: str = None,
+                 persistent_ttl: float = None):
+        """
+        :param name: name of the region
+        :param ttl: seconds entries stay fresh for (Default: None, forever)
+        :param max_size: most entries to keep (Default: None, no limit)
+        :param enabled: whether to store anything. A disabled region misses every lookup. (Default: True)
+        :param whole_list: whether the region holds one whole list (under the key ALL), such as all ticket types,
+                           rather than entries looked up by key (Default: False)
+        :param clock: function returning the current time in seconds, for tests (Default: time.monotonic)
+        :param store: a TDXSQLiteCacheStore to also keep entries in, so later processes can reuse them
+                      (Default: None, keep them in memory only)
+        :param scope: what entries in the store are kept under, usually the tenant and app ID (Default: None)
+        :param persistent_ttl: seconds entries stay fresh for in the store (Default: None, forever)
+
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = enabled
+        self.whole_list = whole_list
+        self.store = store
+        self.scope = scope
+        self.persistent_ttl = persistent_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.persistent_hits = 0
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._indexes = dict()
+        self._lock = threading.RLock()
+
+    def _live(self, key):
+        # Returns the (expiry, value) entry for a key, dropping it if it has expired. Call with the lock held.
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, key, default=None):
+        """
+        Looks an entry up, counting a hit or a miss.
+
+        :param key: the key to look up
+        :param default: what to return if there's no fresh entry for the key (Default: None)
+
+        :return: the cached value, or default
+
+        """
+        with self._lock:
+            entry = self._live(key) if self.enabled else None
+            if entry is None and self.enabled and self.store:
+                stored = self.store.get(self.scope, self.name, key)
+                if stored is not None:
+                    value, expires = stored
+                    ttl = self.ttl
+                    if expires is not None:
+                        ttl = min(ttl or float('inf'), expires - time.time())
+                    self._put(key, value, ttl)
+                    self.persistent_hits += 1
+                    entry = self._entries[key]
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        tdxlib.tdx_tracing.set_attribute('tdx.cache_hit', entry is not None)
+        return default if entry is None else entry[1]
+
+    def load(self, key, loader):
+        """
+        Looks an entry up, and on a miss, calls loader to get it and stores what it returns (unless it's None).
+
+        :param key: the key to look up
+        :param loader: function called with no arguments to get the value on a miss
+
+        :return: the cached or loaded value
+
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self[key] = value
+        return value
+
+    def index(self, key, items: list, active_only: bool = False) -> TDXLookupIndex:
+        """
+        Gets a TDXLookupIndex over a list held in the region, building it the first time it's asked for and again
+        whenever the list is replaced (for example after it expires).
+
+        :param key: the key the list is held under
+        :param items: the list, as got from the region
+        :param active_only: whether to leave inactive objects out of the index (Default: False)
+
+        :return: the index
+
+        :rtype: TDXLookupIndex
+
+        """
+        with self._lock:
+            built = self._indexes.get((key, active_only))
+            if built is None or built[0] is not items:
+                built = (items, TDXLookupIndex(items, active_only))
+                self._indexes[(key, active_only)] = built
+            return built[1]
+
+    def invalidate(self, key=None):
+        """
+        Drops one entry, or all of them, from memory and from the store.
+
+        :param key: the key to drop (Default: None, drop every entry)
+
+        :return: None
+
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._indexes.clear()
+            else:
+                self._entries.pop(key, None)
+                self._indexes.pop((key, False), None)
+                self._indexes.pop((key, True), None)
+            if self.store:
+                self.store.delete(self.scope, self.name, key)
+
+    def stats(self) -> dict:
+        """
+        Reports how the region is doing.
+
+        :return: dict with the number of entries, hits (and how many of them were read from the store), misses,
+                 evictions and expirations, and the TTL and size limit
+
+        :rtype: dict
+
+        """
+        with self._lock:
+            return {'entries': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'expirations': self.expirations, 'persistent_hits': self.persistent_hits, 'ttl': self.ttl,
+                    'max_size': self.max_size}
+
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._live(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[1]
+
+    def _put(self, key, value, ttl: float):
+        # Stores an entry in memory only, evicting the least recently used entries if the region is full
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while self.max_size and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __setitem__(self, key, value):
+        if not self.enabled:
+            return
+        self._put(key, value, self.ttl)
+        if self.store:
+            self.store.set(self.scope, self.name, key, value, self.persistent_ttl)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._entries[key]
+
+    def __iter__(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._live(key)
+            return iter(list(self._entries))
+
+    def __len__(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._live(key)
+            return len(self._entries)
+
+    def __repr__(self):
+        return f'TDXCacheRegion({self.name!r}, {dict(self.items())!r})'
+
+
+class TDXCache(collections.abc.MutableMapping):
+    """
+    An integration's cache of TDX objects: a set of named regions (see TDXCacheRegion), each with its own TTL, size
+    limit and counters.
+
+    cache[name] gives back the region called name. For regions that hold a whole list, such as all ticket types, it
+    gives back the list itself (or an empty dict, if it isn't cached), the way tdxlib's cache dicts always have.
+    """
+
+    def __init__(self, enabled: bool = True, ttl: float = None, max_size: int = None, region_ttls: dict = None,
+                 clock=time.monotonic, store=None, tenant: str = '', persistent_ttl: float = None):
+        """
+        :param enabled: whether to cache anything. Regions added with enabled=True cache even when this is False.
+                        (Default: True)
+        :param ttl: seconds entries stay fresh for, unless the region sets its own (Default: None, forever)
+        :param max_size: most entries each region keeps, unless it sets its own (Default: None, no limit)
+        :param region_ttls: dict of region name to its TTL in seconds, overriding ttl and persistent_ttl
+                            (Default: None)
+        :param clock: function returning the current time in seconds, for tests (Default: time.monotonic)
+        :param store: a TDXSQLiteCacheStore that persistent regions also keep their entries in (Default: None)
+        :param tenant: the tenant (usually the API URL) that entries in the store are kept under (Default: '')
+        :param persistent_ttl: seconds entries stay fresh for in the store, unless the region sets its own
+                               (Default: None, forever)
+
+        """
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_size = max_size
+        self.region_ttls = dict(region_ttls or {})
+        self.store = store
+        self.tenant = tenant
+        self.persistent_ttl = persistent_ttl
+        self._clock = clock
+        self._regions = dict()
+
+    def add_region(self, name: str, whole_list: bool = False, ttl: float = None, max_size: int = None,
+                   enabled: bool = None, persist: str = None) -> TDXCacheRegion:
+        """
+        Adds an empty region, replacing any region with the same name.
+
+        :param name: name of the region
+        :param whole_list: whether it holds one whole list rather than entries looked up by key (Default: False)
+        :param ttl: seconds entries stay fresh for, or 0 for forever (Default: the region's TTL from region_ttls,
+                    or the cache's)
+        :param max_size: most entries to keep, or 0 for no limit (Default: the cache's)
+        :param enabled: whether the region caches anything (Default: whether the cache does)
+        :param persist: for slow-changing reference data, the app ID (or '' for data that isn't in an app) to keep
+                        the region's entries under in the cache's store, if it has one (Default: None, memory only)
+
+        :return: the region
+
+        :rtype: TDXCacheRegion
+
+        """
+        persistent_ttl = self.region_ttls.get(name, self.persistent_ttl)
+        if ttl is None:
+            ttl = self.region_ttls.get(name, self.ttl)
+        if max_size is None:
+            max_size = self.max_size
+        store = self.store if persist is not None else None
+        region = TDXCacheRegion(name, ttl=ttl or None, max_size=max_size or None,
+                                enabled=self.enabled if enabled is None else enabled, whole_list=whole_list,
+                                clock=self._clock, store=store, scope=f'{self.tenant}|{persist}',
+                                persistent_ttl=persistent_ttl or None)
+        self._regions[name] = region
+        return region
+
+    def region(self, name: str) -> TDXCacheRegion:
+        """
+        :param name: name of the region
+
+        :return: the region called name
+
+        :rtype: TDXCacheRegion
+
+        """
+        return self._regions[name]
+
+    def load_all(self, name: str, loader) -> list:
+        """
+        Gets the list a whole-list region holds, calling loader to get it (and caching it) on a miss.
+
+        :param name: name of the region
+        :param loader: function called with no arguments that gets the whole list from TDX
+
+        :return: the cached or loaded list
+
+        :rtype: list
+
+        """
+        return self._regions[name].load(ALL, loader)
+
+    def lookup(self, name: str, loader, key=ALL, active_only: bool = False) -> TDXLookupIndex:
+        """
+        Gets a list held in a region (calling loader to get it, and caching it, on a miss) and returns a
+        TDXLookupIndex over it, for finding objects by ID or name.
+
+        :param name: name of the region
+        :param loader: function called with no arguments that gets the list from TDX
+        :param key: the key the list is held under (Default: ALL, for whole-list regions)
+        :param active_only: whether to leave inactive objects out of the index (Default: False)
+
+        :return: the index
+
+        :rtype: TDXLookupIndex
+
+        """
+        region = self._regions[name]
+        return region.index(key, region.load(key, loader), active_only)
+
+    def invalidate(self, name: str = None, key=None):
+        """
+        Drops cached entries: one entry of a region, a whole region, or everything.
+
+        :param name: name of the region to drop entries from (Default: None, every region)
+        :param key: the key to drop from that region (Default: None, all of its entries)
+
+        :return: None
+
+        """
+        if name is None:
+            for region in self._regions.values():
+                region.invalidate()
+        else:
+            self._regions[name].invalidate(key)
+
+    def stats(self) -> dict:
+        """
+        Reports how each region is doing.
+
+        :return: dict of region name to its stats (see TDXCacheRegion.stats())
+
+        :rtype: dict
+
+        """
+        return {name: region.stats() for name, region in self._regions.items()}
+
+    def __getitem__(self, name):
+        region = self._regions[name]
+        if region.whole_list:
+            return region[ALL] if ALL in region else {}
+        return region
+
+    def __setitem__(self, name, value):
+        if name not in self._regions:
+            self.add_region(name, whole_list=not isinstance(value, collections.abc.Mapping))
+        region = self._regions[name]
+        region.invalidate()
+        if region.whole_list:
+            if value:
+                region[ALL] = value
+        else:
+            region.update(value)
+
+    def __delitem__(self, name):
+        del self._regions[name]
+
+    def __iter__(self):
+        return iter(list(self._regions))
+
+    def __len__(self):
+        return len(self._regions)
+
+    def __repr__(self):
+        return f'TDXCache({list(self._regions)!r})'
+
+
+class TDXSQLiteCacheStore:
+    """
+    Keeps slow-changing reference data (ticket types, asset statuses, product models and so on) in a SQLite
+    database, so short-lived scripts and cron jobs can start with what an earlier run already fetched.
+
+    Entries are kept per scope (tenant and app ID), region and key, with the time they expire and a version stamp.
+    Entries written by a different version of tdxlib are ignored, and pruned along with expired ones when the
+    database is opened.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the SQLite database file. It is created if it doesn't exist.
+
+        """
+        self.path = os.path.expanduser(path)
+        self.version = f'{tdxlib.__version__}/{STORE_FORMAT}'
+        self.logger = logging.getLogger('tdx_integration')
+        self._local = threading.local()
+        try:
+            conn = self._connect()
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (scope TEXT NOT NULL, region TEXT NOT NULL, '
+                         'key TEXT NOT NULL, version TEXT NOT NULL, expires REAL, value TEXT NOT NULL, '
+                         'PRIMARY KEY (scope, region, key))')
+            conn.execute('DELETE FROM entries WHERE version != ? OR expires <= ?', (self.version, time.time()))
+        except sqlite3.Error as e:
+            self.logger.warning(f"Couldn't open reference cache {self.path}. {str(e)}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so each thread gets its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, scope: str, region: str, key):
+        """
+        Reads an entry, if there's a fresh one written by this version of tdxlib.
+
+        :param scope: the tenant and app ID the entry is kept under
+        :param region: name of the cache region
+        :param key: the entry's key in the region
+
+        :return: tuple of the value and the unix time it expires (or None if it doesn't), or None if there's no
+                 fresh entry
+
+        """
+        try:
+            row = self._connect().execute('SELECT version, expires, value FROM entries '
+                                          'WHERE scope = ? AND region = ? AND key = ?',
+                                          (scope, region, str(key))).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Couldn't read reference cache {self.path}. {str(e)}")
+            return None
+        if row is None or row[0] != self.version or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[2]), row[1]
+
+    def set(self, scope: str, region: str, key, value, ttl: float = None):
+        """
+        Writes an entry, replacing any earlier one.
+
+        :param scope: the tenant and app ID the entry is kept under
+        :param region: name of the cache region
+        :param key: the entry's key in the region
+        :param value: the value, which must be serializable as JSON
+        :param ttl: seconds the entry stays fresh for (Default: None, forever)
+
+        :return: None
+
+        """
+        try:
+            self._connect().execute('INSERT OR REPLACE INTO entries (scope, region, key, version, expires, value) '
+                                    'VALUES (?, ?, ?, ?, ?, ?)',
+                                    (scope, region, str(key), self.version, time.time() + ttl if ttl else None,
+                                     json.dumps(value)))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.logger.warning(f"Couldn't write to reference cache {self.path}. {str(e)}")
+
+    def delete(self, scope: str, region: str, key=None):
+        """
+        Drops one entry, or every entry of a region.
+
+        :param scope: the tenant and app ID the entries are kept under
+        :param region: name of the cache region
+        :param key: the entry's key in the region (Default: None, every entry of the region)
+
+        :return: None
+
+        """
+        query = 'DELETE FROM entries WHERE scope = ? AND region = ?'
+        params = [scope, region]
+        if key is not None:
+            query += ' AND key = ?'
+            params.append(str(key))
+        try:
+            self._connect().execute(query, params)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Couldn't write to reference cache {self.path}. {str(e)}")
+
+
+# SQLite stores opened by cache_from_config(), one per database file
+_sqlite_stores = dict()
+_sqlite_stores_lock = threading.Lock()
+
+
+def cache_from_config(config) -> TDXCache:
+    """
+    Builds the cache for an integration from its TDXConfig. If reference_cache is set to the path of a SQLite
+    database, reference data is also kept there, under the API URL, for later processes to reuse.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXCache (which caches nothing, if caching is turned off in the config)
+
+    :rtype: TDXCache
+
+    """
+    store = None
+    if config.reference_cache:
+        with _sqlite_stores_lock:
+            if config.reference_cache not in _sqlite_stores:
+                _sqlite_stores[config.reference_cache] = TDXSQLiteCacheStore(config.reference_cache)
+            store = _sqlite_stores[config.reference_cache]
+    return TDXCache(enabled=bool(config.caching), ttl=config.cache_ttl or None,
+                    max_size=config.cache_max_entries or None,
+                    region_ttls=_parse_region_ttls(config.cache_region_ttls), store=store,
+                    tenant=config.api_url or '', persistent_ttl=config.reference_cache_ttl or None)
@@ -0,0 +1,178 @@
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Responses that mean the endpoint itself is failing, rather than the request being wrong
+FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+
+
+def endpoint_family(request_url: str) -> str:
+    """
+    Works out which family of endpoints a request belongs to, so that one failing part of the TDX API (such as
+    assets) doesn't stop requests to the rest of it.
+
+    :param request_url: the path (everything after /TDWebAPI/api/) being called, like /123/tickets/456
+
+    :return: the first part of the path that isn't an ID, like 'tickets'
+
+    :rtype: str
+
+    """
+    path = request_url.split('?', 1)[0]
+    for part in path.split('/'):
+        if part and not part.isdigit():
+            return part.lower()
+    return '/'
+
+
+class TDXCircuitBreaker:
+    """
+    Stops sending requests to a family of TDX endpoints that keeps failing, so callers fail fast instead of each
+    waiting out timeouts and retries.
+
+    After failure_threshold failures in a row (5xx responses, timeouts or connection errors) the circuit for that
+    family opens, and requests to it are refused for cooldown seconds. Then it goes half-open and lets a single
+    probe request through: if the probe succeeds the circuit closes again, and if it fails the circuit re-opens
+    for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        """
+        :param failure_threshold: failures in a row that open the circuit. 0 turns the breaker off. (Default: 5)
+        :param cooldown: seconds an open circuit refuses requests before probing (Default: 30.0)
+
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._circuits = dict()
+
+    def _circuit(self, family: str) -> dict:
+        if family not in self._circuits:
+            self._circuits[family] = {'state': CLOSED, 'failures': 0, 'opened_at': None, 'probe_started': None,
+                                      'trips': 0, 'rejected': 0}
+        return self._circuits[family]
+
+    def allow(self, family: str) -> bool:
+        """
+        Checks whether a request to a family of endpoints may be sent.
+
+        :param family: the endpoint family, from endpoint_family()
+
+        :return: True if the request may go ahead (possibly as the half-open probe), False if the circuit is open
+
+        :rtype: bool
+
+        """
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            circuit = self._circuit(family)
+            if circuit['state'] == CLOSED:
+                return True
+            now = time.monotonic()
+            if circuit['state'] == OPEN and now - circuit['opened_at'] >= self.cooldown:
+                circuit['state'] = HALF_OPEN
+                circuit['probe_started'] = None
+            if circuit['state'] == HALF_OPEN and (circuit['probe_started'] is None or
+                                                  now - circuit['probe_started'] >= self.cooldown):
+                # Only one probe at a time, unless the last one never reported back
+                circuit['probe_started'] = now
+                return True
+            circuit['rejected'] += 1
+            return False
+
+    def record_success(self, family: str):
+        """
+        Records a request that TDX answered, closing the circuit.
+
+        :param family: the endpoint family, from endpoint_family()
+
+        :return: None
+
+        """
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuit(family)
+            circuit['state'] = CLOSED
+            circuit['failures'] = 0
+            circuit['probe_started'] = None
+
+    def record_failure(self, family: str):
+        """
+        Records a failed request, opening the circuit if there have been too many in a row (or if it was the
+        half-open probe).
+
+        :param family: the endpoint family, from endpoint_family()
+
+        :return: None
+
+        """
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuit(family)
+            circuit['failures'] += 1
+            if circuit['state'] == HALF_OPEN or \
+                    (circuit['state'] == CLOSED and circuit['failures'] >= self.failure_threshold):
+                circuit['state'] = OPEN
+                circuit['opened_at'] = time.monotonic()
+                circuit['probe_started'] = None
+                circuit['trips'] += 1
+
+    def retry_in(self, family: str) -> float:
+        """
+        Reports how long until an open circuit lets a probe through.
+
+        :param family: the endpoint family, from endpoint_family()
+
+        :return: seconds until the next probe (0 if the circuit isn't open)
+
+        :rtype: float
+
+        """
+        with self._lock:
+            circuit = self._circuit(family)
+            if circuit['state'] != OPEN:
+                return 0.0
+            return max(circuit['opened_at'] + self.cooldown - time.monotonic(), 0.0)
+
+    def state(self) -> dict:
+        """
+        Reports the state of every circuit.
+
+        :return: dict of endpoint family to a dict with the state ('closed', 'open' or 'half_open'), failures in a
+                 row, number of times the circuit has opened, requests refused, and seconds until the next probe
+
+        :rtype: dict
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {family: {
+                'state': circuit['state'],
+                'failures': circuit['failures'],
+                'trips': circuit['trips'],
+                'rejected': circuit['rejected'],
+                'retry_in': max(circuit['opened_at'] + self.cooldown - now, 0.0)
+                if circuit['state'] == OPEN else 0.0
+            } for family, circuit in self._circuits.items()}
+
+
+def breaker_from_config(config) -> TDXCircuitBreaker:
+    """
+    Builds the circuit breaker for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXCircuitBreaker
+
+    :rtype: TDXCircuitBreaker
+
+    """
+    return TDXCircuitBreaker(failure_threshold=config.circuit_breaker_threshold,
+                             cooldown=config.circuit_breaker_cooldown)
@@ -1,6 +1,9 @@
 from tdxlib.tdx_integration import TDXIntegration
 from tdxlib.tdx_api_exceptions import TdxApiHTTPRequestError
+import tdxlib.tdx_cache
+import tdxlib.tdx_tracing
 
+@tdxlib.tdx_tracing.traced
 class TDXClientPortalIntegration(TDXIntegration):
     # These are hard-coded by TeamDynamix and not accessible through the API
     article_statuses = {
@@ -15,7 +18,6 @@ class TDXClientPortalIntegration(TDXIntegration):
         TDXIntegration.__init__(self, filename, config, skip_initial_auth=skip_initial_auth)
         if self.config.client_portal_app_id is None:
             raise RuntimeError("Client Portal App Id is required. Check your configuration.")
-        self.clean_cache()
 
     def clean_cache(self):
         """
@@ -25,8 +27,17 @@ class TDXClientPortalIntegration(TDXIntegration):
 
         """
         super().clean_cache()
-        self.cache['article_category'] = {}
-        self.cache['service_category'] = {}
+        self.cache.add_region('article_category', whole_list=True)
+        self.cache.add_region('service_category', whole_list=True)
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that adds the article and service categories to the reference data warm_cache() fetches.
+        """
+        return super()._reference_loaders() + [
+            ('article_category', tdxlib.tdx_cache.ALL, lambda: self.make_call('categories', 'get', use_kb=True)),
+            ('service_category', tdxlib.tdx_cache.ALL, lambda: self.make_call('categories', 'get', use_kb=False))
+        ]
 
     def get_services_url(self, ):
         return '/' + str(self.config.client_portal_app_id) + '/services'
@@ -85,12 +96,8 @@ class TDXClientPortalIntegration(TDXIntegration):
         :return: A list of dicts of article categories.
 
         """
-        if 'article_category' in self.cache and self.cache['article_category']:
-            categories = self.cache['article_category']
-        else:
-            categories = self.make_call('categories', 'get', use_kb=True)
-            self.cache['article_category'] = categories
-        
+        categories = self.cache.load_all('article_category',
+                                         lambda: self.make_call('categories', 'get', use_kb=True))
         if public_only:
             categories = [cat for cat in categories if cat.get('IsPublic', False)]
         return categories
@@ -119,11 +126,7 @@ class TDXClientPortalIntegration(TDXIntegration):
         :return: A list of dicts of service categories.
 
         """
-        if 'service_category' in self.cache and self.cache['service_category']:
-            return self.cache['service_category']
-        categories = self.make_call('categories', 'get', use_kb=False)
-        self.cache['service_category'] = categories
-        return categories
+        return self.cache.load_all('service_category', lambda: self.make_call('categories', 'get', use_kb=False))
 
     def get_service_category_by_name_id(self, category_id: str) -> dict:
         """
@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+
+import tdxlib.tdx_priority
+import tdxlib.tdx_retry
+
+
+# Responses that mean TDX (or something in front of it) is overloaded
+OVERLOAD_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class TDXConcurrencyLimiter:
+    """
+    Limits how many requests an integration has in flight at once, and adapts the limit to how TDX is coping
+    (additive increase, multiplicative decrease).
+
+    While responses come back quickly and X-RateLimit-Remaining shows room to spare, the limit grows by about one
+    for each limit's worth of requests. A 429 or 5xx overload response, a timeout or connection error, or latency
+    rising well above the fastest seen so far cuts the limit by backoff_ratio, at most once per round trip.
+
+    When a slot frees up, interactive requests waiting for one get it before bulk requests do (see tdx_priority).
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 10, latency_tolerance: float = 2.0,
+                 backoff_ratio: float = 0.5, remaining_threshold: int = 10):
+        """
+        :param initial: number of requests allowed in flight to start with (Default: 4)
+        :param minimum: the limit is never cut below this (Default: 1)
+        :param maximum: the limit never grows past this (Default: 10)
+        :param latency_tolerance: latency more than this many times the baseline counts as overload (Default: 2.0)
+        :param backoff_ratio: the limit is multiplied by this on overload (Default: 0.5)
+        :param remaining_threshold: don't grow the limit while X-RateLimit-Remaining is below this (Default: 10)
+
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.remaining_threshold = remaining_threshold
+        self.in_flight = 0
+        self.interactive_waiting = 0
+        # Lowest latency seen recently. It drifts up slowly, so one unusually fast response doesn't pin it.
+        self.baseline = None
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float = None, lane: str = None) -> bool:
+        """
+        Waits for a free slot.
+
+        :param timeout: most seconds to wait (Default: wait as long as it takes)
+        :param lane: tdx_priority.INTERACTIVE or tdx_priority.BULK (Default: the lane of the current context)
+
+        :return: True once a slot is taken, or False if timeout passed first
+
+        :rtype: bool
+
+        """
+        if lane is None:
+            lane = tdxlib.tdx_priority.current()
+        with self._condition:
+            if lane == tdxlib.tdx_priority.BULK:
+                free = self._condition.wait_for(lambda: self._has_room(lane), timeout)
+            else:
+                self.interactive_waiting += 1
+                try:
+                    free = self._condition.wait_for(lambda: self._has_room(lane), timeout)
+                finally:
+                    self.interactive_waiting -= 1
+                    # Bulk requests held back for this one may be able to go now
+                    self._wake()
+            if not free:
+                return False
+            self.in_flight += 1
+            return True
+
+    def _has_room(self, lane: str) -> bool:
+        # Bulk requests also wait while an interactive request is waiting, so it gets the next slot
+        if lane == tdxlib.tdx_priority.BULK and self.interactive_waiting:
+            return False
+        return self.in_flight < int(self.limit)
+
+    def _wake(self):
+        # Called with the lock held, whenever a slot may have come free
+        self._condition.notify_all()
+
+    def release(self, latency: float = None, status_code: int = None, headers: dict = None,
+                error_kind: str = None):
+        """
+        Frees a slot, and adjusts the limit based on how the request went.
+
+        :param latency: seconds the request took, if it got a response
+        :param status_code: HTTP status code of the response
+        :param headers: headers of the response, for X-RateLimit-Remaining
+        :param error_kind: tdx_retry.CONNECT_ERROR or NETWORK_ERROR, if the request failed without a response
+
+        :return: None
+
+        """
+        with self._condition:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self._adjust(saturated, latency, status_code, headers, error_kind)
+            self._wake()
+
+    def _adjust(self, saturated: bool, latency: float, status_code: int, headers, error_kind: str):
+        overloaded = status_code in OVERLOAD_STATUSES or \
+            error_kind in (tdxlib.tdx_retry.CONNECT_ERROR, tdxlib.tdx_retry.NETWORK_ERROR)
+        if latency is not None and not overloaded:
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline += (latency - self.baseline) * 0.01
+                overloaded = latency > self.baseline * self.latency_tolerance
+        now = time.monotonic()
+        if overloaded:
+            # Requests sent in the same round trip all see the same overload, so only cut once for them
+            if self._last_decrease is None or now - self._last_decrease >= (self.baseline or 0.0):
+                self.limit = max(self.minimum, self.limit * self.backoff_ratio)
+                self._last_decrease = now
+            return
+        if not saturated or status_code is None:
+            # Only grow when the limit is what's holding requests back
+            return
+        remaining = headers.get('X-RateLimit-Remaining') if headers else None
+        if remaining is not None:
+            try:
+                if int(remaining) < self.remaining_threshold:
+                    return
+            except ValueError:
+                pass
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class TDXAsyncConcurrencyLimiter(TDXConcurrencyLimiter):
+    """
+    The same adaptive limiter, for the coroutines of an async integration. acquire() is a coroutine that waits
+    for a slot without blocking the event loop. Waiting coroutines are woken with futures of the running loop,
+    so nothing is tied to the loop the limiter was made in.
+    """
+
+    def __init__(self, *args, **kwargs):
+        TDXConcurrencyLimiter.__init__(self, *args, **kwargs)
+        self._waiters = []
+
+    async def acquire(self, timeout: float = None, lane: str = None) -> bool:
+        """
+        Waits for a free slot.
+
+        :param timeout: most seconds to wait (Default: wait as long as it takes)
+        :param lane: tdx_priority.INTERACTIVE or tdx_priority.BULK (Default: the lane of the current context)
+
+        :return: True once a slot is taken, or False if timeout passed first
+
+        :rtype: bool
+
+        """
+        if lane is None:
+            lane = tdxlib.tdx_priority.current()
+        loop = asyncio.get_running_loop()
+        give_up = None if timeout is None else loop.time() + timeout
+        interactive = lane != tdxlib.tdx_priority.BULK
+        with self._condition:
+            if interactive:
+                self.interactive_waiting += 1
+        try:
+            while not self._has_room(lane):
+                left = None if give_up is None else give_up - loop.time()
+                if left is not None and left <= 0:
+                    return False
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+                try:
+                    await asyncio.wait_for(waiter, left)
+                except asyncio.TimeoutError:
+                    return False
+                finally:
+                    self._waiters.remove(waiter)
+            with self._condition:
+                self.in_flight += 1
+            return True
+        finally:
+            if interactive:
+                with self._condition:
+                    self.interactive_waiting -= 1
+                    self._wake()
+
+    def _wake(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+def limiter_from_config(config) -> TDXConcurrencyLimiter:
+    """
+    Builds the concurrency limiter for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXConcurrencyLimiter
+
+    :rtype: TDXConcurrencyLimiter
+
+    """
+    return TDXConcurrencyLimiter(initial=config.concurrency, maximum=config.max_concurrency)
@@ -17,6 +17,11 @@ class TDXConfig:
         self.timezone = None
         self.log_level = None
         self.caching = True
+        self.cache_ttl = None
+        self.cache_max_entries = None
+        self.cache_region_ttls = None
+        self.reference_cache = None
+        self.reference_cache_ttl = None
         self.sandbox = True
         self.username = None
         self.password = None
@@ -26,6 +31,38 @@ class TDXConfig:
         self.asset_app_id = None
         self.client_portal_app_id = None
         self.full_host = None
+        self.pool_connections = None
+        self.pool_maxsize = None
+        self.pool_block = False
+        self.keep_alive = True
+        self.rate_limit_burst = None
+        self.rate_limit_skew = None
+        self.rate_limit_store = None
+        self.rate_limit_owner = None
+        self.retries = None
+        self.retry_backoff = None
+        self.retry_backoff_max = None
+        self.retry_writes = False
+        self.connect_timeout = None
+        self.read_timeout = None
+        self.token_cache = None
+        self.background_token_refresh = False
+        self.token_refresh_margin = None
+        self.json_codec = None
+        self.stream_chunk_size = None
+        self.coalesce_gets = True
+        self.transport = None
+        self.concurrency = None
+        self.max_concurrency = None
+        self.bulk_reserve = None
+        self.circuit_breaker_threshold = None
+        self.circuit_breaker_cooldown = None
+        self.metrics = True
+        self.tracing = None
+        self.record_file = None
+        self.replay_file = None
+        self.replay_latency_scale = None
+        self.replay_rate_limit = None
 
         if config:
             self.set_config_from_dict(config)
@@ -113,10 +150,48 @@ class TDXConfig:
         if not self.client_portal_app_id:
             self.client_portal_app_id = self.get_value('clientPortalAppId')
         self.caching = self.get_value('caching', bool)
+        self.cache_ttl = self.get_value('cache_ttl')
+        self.cache_max_entries = self.get_value('cache_max_entries')
+        self.cache_region_ttls = self.get_value('cache_region_ttls')
+        self.reference_cache = self.get_value('reference_cache')
+        self.reference_cache_ttl = self.get_value('reference_cache_ttl')
         self.timezone = self.get_value('timezone')
         self.full_host = self.get_value('full_host')
         if not self.full_host:
             self.full_host = self.get_value('fullhost')
+        self.pool_connections = self.get_value('pool_connections')
+        self.pool_maxsize = self.get_value('pool_maxsize')
+        self.pool_block = self.get_value('pool_block')
+        self.keep_alive = self.get_value('keep_alive')
+        self.rate_limit_burst = self.get_value('rate_limit_burst')
+        self.rate_limit_skew = self.get_value('rate_limit_skew')
+        self.rate_limit_store = self.get_value('rate_limit_store')
+        self.rate_limit_owner = self.get_value('rate_limit_owner')
+        self.retries = self.get_value('retries')
+        self.retry_backoff = self.get_value('retry_backoff')
+        self.retry_backoff_max = self.get_value('retry_backoff_max')
+        self.retry_writes = self.get_value('retry_writes')
+        self.connect_timeout = self.get_value('connect_timeout')
+        self.read_timeout = self.get_value('read_timeout')
+        self.token_cache = self.get_value('token_cache')
+        self.background_token_refresh = self.get_value('background_token_refresh')
+        self.token_refresh_margin = self.get_value('token_refresh_margin')
+        self.json_codec = self.get_value('json_codec')
+        self.stream_chunk_size = self.get_value('stream_chunk_size')
+        self.coalesce_gets = self.get_value('coalesce_gets')
+        self.transport = self.get_value('transport')
+        self.concurrency = self.get_value('concurrency')
+        self.max_concurrency = self.get_value('max_concurrency')
+        self.bulk_reserve = self.get_value('bulk_reserve')
+        self.circuit_breaker_threshold = self.get_value('circuit_breaker_threshold')
+        self.circuit_breaker_cooldown = self.get_value('circuit_breaker_cooldown')
+        self.metrics = self.get_value('metrics')
+        self.tracing = self.get_value('tracing')
+        self.record_file = self.get_value('record_file')
+        self.replay_file = self.get_value('replay_file')
+        self.replay_latency_scale = self.get_value('replay_latency_scale')
+        self.replay_rate_limit = self.get_value('replay_rate_limit')
+
     def setup_from_attributes(self):
         if not self.timezone:
             self.timezone = 'Z'
@@ -127,6 +202,9 @@ class TDXConfig:
             api_end = '/TDWebApi/api'
         if not self.full_host:
             self.api_url = 'https://' + self.org_name + '.teamdynamix.com' + api_end
+        elif '://' in self.full_host:
+            # A full_host with a scheme, such as http://localhost:8080 for a local stub server
+            self.api_url = self.full_host.rstrip('/') + api_end
         else:
             self.api_url = 'https://' + self.full_host + api_end
 
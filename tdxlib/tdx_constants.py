@@ -24,11 +24,44 @@ default_config = {
     # 'password': '',
     # 'ticket_app_id': '',
     # 'asset_app_id': '',
-    'caching': False,
+    'caching': True,
+    'cache_ttl': 3600.0,
+    'cache_max_entries': 1000,
+    'reference_cache_ttl': 86400.0,
     'timezone': '-0500',
     'log_level': 'ERROR',
     # 'full_host': '',
-    'filename': 'tdxlib.ini'
+    'filename': 'tdxlib.ini',
+    'pool_connections': 10,
+    'pool_maxsize': 10,
+    'pool_block': False,
+    'keep_alive': True,
+    'rate_limit_burst': 5,
+    'rate_limit_skew': 1.0,
+    'rate_limit_store': 'memory',
+    'retries': 3,
+    'retry_backoff': 0.5,
+    'retry_backoff_max': 30.0,
+    'retry_writes': False,
+    'connect_timeout': 10.0,
+    'read_timeout': 60.0,
+    'background_token_refresh': False,
+    'token_refresh_margin': 300.0,
+    'json_codec': 'auto',
+    'stream_chunk_size': 65536,
+    'coalesce_gets': True,
+    'transport': 'http1',
+    'concurrency': 4,
+    'max_concurrency': 10,
+    'bulk_reserve': 0.2,
+    'circuit_breaker_threshold': 5,
+    'circuit_breaker_cooldown': 30.0,
+    'metrics': True,
+    'tracing': 'none',
+    'record_file': None,
+    'replay_file': None,
+    'replay_latency_scale': 0.0,
+    'replay_rate_limit': 0
 }
 
 config_keys = {
@@ -49,13 +82,50 @@ config_keys = {
     'assetAppId': str,
     'client_portal_app_id': str,
     'caching': bool,
+    'cache_ttl': float,
+    'cache_max_entries': int,
+    'cache_region_ttls': str,
+    'reference_cache': str,
+    'reference_cache_ttl': float,
     'timezone': str,
     'log_level': str,
     # backwards compatibility
     'logLevel': str,
     # backwards compatibility
     'fullhost': str,
-    'full_host': str
+    'full_host': str,
+    'pool_connections': int,
+    'pool_maxsize': int,
+    'pool_block': bool,
+    'keep_alive': bool,
+    'rate_limit_burst': int,
+    'rate_limit_skew': float,
+    'rate_limit_store': str,
+    'rate_limit_owner': str,
+    'retries': int,
+    'retry_backoff': float,
+    'retry_backoff_max': float,
+    'retry_writes': bool,
+    'connect_timeout': float,
+    'read_timeout': float,
+    'token_cache': str,
+    'background_token_refresh': bool,
+    'token_refresh_margin': float,
+    'json_codec': str,
+    'stream_chunk_size': int,
+    'coalesce_gets': bool,
+    'transport': str,
+    'concurrency': int,
+    'max_concurrency': int,
+    'bulk_reserve': float,
+    'circuit_breaker_threshold': int,
+    'circuit_breaker_cooldown': float,
+    'metrics': bool,
+    'tracing': str,
+    'record_file': str,
+    'replay_file': str,
+    'replay_latency_scale': float,
+    'replay_rate_limit': int
 }
 
 default_filename = "tdxlib.ini"
@@ -0,0 +1,82 @@
+import contextlib
+import contextvars
+import time
+from typing import Optional
+
+
+# Monotonic time by which the current operation has to finish, or None if there is no deadline
+_deadline = contextvars.ContextVar('tdx_deadline', default=None)
+
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Sets a deadline for every TDX request made inside the block, including requests made by compound operations
+    such as update_assets(). Requests are given timeouts that end at the deadline, failed requests aren't retried
+    past it, and compound operations stop and return what they have so far once it passes.
+
+    Deadlines nest: an inner deadline can shorten the outer one, but never extend it. The deadline is carried in a
+    context variable, so it follows the code into asyncio tasks created inside the block.
+
+    :param seconds: seconds from now until the deadline, or None for no (additional) deadline
+
+    """
+    if seconds is None:
+        yield _deadline.get()
+        return
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        new_deadline = min(new_deadline, current)
+    token = _deadline.set(new_deadline)
+    try:
+        yield new_deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Reports how long the current operation has left.
+
+    :return: seconds until the deadline (0 if it has passed), or None if there is no deadline
+
+    :rtype: float
+
+    """
+    current = _deadline.get()
+    if current is None:
+        return None
+    return max(current - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    """
+    Checks whether the current deadline has passed.
+
+    :return: True if there is a deadline and it has passed
+
+    :rtype: bool
+
+    """
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """
+    Shortens a timeout so it doesn't run past the current deadline.
+
+    :param timeout: a timeout in seconds, or None for no timeout
+
+    :return: the shorter of the timeout and the time left before the deadline
+
+    :rtype: float
+
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if timeout is None:
+        return left
+    return min(timeout, left)
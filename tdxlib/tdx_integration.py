@@ -1,27 +1,111 @@
 import requests
 import json
 import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_cache
+import tdxlib.tdx_circuit_breaker
+import tdxlib.tdx_concurrency
 import tdxlib.tdx_constants
 import tdxlib.tdx_config
+import tdxlib.tdx_deadline
+import tdxlib.tdx_json
+import tdxlib.tdx_metrics
+import tdxlib.tdx_priority
+import tdxlib.tdx_transport
+import tdxlib.tdx_rate_limit
+import tdxlib.tdx_replay
+import tdxlib.tdx_request
+import tdxlib.tdx_retry
+import tdxlib.tdx_single_flight
+import tdxlib.tdx_stream
+import tdxlib.tdx_token_cache
+import tdxlib.tdx_token_refresh
+import tdxlib.tdx_tracing
+import concurrent.futures
+import contextvars
 import datetime
+import functools
+import threading
 import time
 from typing import BinaryIO
 import jwt
 import logging
 
 
+@tdxlib.tdx_tracing.traced
 class TDXIntegration:
     component_ids = tdxlib.tdx_constants.component_ids
+    # Returned by functions passed to _run_concurrently() for items they didn't get to
+    _SKIPPED = object()
 
     def __init__(self, filename: str = None, config: dict = None, skip_initial_auth: bool = False):
         self.cache = dict()
         self.logger = logging.getLogger('tdx_integration')
         self.config = tdxlib.tdx_config.TDXConfig(filename, config)
         self.setup_logs()
+        self.tracer = tdxlib.tdx_tracing.tracer_from_config(self.config)
+        self.transport = self.setup_transport()
+        self.rate_limiter = tdxlib.tdx_rate_limit.limiter_from_config(self.config)
+        self.concurrency = tdxlib.tdx_concurrency.limiter_from_config(self.config)
+        self.circuit_breaker = tdxlib.tdx_circuit_breaker.breaker_from_config(self.config)
+        self.retry_policy = tdxlib.tdx_retry.policy_from_config(self.config)
+        self.token_cache = tdxlib.tdx_token_cache.cache_from_config(self.config)
+        self.codec = tdxlib.tdx_json.codec_from_config(self.config)
+        self.single_flight = tdxlib.tdx_single_flight.TDXSingleFlight()
+        self.metrics = tdxlib.tdx_metrics.metrics_from_config(self.config)
+        self.metrics.add_collector(self._collect_metrics)
+        self.token_refresher = None
+        self._auth_lock = threading.Lock()
         self.clean_cache()
         if not skip_initial_auth:
             self.check_auth_init()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def setup_transport(self) -> tdxlib.tdx_transport.TDXTransport:
+        """
+        Builds the pooled HTTP transport shared by all requests this integration makes, using the transport and
+        pool settings from the configuration. If replay_file is set, recorded responses are served from it instead,
+        and if record_file is set, every request and response is recorded to it.
+
+        :return: a TDXTransport object (or a TDXHTTP2Transport, if transport is set to http2, or a
+                 TDXReplayTransport or TDXRecordingTransport)
+
+        :rtype: tdxlib.tdx_transport.TDXTransport
+
+        """
+        if self.config.replay_file:
+            return tdxlib.tdx_replay.replay_from_config(self.config)
+        if self.config.transport == 'http2':
+            transport = tdxlib.tdx_transport.TDXHTTP2Transport(pool_maxsize=self.config.pool_maxsize,
+                                                               keep_alive=self.config.keep_alive)
+        elif self.config.transport not in (None, '', 'http1'):
+            raise ValueError(f"Unknown transport {self.config.transport}. Use http1 or http2.")
+        else:
+            transport = tdxlib.tdx_transport.TDXTransport(pool_connections=self.config.pool_connections,
+                                                          pool_maxsize=self.config.pool_maxsize,
+                                                          pool_block=self.config.pool_block,
+                                                          keep_alive=self.config.keep_alive)
+        if self.config.record_file:
+            return tdxlib.tdx_replay.TDXRecordingTransport(transport, self.config.record_file)
+        return transport
+
+    def close(self):
+        """
+        Closes the pooled connections held by this integration, and stops the background token refresher if one
+        is running. The integration can also be used as a context manager, which closes it on exit.
+
+        :return: None
+
+        """
+        if self.token_refresher:
+            self.token_refresher.stop()
+            self.token_refresher = None
+        self.transport.close()
+
     def setup_logs(self):
         if self.config.log_level:
             self.logger = logging.getLogger('tdx_integration')
@@ -31,6 +115,8 @@ class TDXIntegration:
         if not self.config.auth_type or self.config.auth_type == 'password':
             if not self.auth():
                 self.logger.error(f"Login Failed. Username or password in {self.config.filename} likely incorrect.")
+            else:
+                self._start_token_refresh()
         elif self.config.auth_type == 'token':
             if self.config.token is None:
                 self.config.token_exp = time.time()
@@ -42,14 +128,20 @@ class TDXIntegration:
     def set_token(self, token: str):
         self.config.token = token
 
-    def auth(self) -> bool:
+    def auth(self, use_cache: bool = True) -> bool:
         """
         Internal method to authenticate to the TDX api using the selected method
         Stores a token in the token property, used for future calls. Returns true for success, false for failure.
+        If token_cache is configured (and use_cache is True), a still-valid token from an earlier run is reused
+        instead.
         """
         if not self.config.auth_type or self.config.auth_type == 'password':
+            if use_cache and self.token_cache and self.token_cache.load(self.config):
+                return True
+            started = time.monotonic()
             try:
-                response = requests.post(
+                response = self.transport.request(
+                    'POST',
                     url=str(self.config.api_url) + '/auth',
                     headers={
                         "Content-Type": "application/json; charset=utf-8",
@@ -57,24 +149,29 @@ class TDXIntegration:
                     data=json.dumps({
                         "username": self.config.username,
                         "password": self.config.password
-                    })
+                    }),
+                    timeout=self._request_timeout()
                 )
+                self.metrics.record_auth(response.status_code, time.monotonic() - started)
                 if response.status_code != 200:
                     raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(" Response code: " + str(response.status_code) +
                                                                     " " + response.reason + " " + " Returned: " +
                                                                     response.text)
                 else:
                     self.config.token = response.text
-                    time.sleep(1)
                     # Decode token to identify expiration date
                     decoded = jwt.decode(self.config.token,
                                          algorithms=['HS256'],
                                          options={'verify_signature': False},
                                          audience="https://www.teamdynamix.com/")
                     self.config.token_exp = decoded['exp']
+                    if self.token_cache:
+                        self.token_cache.save(self.config)
                     return True
 
             except requests.exceptions.RequestException as e:
+                self.metrics.record_auth(tdxlib.tdx_retry.classify_error(e) or 'error',
+                                        time.monotonic() - started)
                 self.logger.warning(f"Auth request Failed. Exception: {str(e)}")
                 return False
             except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
@@ -94,135 +191,373 @@ class TDXIntegration:
         else:
             return False
 
+    def _invalidate_token(self):
+        """
+        Internal method to forget the current token (and its cached copy) after TDX rejects it, so the next
+        request authenticates again.
+        """
+        self.config.token_exp = None
+        if self.token_cache:
+            self.token_cache.clear(self.config)
+
     def _check_auth_exp(self) -> bool:
         """
         Internal method to check the expiration of the stored access token.
-        If it is expired, call auth() to get a new token.
+        If it is expired, call auth() to get a new token. Only one thread renews the token at a time; the others
+        wait for it and use the new token.
         """
         # If token is expired or will expire in the next minute, get new token
-        if self.config.token_exp:
-            if self.config.token_exp < time.time() + 60:
+        if self.config.token_exp and self.config.token_exp >= time.time() + 60:
+            return True
+        with self._auth_lock:
+            # Another thread may have renewed the token while we waited for the lock
+            if self.config.token_exp and self.config.token_exp >= time.time() + 60:
+                return True
+            if self.config.token_exp:
                 self.logger.info(f"Token expires at {str(datetime.datetime.utcfromtimestamp(self.config.token_exp))}. "
                                  f"Getting new token...")
-                return self.auth()
-            else:
+            authenticated = self.auth()
+        if authenticated:
+            self._start_token_refresh()
+        return authenticated
+
+    def _start_token_refresh(self):
+        """
+        Internal method to start renewing the token in the background, if background_token_refresh is set.
+        """
+        if self.token_refresher or not self.config.background_token_refresh:
+            return
+        if self.config.auth_type and self.config.auth_type != 'password':
+            return
+        self.token_refresher = tdxlib.tdx_token_refresh.TDXTokenRefresher(self, self.config.token_refresh_margin)
+        self.token_refresher.start()
+
+    def _refresh_token(self, margin: float) -> bool:
+        """
+        Internal method used by the background refresher to renew the token before it gets within margin seconds
+        of expiring. Shares the auth lock with _check_auth_exp(), so a token is never renewed twice.
+        """
+        with self._auth_lock:
+            if self.config.token_exp and self.config.token_exp >= time.time() + margin:
                 return True
-        else:
-            return self.auth()
+            # Another process may have renewed it already
+            if self.token_cache and self.token_cache.load(self.config, min_validity=margin):
+                return True
+            self.logger.info("Renewing token in the background...")
+            return self.auth(use_cache=False)
 
-    def _rate_limit(self, skew_mitigation_secs=5):
+    def _rate_limit(self, request_url: str = None):
         """
-        Internal method to check the rate-limited headers from TDX.
-        If the rate-limiting is within 1 request of sending a 429, will sleep until the timer resets.
+        Internal method to pace requests according to the rate-limit headers from TDX.
+        Sleeps just long enough to spread the remaining budget evenly over the rest of the rate-limit window.
         """
-        if 'remaining' in self.cache['rate_limit']:
-            if not self.cache['rate_limit']['remaining'] > 1:
-                if 'reset_time' in self.cache['rate_limit']:
-                    reset_datetime = datetime.datetime.strptime(self.cache['rate_limit']['reset_time'],
-                                                                '%a, %d %b %Y %H:%M:%S GMT')
-                    now = datetime.datetime.utcnow()
-                    if reset_datetime > now:
-                        difference = reset_datetime - now
-                        sleep_time = difference + datetime.timedelta(0, skew_mitigation_secs)
-                        self.logger.info("Rate-limited by TeamDynamix. Sleeping "
-                                         + str(sleep_time.seconds) + " seconds.")
-                        time.sleep(sleep_time.seconds)
+        wait = self.rate_limiter.acquire(request_url)
+        if wait > 0:
+            self.metrics.record_rate_limit_wait(tdxlib.tdx_metrics.endpoint_template(request_url or ''), wait)
+        if wait >= 1:
+            self.logger.info(f"Rate-limited by TeamDynamix. Slept {wait:.1f} seconds.")
 
-    def make_get(self, request_url: str, retries: int = 3):
+    def _update_rate_limit(self, response, request_url: str):
         """
-        Makes an HTTP GET request to the TDX Api.
+        Internal method to record the rate-limit headers from a TDX response.
+        """
+        # update() hands back the budget it wrote, so there's no need for a second transaction to read it
+        budget = self.rate_limiter.update(response.headers, request_url)
+        if budget is None:
+            return
+        self.cache['rate_limit'].update({k: budget.get(k) for k in ['remaining', 'limit', 'last_url']})
+        if 'X-RateLimit-Reset' in response.headers:
+            self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
+
+    def rate_limit_state(self) -> dict:
+        """
+        Reports the current TDX rate-limit budget, as seen by this integration.
+
+        :return: dict with the limit, remaining requests, seconds until the window resets ('reset_in'), the
+                 current spacing between requests ('interval'), and seconds until the next request may be sent
+
+        :rtype: dict
+
+        """
+        return self.rate_limiter.state()
+
+    def rate_limit_usage(self, since: float = None) -> list:
+        """
+        Reports which processes have consumed the shared TDX rate-limit budget. Only available when rate_limit_store
+        is a SQLite database; the in-memory store doesn't keep a history.
+
+        :param since: only count requests after this unix timestamp (Default: the whole retained log, one day)
+
+        :return: list of dicts with the owner (host:pid:script, or rate_limit_owner), number of requests, seconds
+                 spent waiting for the rate limit, and the time of the owner's last request
+
+        :rtype: list
+
+        """
+        return self.rate_limiter.usage(since)
+
+    def deadline(self, seconds: float):
+        """
+        Sets a deadline for everything done inside a with block. Requests time out at the deadline, aren't
+        retried past it, and bulk operations (such as update_assets() or edit_tickets()) stop and return
+        partial results once it passes.
+
+            >>> with tdx.deadline(300):
+            ...     tdx.update_assets(assets, {'StatusID': retired_id})
+
+        :param seconds: seconds from now until the deadline
+
+        :return: a context manager
+
+        """
+        return tdxlib.tdx_deadline.deadline(seconds)
+
+    def priority(self, lane: str):
+        """
+        Puts every request made inside a with block into a priority lane. Interactive requests (the default) get
+        ahead of bulk ones when waiting for the rate limit or a free request slot, and bulk requests leave a share
+        of the rate-limit budget (bulk_reserve in the config) for interactive ones. Bulk operations such as
+        update_assets() and edit_tickets() use the bulk lane unless they are called inside a priority block.
+
+            >>> with tdx.priority('bulk'):
+            ...     nightly_reconciliation(tdx)
+
+        :param lane: 'interactive' or 'bulk'
+
+        :return: a context manager
+
+        """
+        return tdxlib.tdx_priority.priority(lane)
+
+    def _request_timeout(self, timeout: float = None):
+        """
+        Internal method to work out the (connect, read) timeout for a request, from the config or a per-call
+        override, shortened so it doesn't run past the current deadline.
+        """
+        if timeout is not None:
+            return tdxlib.tdx_deadline.clamp(timeout)
+        return (tdxlib.tdx_deadline.clamp(self.config.connect_timeout),
+                tdxlib.tdx_deadline.clamp(self.config.read_timeout))
+
+    def _run_concurrently(self, function, items: list) -> list:
+        """
+        Internal method that calls function(item) for each item on a pool of up to max_concurrency threads, and
+        returns the results in the same order as items. The concurrency limiter decides how many requests are
+        actually in flight at a time. The current deadline and priority carry over into the threads, and the work
+        goes in the bulk lane unless the caller chose a lane. Items that haven't started when the deadline passes are
+        skipped, and so are items for which function returns _SKIPPED. Skipped items are left out of the results.
+        If function raises, the items not yet started are cancelled and the exception is raised here.
+        """
+        def run(item):
+            if tdxlib.tdx_deadline.expired():
+                return self._SKIPPED
+            return function(item)
+
+        with tdxlib.tdx_priority.priority(tdxlib.tdx_priority.BULK, override=False):
+            if len(items) <= 1 or self.config.max_concurrency <= 1:
+                results = [run(item) for item in items]
+            else:
+                pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(self.config.max_concurrency, len(items)), thread_name_prefix='tdxlib')
+                futures = []
+                try:
+                    # Each task gets its own copy of the caller's context, so the deadline and priority apply in the
+                    # threads too
+                    for item in items:
+                        futures.append(pool.submit(contextvars.copy_context().run, run, item))
+                    results = [future.result() for future in futures]
+                finally:
+                    # Cancelling by hand, since shutdown(cancel_futures=True) needs Python 3.9
+                    for future in futures:
+                        future.cancel()
+                    pool.shutdown()
+        return [result for result in results if result is not self._SKIPPED]
+
+    def circuit_state(self) -> dict:
+        """
+        Reports the state of the circuit breaker for each family of endpoints (such as tickets, assets or people)
+        this integration has called. A family's circuit opens after circuit_breaker_threshold failures in a row,
+        and requests to it raise TdxApiCircuitOpenError until circuit_breaker_cooldown seconds have passed and a
+        probe request succeeds.
+
+        :return: dict of endpoint family to a dict with the state ('closed', 'open' or 'half_open'), failures in a
+                 row, number of times the circuit has opened, requests refused, and seconds until the next probe
+
+        :rtype: dict
+
+        """
+        return self.circuit_breaker.state()
+
+    def _collect_metrics(self) -> list:
+        """
+        Internal method that reports the current circuit breaker, concurrency, rate-limit and cache gauges to the
+        metrics registry when it's read.
+        """
+        gauges = tdxlib.tdx_metrics.circuit_gauges(self.circuit_breaker)
+        gauges.append(('tdxlib_concurrency_limit', {}, self.concurrency.limit))
+        gauges.append(('tdxlib_requests_in_flight', {}, self.concurrency.in_flight))
+        remaining = self.rate_limiter.state()['remaining']
+        if remaining is not None:
+            gauges.append(('tdxlib_rate_limit_remaining', {}, remaining))
+        gauges.extend(tdxlib.tdx_metrics.cache_gauges(self.cache))
+        return gauges
+
+    def metrics_text(self) -> str:
+        """
+        Exports the request metrics of this integration (request counts and latencies per endpoint, bytes sent and
+        received, retries, time spent waiting for the rate limit, and circuit breaker state) in the Prometheus
+        text format. Use self.metrics.snapshot() to read them as a dict instead, or
+        self.metrics.start_http_server(port) to let Prometheus scrape them.
+
+        :return: the metrics, in the Prometheus text exposition format
+
+        :rtype: str
+
+        """
+        return self.metrics.to_prometheus()
+
+    def _make_request(self, method: str, request_url: str, ok_codes: list, body=None, files: dict = None,
+                      retries: int = None, timeout: float = None, raw: bool = False,
+                      label: str = None, stream: bool = False, stream_key: str = None):
+        """
+        Internal method that sends a request to the TDX API, retrying according to the retry policy.
+        Failures (including running out of time before the current deadline) are logged and None is returned
+        for them. Requests to endpoints whose circuit breaker is open raise TdxApiCircuitOpenError instead.
+        With raw=True, the response body is returned as bytes instead of being decoded. With stream=True, a
+        generator is returned that decodes the elements of the array in the response (or the array under
+        stream_key) as they arrive; it holds its connection and concurrency slot until it has been read to the end
+        or closed. Every attempt, and the call as a whole, is recorded in self.metrics, and the call is traced as
+        a span with its endpoint template, status and retries. Everything but sending the request and waiting
+        between attempts is shared with TDXAsyncIntegration, in tdx_request.TDXRequest.
+        """
+        with tdxlib.tdx_request.TDXRequest(self, method, request_url, ok_codes, body=body, files=files,
+                                           retries=retries, label=label, stream=stream,
+                                           transport_errors=(requests.exceptions.RequestException,)) as call:
+            while call.begin():
+                self._rate_limit(request_url)
+                response = None
+                try:
+                    if not (self._check_auth_exp()):
+                        raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
+                            f"Login Failed. Username or password in config likely incorrect.")
+                    headers = call.headers(self.config.token)
+                    request_args = {'stream': True} if stream else {}
+                    if not self.concurrency.acquire(tdxlib.tdx_deadline.remaining()):
+                        call.out_of_time("Deadline passed while waiting for other requests to finish.")
+                        return None
+                    started = time.monotonic()
+                    try:
+                        response = self.transport.request(method, url=call.url, headers=headers, data=call.data,
+                                                          files=files, timeout=self._request_timeout(timeout),
+                                                          **request_args)
+                    except BaseException as e:
+                        self.concurrency.release(error_kind=call.failed(e, time.monotonic() - started))
+                        raise
+                    latency = time.monotonic() - started
+                    call.answered(response, latency)
+                    response_stream = None
+                    if stream and call.ok(response):
+                        # The body is still to be downloaded, so the slot stays taken until the stream is done
+                        response_stream = tdxlib.tdx_stream.TDXResponseStream(
+                            self._stream_response(response, request_url, stream_key, call.label),
+                            functools.partial(self._close_stream, response, latency))
+                    else:
+                        self.concurrency.release(latency, response.status_code, response.headers)
+                    self._update_rate_limit(response, request_url)
+                    if call.reauthenticate(response):
+                        if stream:
+                            response.close()
+                        continue
+                    call.check(response)
+                    if stream:
+                        return response_stream
+                    return call.decode(response, raw)
+                except call.errors as e:
+                    delay = call.retry_delay(e, response)
+                if delay is None:
+                    return None
+                time.sleep(delay)
+        return None
+
+    def _stream_response(self, response, request_url: str, stream_key: str = None, label: str = 'GET'):
+        """
+        Internal generator that decodes array elements from a streamed response as they arrive. A connection that
+        drops partway through raises TdxApiHTTPError, so a truncated list is never mistaken for a complete one.
+        The TDXResponseStream wrapped around it closes the response.
+        """
+        template = tdxlib.tdx_metrics.endpoint_template(request_url)
+
+        def chunks():
+            for chunk in response.iter_content(chunk_size=self.config.stream_chunk_size):
+                self.metrics.record_received(label, template, len(chunk))
+                yield chunk
+
+        try:
+            yield from tdxlib.tdx_stream.iter_json_array(chunks(), key=stream_key, codec=self.codec)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            message = f"Streamed response from {label} to {request_url} failed partway through. {str(e)}"
+            self.logger.error(message)
+            raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(message)
+
+    def _close_stream(self, response, latency: float):
+        """
+        Internal method that closes a streamed response, and gives up the concurrency slot it held.
+        """
+        try:
+            response.close()
+        finally:
+            self.concurrency.release(latency, response.status_code, response.headers)
+
+    def make_get(self, request_url: str, retries: int = None, timeout: float = None, raw: bool = False,
+                 stream: bool = False, stream_key: str = None):
+        """
+        Makes an HTTP GET request to the TDX Api. If another thread is already getting the same URL, this waits for
+        its result instead of sending a duplicate request (unless coalesce_gets is turned off in the config).
 
         :param request_url: the path (everything after /TDWebAPI/api/) to call
-        :param retries: the number of times to retry a failed request (defaults to 3)
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+        :param raw: return the response body as undecoded JSON bytes, for passing straight through (Default: False)
+        :param stream: return an iterator (a TDXResponseStream) that yields the elements of the array in the
+                       response as they are downloaded, instead of waiting for the whole response (Default: False)
+        :param stream_key: with stream, the key in the response object whose array should be streamed, if the
+                           response isn't an array itself (Default: None)
 
-        :return: the API's response as a python dict or list
+        :return: the API's response as a python dict or list (or bytes, if raw is True, or a TDXResponseStream, if
+                 stream is True)
 
         """
-        self._rate_limit()
-        get_url = self.config.api_url + request_url
-        response = None
-        attempts = 0
-        while attempts < retries:
-            try:
-                if not (self._check_auth_exp()):
-                    raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                        f"Login Failed. Username or password in config likely incorrect.")
-                response = requests.get(
-                    url=get_url,
-                    headers={
-                        "Authorization": 'Bearer ' + self.config.token,
-                        "Content-Type": "application/json; charset=utf-8",
-                    }
-                )
-                if response.status_code != 200:
-                    err_string = " Response code: " + str(response.status_code) + \
-                        " " + response.reason + " " + " Returned: " + response.text
-                    raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(err_string)
-                val = response.json()
-                self.cache['rate_limit']['remaining'] = int(response.headers['X-RateLimit-Remaining'])
-                self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
-                self.cache['rate_limit']['limit'] = int(response.headers['X-RateLimit-Limit'])
-                self.cache['rate_limit']['last_url'] = request_url
-                return val
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"GET to {request_url} failed. Exception: {str(e)}")
-            except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
-                self.logger.error(f"GET to {request_url} returned non-success code. {str(e)}")
-            except json.decoder.JSONDecodeError:
-                message = 'Invalid JSON received from ' + get_url + ':'
-                if response:
-                    message += response.text
-                self.logger.error(f"{message}")
-            finally:
-                attempts += 1
+        if raw or stream or not self.config.coalesce_gets:
+            return self._make_request('GET', request_url, [200], retries=retries, timeout=timeout, raw=raw,
+                                      stream=stream, stream_key=stream_key)
+        return self.single_flight.do(request_url, self._make_request, 'GET', request_url, [200], retries=retries,
+                                     timeout=timeout)
 
-    def make_post(self, request_url: str, body: dict):
+    def make_post(self, request_url: str, body: dict, retries: int = None, timeout: float = None,
+                  raw: bool = False, stream: bool = False, stream_key: str = None):
         """
-        Makes an HTTP POST request to the TDX Api
+        Makes an HTTP POST request to the TDX Api. POSTs are only retried when TDX can't have acted on them,
+        unless retry_writes is set in the config.
 
         :param request_url: the path (everything after /TDWebAPI/api/) to call
         :param body: dumped JSON data to send with the POST
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
+        :param raw: return the response body as undecoded JSON bytes, for passing straight through (Default: False)
+        :param stream: return an iterator (a TDXResponseStream) that yields the elements of the array in the
+                       response as they are downloaded, instead of waiting for the whole response (Default: False)
+        :param stream_key: with stream, the key in the response object whose array should be streamed, if the
+                           response isn't an array itself (Default: None)
 
-        :return: the API's response as a python dict or list
+        :return: the API's response as a python dict or list (or bytes, if raw is True, or a TDXResponseStream, if
+                 stream is True)
 
         """
-        self._rate_limit()
-        post_url = self.config.api_url + request_url
-        response = None
-        try:
-            if not (self._check_auth_exp()):
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    f"Login Failed. Username or password in config likely incorrect.")
-            response = requests.post(
-                url=post_url,
-                headers={
-                    "Authorization": 'Bearer ' + self.config.token,
-                    "Content-Type": "application/json; charset=utf-8",
-                },
-                data=json.dumps(body))
-            if response.status_code not in [200, 201]:
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    " Response code: " + str(response.status_code) + " " +
-                    response.reason + "\n" + "Returned: " + response.text)
-            if len(response.text) == 0:
-                val = None
-            else:
-                val = response.json()
-            self.cache['rate_limit']['remaining'] = int(response.headers['X-RateLimit-Remaining'])
-            self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
-            self.cache['rate_limit']['limit'] = int(response.headers['X-RateLimit-Limit'])
-            return val
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"POST to {request_url} failed. Exception: {str(e)}")
-        except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
-            self.logger.error(f"POST to {request_url} returned non-success code. {str(e)}")
-        except json.decoder.JSONDecodeError:
-            message = 'Invalid JSON received POST to ' + post_url + ':\n'
-            if response:
-                message += response.text
-            self.logger.error(f"{message}")
-
-    def make_file_post(self, request_url: str, file: BinaryIO, filename: str = None):
+        return self._make_request('POST', request_url, [200, 201], body=body, retries=retries, timeout=timeout,
+                                  raw=raw, stream=stream, stream_key=stream_key)
+
+    def make_file_post(self, request_url: str, file: BinaryIO, filename: str = None, retries: int = None,
+                       timeout: float = None):
         """
         Makes an HTTP POST request to the TDX Api with a Multipart-Encoded File
         
@@ -233,124 +568,47 @@ class TDXIntegration:
         from passed-in file object.
         This is useful for if you want to upload a file in memory without a filename, which is required
         for uploading to TeamDynamix.
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
 
         :return: the API's response as a python dict
         """
-        self._rate_limit()
-        post_url = self.config.api_url + request_url
-        response = None
         if filename:
             files = {'file': (filename, file)}
         else:
             files = {'file': file}
-        try:
-            if not (self._check_auth_exp()):
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    f"Login Failed. Username or password in config likely incorrect.")
-            response = requests.post(
-                url=post_url,
-                headers={
-                    "Authorization": 'Bearer ' + self.config.token,
-                },
-                files=files
-            )
-            if response.status_code not in [200, 201]:
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    " Response code: " + str(response.status_code) + " " +
-                    response.reason + "\n" + "Returned: " + response.text)
-            val = response.json()
-            self.cache['rate_limit']['remaining'] = int(response.headers['X-RateLimit-Remaining'])
-            self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
-            self.cache['rate_limit']['limit'] = int(response.headers['X-RateLimit-Limit'])
-            return val
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"POST File to {request_url} failed. Exception: {str(e)}")
-        except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
-            self.logger.error(f"POST File to {request_url} returned non-success code. {str(e)}")
-        except json.decoder.JSONDecodeError:
-            message = 'Invalid JSON received from POSTing File to ' + request_url + ':\n'
-            if response:
-                message += response.text
-            self.logger.error(f"{message}")
-
-    def make_put(self, request_url: str, body: dict):
+        return self._make_request('POST', request_url, [200, 201], files=files, retries=retries, timeout=timeout,
+                                  label='POST File')
+
+    def make_put(self, request_url: str, body: dict, retries: int = None, timeout: float = None):
         """
         Makes an HTTP PUT request to the TDX API.
 
         :param request_url: the path (everything after /TDWebAPI/api/) to call
         :param body: dumped JSON data to send with the PUT
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
 
         :return: the API's response as a python dict or list
 
         """
-        self._rate_limit()
-        put_url = self.config.api_url + request_url
-        response = None
-        try:
-            if not (self._check_auth_exp()):
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    f"Login Failed. Username or password in config likely incorrect.")
-            response = requests.put(
-                url=put_url,
-                headers={
-                    "Authorization": 'Bearer ' + self.config.token,
-                    "Content-Type": "application/json; charset=utf-8",
-                },
-                data=json.dumps(body))
-            if response.status_code not in [200, 201, 202, 204]:
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    " Response code: " + str(response.status_code) + " " +
-                    response.reason + "\n" + "Returned: " + response.text)
-            val = response.json()
-            self.cache['rate_limit']['remaining'] = int(response.headers['X-RateLimit-Remaining'])
-            self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
-            self.cache['rate_limit']['limit'] = int(response.headers['X-RateLimit-Limit'])
-            return val
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"PUT to {request_url} failed. Exception: {str(e)}")
-        except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
-            self.logger.error(f"PUT to {request_url} returned non-success code. {str(e)}")
-        except json.decoder.JSONDecodeError:
-            message = 'Invalid JSON received from ' + request_url + ':\n'
-            if response:
-                message += response.text
-            self.logger.error(f"{message}")
-
-    def make_delete(self, request_url: str):
+        return self._make_request('PUT', request_url, [200, 201, 202, 204], body=body, retries=retries,
+                                  timeout=timeout)
+
+    def make_delete(self, request_url: str, retries: int = None, timeout: float = None):
         """
         Makes an HTTP DELETE request to the TDX Api.
 
         :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
 
         :return: None
 
         """
-        self._rate_limit()
+        self._make_request('DELETE', request_url, [200, 201], retries=retries, timeout=timeout)
 
-        delete_url = self.config.api_url + request_url
-        try:
-            if not (self._check_auth_exp()):
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    f"Login Failed. Username or password in config likely incorrect.")
-            response = requests.delete(
-                url=delete_url,
-                headers={
-                    "Authorization": 'Bearer ' + self.config.token,
-                    "Content-Type": "application/json; charset=utf-8",
-                })
-            if response.status_code not in [200, 201]:
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    " Response code: " + str(response.status_code) + " " +
-                    response.reason + "\n" + "Returned: " + response.text)
-            self.cache['rate_limit']['remaining'] = int(response.headers['X-RateLimit-Remaining'])
-            self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
-            self.cache['rate_limit']['limit'] = int(response.headers['X-RateLimit-Limit'])
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"DELETE to {request_url} failed. Exception: {str(e)}")
-        except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
-            self.logger.error(f"DELETE to {request_url} returned non-success code. {str(e)}")
-
-    def make_patch(self, request_url: str, body: dict):
+    def make_patch(self, request_url: str, body: dict, retries: int = None, timeout: float = None):
         """
         Makes an HTTP PATCH request to the TDX API.
 
@@ -360,59 +618,78 @@ class TDXIntegration:
 
         :param request_url: the path (everything after /TDWebAPI/api/) to call
         :param body: a list of PATCH operations as dictionaries, each including the keys "op", "path", and "value"
+        :param retries: the number of times to retry a failed request (Default: retries from config, 3)
+        :param timeout: seconds to wait for TDX to respond (Default: connect_timeout and read_timeout from config)
 
         :return: the API's response, as a python dict or list
 
         """
-        self._rate_limit()
-        patch_url = self.config.api_url + request_url
-        response = None
-        try:
-            if not (self._check_auth_exp()):
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    f"Login Failed. Username or password in config likely incorrect.")
-            response = requests.patch(
-                url=patch_url,
-                headers={
-                    "Authorization": 'Bearer ' + self.config.token,
-                    "Content-Type": "application/json; charset=utf-8",
-                },
-                data=json.dumps(body)
-            )
-
-            if response.status_code not in [200, 201]:
-                raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
-                    " Response code: " + str(response.status_code) + " " +
-                    response.reason + "\n" + "Returned: " + response.text)
-            val = response.json()
-            self.cache['rate_limit']['remaining'] = int(response.headers['X-RateLimit-Remaining'])
-            self.cache['rate_limit']['reset_time'] = str(response.headers['X-RateLimit-Reset'])
-            self.cache['rate_limit']['limit'] = int(response.headers['X-RateLimit-Limit'])
-            return val
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"PATCH to {request_url} failed. Exception: {str(e)}")
-        except tdxlib.tdx_api_exceptions.TdxApiHTTPError as e:
-            self.logger.error(f"PATCH to {request_url} returned non-success code. {str(e)}")
-        except json.decoder.JSONDecodeError:
-            message = 'Invalid JSON received from PATCH to ' + request_url + ':\n'
-            if response:
-                message += response.text
-            self.logger.error(f"{message}")
+        return self._make_request('PATCH', request_url, [200, 201], body=body, retries=retries, timeout=timeout)
 
     def clean_cache(self):
         """
         Internal method to refresh the cache in a tdxlib object.
         """
-        self.cache = {
-            'locations': {},
-            'rooms': {},
-            'people': {},
-            'groups': {},
-            'accounts': {},
-            'custom_attributes': {},
-            'ca_search': {},
-            'rate_limit': {}
-        }
+        self.cache = tdxlib.tdx_cache.cache_from_config(self.config)
+        for region in ['rooms', 'people', 'groups', 'accounts', 'ca_search']:
+            self.cache.add_region(region)
+        # Reference data that changes rarely, which can also be kept on disk (see reference_cache in TDXConfig)
+        for region in ['locations', 'custom_attributes']:
+            self.cache.add_region(region, persist='')
+        # Whole lists fetched by warm_cache(), which name lookups check before searching TDX
+        self.cache.add_region('all_locations', whole_list=True, persist='')
+        self.cache.add_region('all_accounts', whole_list=True)
+        self.cache.add_region('all_groups', whole_list=True)
+        # Not cached TDX objects, but the last rate-limit headers seen, which never expire
+        self.cache.add_region('rate_limit', ttl=0, max_size=0, enabled=True)
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that lists the reference data warm_cache() fetches, as (cache region, key, loader) tuples.
+        Integrations add their own lookup tables to the list.
+        """
+        return [
+            ('all_locations', tdxlib.tdx_cache.ALL, self.get_all_locations),
+            ('all_accounts', tdxlib.tdx_cache.ALL, self.get_all_accounts),
+            ('all_groups', tdxlib.tdx_cache.ALL, self.get_all_groups)
+        ]
+
+    def warm_cache(self) -> dict:
+        """
+        Fetches every reference list this integration looks names up in (such as all ticket types and priorities,
+        or all product models and vendors, along with all locations, accounts and groups) concurrently, and caches
+        them. Call it before a bulk job, so the job's first generate_ticket() or build_asset() doesn't wait for a
+        dozen lookups one after another. Lists that are already cached aren't fetched again.
+
+        :return: dict of cache region to the number of items cached, or None if fetching them failed
+
+        :rtype: dict
+
+        """
+        def load(item):
+            region, key, loader = item
+            try:
+                return region, self.cache.region(region).load(key, loader)
+            except (tdxlib.tdx_api_exceptions.TdxApiHTTPError, tdxlib.tdx_api_exceptions.TdxApiHTTPRequestError) as e:
+                self.logger.warning(f"Couldn't warm the {region} cache. {str(e)}")
+                return region, None
+
+        if not self.config.caching:
+            self.logger.warning("Not warming the cache, since caching is turned off.")
+            return dict()
+        results = self._run_concurrently(load, self._reference_loaders())
+        return {region: None if items is None else len(items) for region, items in results}
+
+    def _find_in_cached_list(self, region: str, key: str):
+        """
+        Internal method that looks for an active item named key in a whole list cached by warm_cache(), preferring
+        an exact match over one whose name only contains key. Returns None if there's no match, or the list isn't
+        cached.
+        """
+        items = self.cache.region(region).get(tdxlib.tdx_cache.ALL)
+        if not items:
+            return None
+        return self.cache.region(region).index(tdxlib.tdx_cache.ALL, items, active_only=True).find(key, ids=False)
 
     # #### GETTING TDX OBJECTS #### #
 
@@ -520,8 +797,9 @@ class TDXIntegration:
 
         :rtype: list
         """
-        if key in self.cache['people']:
-            return self.cache['people'][key]
+        cached = self.cache['people'].get(key)
+        if cached is not None:
+            return cached
         else:
             url_string = "/people/lookup?searchText=" + str(key) + "&maxResults=" + str(max_results)
             people = self.make_get(url_string)
@@ -554,8 +832,13 @@ class TDXIntegration:
         :rtype: dict
 
         """
-        if key in self.cache['accounts']:
-            return self.cache['accounts'][key]
+        cached = self.cache['accounts'].get(key)
+        if cached is not None:
+            return cached
+        account = None if additional_params else self._find_in_cached_list('all_accounts', key)
+        if account:
+            self.cache['accounts'][key] = account
+            return account
         else:
             url_string = '/accounts/search'
             search_params = {'SearchText': key, 'IsActive': True, 'MaxResults': 5}
@@ -594,8 +877,13 @@ class TDXIntegration:
         :rtype: dict
 
         """
-        if key in self.cache['groups']:
-            return self.cache['groups'][key]
+        cached = self.cache['groups'].get(key)
+        if cached is not None:
+            return cached
+        group = None if additional_params else self._find_in_cached_list('all_groups', key)
+        if group:
+            self.cache['groups'][key] = group
+            return group
         else:
             url_string = '/groups/search'
             search_params = {'NameLike': key, 'IsActive': True}
@@ -667,15 +955,15 @@ class TDXIntegration:
 
         """
         search_key = str(key) + "_" + str(object_type)
-        if search_key in self.cache['ca_search']:
-            return self.cache['ca_search'][search_key]
-        if str(object_type) not in self.cache['custom_attributes']:
-            # There is no API for searching attributes -- the only way is to get them all.
-            self.cache['custom_attributes'][str(object_type)] = self.get_all_custom_attributes(object_type)
-        for item in self.cache['custom_attributes'][str(object_type)]:
-            if str(key).lower() in item['Name'].lower() or str(key) == str(item['ID']):
-                self.cache['ca_search'][search_key] = item
-                return item
+        cached = self.cache['ca_search'].get(search_key)
+        if cached is not None:
+            return cached
+        # There is no API for searching attributes -- the only way is to get them all.
+        item = self.cache.lookup('custom_attributes', lambda: self.get_all_custom_attributes(object_type),
+                                 key=str(object_type)).find(key)
+        if item:
+            self.cache['ca_search'][search_key] = item
+            return item
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(
             "No custom attribute found for " + str(key) + ' and object type ' + str(object_type))
 
@@ -732,8 +1020,14 @@ class TDXIntegration:
         :rtype: dict
 
         """
-        if key in self.cache['locations']:
-            return self.cache['locations'][key]
+        cached = self.cache['locations'].get(key)
+        if cached is not None:
+            return cached
+        location = None if additional_params else self._find_in_cached_list('all_locations', key)
+        if location:
+            full_location = self.get_location_by_id(location['ID'])
+            self.cache['locations'][key] = full_location
+            return full_location
         else:
             url_string = '/locations/search'
             search_params = {'NameLike': key, 'IsActive': True}
@@ -0,0 +1,93 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class TDXJSONCodec:
+    """
+    Encodes request bodies and decodes responses, using the fastest JSON library available.
+
+    orjson is preferred, then ujson, then the standard library's json module. The faster libraries make a real
+    difference on big payloads, like asset searches with thousands of results or report data.
+    """
+
+    def __init__(self, name: str = 'auto'):
+        """
+        :param name: which library to use: 'orjson', 'ujson', 'json', or 'auto' to pick the fastest one that is
+                     installed (Default: 'auto')
+
+        """
+        if name in (None, '', 'auto'):
+            name = 'orjson' if orjson else 'ujson' if ujson else 'json'
+        if name == 'orjson' and orjson is None or name == 'ujson' and ujson is None:
+            raise ImportError(f"JSON codec {name} was requested, but isn't installed.")
+        if name not in ('orjson', 'ujson', 'json'):
+            raise ValueError(f"Unknown JSON codec {name}. Use orjson, ujson, json or auto.")
+        self.name = name
+        if name == 'orjson':
+            self.decode_error = orjson.JSONDecodeError
+        elif name == 'ujson':
+            self.decode_error = getattr(ujson, 'JSONDecodeError', ValueError)
+        else:
+            self.decode_error = json.JSONDecodeError
+
+    def dumps(self, obj) -> bytes:
+        """
+        Encodes an object as JSON.
+
+        Every codec accepts what the json module does, and encodes it the same way: non-str dict keys become
+        strings, text is left as UTF-8, and there's no whitespace between items. orjson can't encode integers
+        beyond 64 bits, so bodies with those are handed to the json module instead.
+
+        :param obj: a python dict or list (such as a request body)
+
+        :return: UTF-8 encoded JSON
+
+        :rtype: bytes
+
+        """
+        if self.name == 'orjson':
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                pass
+        elif self.name == 'ujson':
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        """
+        Decodes JSON.
+
+        :param data: JSON as bytes or str (such as a response body)
+
+        :return: the decoded python object
+
+        """
+        if self.name == 'orjson':
+            return orjson.loads(data)
+        if self.name == 'ujson':
+            return ujson.loads(data)
+        return json.loads(data)
+
+
+def codec_from_config(config) -> TDXJSONCodec:
+    """
+    Builds the JSON codec for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXJSONCodec
+
+    :rtype: TDXJSONCodec
+
+    """
+    return TDXJSONCodec(config.json_codec)
@@ -0,0 +1,373 @@
+import http.server
+import re
+import threading
+
+import tdxlib.tdx_circuit_breaker
+
+# Upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Type and help text of every metric tdxlib records
+METRICS = {
+    'tdxlib_calls_total': ('counter', "Calls to make_get(), make_post() and the other make_* methods, by final "
+                                      "outcome and number of retries"),
+    'tdxlib_call_duration_seconds': ('histogram', "Time taken by make_* calls, including retries and waiting"),
+    'tdxlib_requests_total': ('counter', "HTTP requests sent to TDX, counting each retry separately"),
+    'tdxlib_request_duration_seconds': ('histogram', "Time from sending an HTTP request to getting its response"),
+    'tdxlib_request_bytes_sent_total': ('counter', "Bytes of request bodies sent to TDX"),
+    'tdxlib_response_bytes_received_total': ('counter', "Bytes of response bodies received from TDX"),
+    'tdxlib_rate_limit_waits_total': ('counter', "Requests that had to wait for the rate limit"),
+    'tdxlib_rate_limit_sleep_seconds_total': ('counter', "Time spent sleeping for the rate limit"),
+    'tdxlib_auth_total': ('counter', "Authentication requests, by outcome"),
+    'tdxlib_auth_duration_seconds': ('histogram', "Time taken by authentication requests"),
+    'tdxlib_circuit_state': ('gauge', "Circuit breaker state per endpoint family (0 closed, 1 half-open, 2 open)"),
+    'tdxlib_circuit_trips_total': ('counter', "Times the circuit breaker has opened, per endpoint family"),
+    'tdxlib_circuit_rejected_total': ('counter', "Requests refused by an open circuit breaker"),
+    'tdxlib_concurrency_limit': ('gauge', "Current adaptive limit on requests in flight"),
+    'tdxlib_requests_in_flight': ('gauge', "Requests currently in flight"),
+    'tdxlib_rate_limit_remaining': ('gauge', "Requests left in the current TDX rate-limit window"),
+    'tdxlib_cache_entries': ('gauge', "Entries currently held in each cache region"),
+    'tdxlib_cache_hits_total': ('counter', "Cache lookups that found a fresh entry, per cache region"),
+    'tdxlib_cache_misses_total': ('counter', "Cache lookups that found no fresh entry, per cache region"),
+    'tdxlib_cache_evictions_total': ('counter', "Entries dropped from a full cache region to make room"),
+    'tdxlib_cache_expirations_total': ('counter', "Entries dropped from a cache region because they expired"),
+}
+
+_ID = re.compile(r'^\d+$')
+_UID = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+
+def endpoint_template(request_url: str) -> str:
+    """
+    Normalizes a request path, so requests for different objects of the same kind are counted together.
+
+    :param request_url: the path (everything after /TDWebAPI/api/) being called, like /123/tickets/456?x=1
+
+    :return: the path with the query string dropped, numeric IDs replaced by {id} and GUIDs by {uid}, like
+             /{id}/tickets/{id}
+
+    :rtype: str
+
+    """
+    parts = request_url.split('?', 1)[0].split('/')
+    return '/'.join('{id}' if _ID.match(part) else '{uid}' if _UID.match(part) else part for part in parts)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class TDXMetricsRegistry:
+    """
+    Keeps counters and latency histograms for the requests an integration makes, in memory. Read them with
+    snapshot(), or export them in the Prometheus text format with to_prometheus() (or serve them over HTTP with
+    start_http_server()).
+
+    Gauges, such as the state of the circuit breakers, aren't stored: collectors added with add_collector() are
+    asked for their current values whenever the metrics are read.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        :param enabled: if False, nothing is recorded (Default: True)
+        :param buckets: upper bounds, in seconds, of the histogram buckets (Default: DEFAULT_BUCKETS)
+
+        """
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters = dict()
+        self._histograms = dict()
+        self._collectors = list()
+
+    def inc(self, name: str, labels: dict = None, value: float = 1.0):
+        """
+        Adds to a counter.
+
+        :param name: name of the counter, such as tdxlib_requests_total
+        :param labels: dict of label names and values (Default: no labels)
+        :param value: amount to add (Default: 1)
+
+        :return: None
+
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        """
+        Records a value (such as a latency in seconds) in a histogram.
+
+        :param name: name of the histogram, such as tdxlib_request_duration_seconds
+        :param value: the value to record
+        :param labels: dict of label names and values (Default: no labels)
+
+        :return: None
+
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def record_request(self, method: str, endpoint: str, status, latency: float, bytes_sent: int = 0,
+                       bytes_received: int = 0):
+        """
+        Records one HTTP request sent to TDX (one attempt of a call).
+
+        :param method: HTTP verb, like GET
+        :param endpoint: the endpoint template, from endpoint_template()
+        :param status: the response code, or the kind of error if there was no response
+        :param latency: seconds from sending the request to getting the response
+        :param bytes_sent: length of the request body (Default: 0)
+        :param bytes_received: length of the response body (Default: 0)
+
+        :return: None
+
+        """
+        labels = {'method': method, 'endpoint': endpoint}
+        self.inc('tdxlib_requests_total', dict(labels, status=status))
+        self.observe('tdxlib_request_duration_seconds', latency, dict(labels, status=status))
+        if bytes_sent:
+            self.inc('tdxlib_request_bytes_sent_total', labels, bytes_sent)
+        if bytes_received:
+            self.record_received(method, endpoint, bytes_received)
+
+    def record_received(self, method: str, endpoint: str, bytes_received: int):
+        """
+        Records bytes of a response body received from TDX, such as a chunk of a streamed response.
+
+        :param method: HTTP verb, like GET
+        :param endpoint: the endpoint template, from endpoint_template()
+        :param bytes_received: number of bytes received
+
+        :return: None
+
+        """
+        self.inc('tdxlib_response_bytes_received_total', {'method': method, 'endpoint': endpoint}, bytes_received)
+
+    def record_call(self, method: str, endpoint: str, status, retries: int, duration: float):
+        """
+        Records a whole make_* call, including its retries.
+
+        :param method: HTTP verb, like GET
+        :param endpoint: the endpoint template, from endpoint_template()
+        :param status: the response code of the last attempt, or why the call ended without one (the kind of
+                       error, 'deadline', 'circuit_open' or 'invalid_json')
+        :param retries: the number of retries the call made
+        :param duration: seconds the call took, including retries and waiting
+
+        :return: None
+
+        """
+        self.inc('tdxlib_calls_total', {'method': method, 'endpoint': endpoint, 'status': status,
+                                        'retries': retries})
+        self.observe('tdxlib_call_duration_seconds', duration, {'method': method, 'endpoint': endpoint})
+
+    def record_auth(self, status, duration: float):
+        """
+        Records an authentication request.
+
+        :param status: the response code, or the kind of error if there was no response
+        :param duration: seconds the request took
+
+        :return: None
+
+        """
+        self.inc('tdxlib_auth_total', {'status': status})
+        self.observe('tdxlib_auth_duration_seconds', duration)
+
+    def record_rate_limit_wait(self, endpoint: str, seconds: float):
+        """
+        Records time spent sleeping for the rate limit before a request.
+
+        :param endpoint: the endpoint template, from endpoint_template()
+        :param seconds: seconds slept
+
+        :return: None
+
+        """
+        self.inc('tdxlib_rate_limit_waits_total', {'endpoint': endpoint})
+        self.inc('tdxlib_rate_limit_sleep_seconds_total', {'endpoint': endpoint}, seconds)
+
+    def add_collector(self, collector):
+        """
+        Adds a function that reports current values, such as gauges, whenever the metrics are read.
+
+        :param collector: a function returning a list of (name, labels, value) tuples
+
+        :return: None
+
+        """
+        self._collectors.append(collector)
+
+    def _collect(self) -> dict:
+        collected = dict()
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                collected[(name, _label_key(labels))] = value
+        return collected
+
+    def snapshot(self) -> dict:
+        """
+        Reports every metric.
+
+        :return: dict of metric name to a list of dicts, one for each set of labels. Counters and gauges have
+                 'labels' and 'value'. Histograms have 'labels', 'buckets' (upper bound to count, not cumulative),
+                 'sum' and 'count'.
+
+        :rtype: dict
+
+        """
+        collected = self._collect()
+        result = dict()
+        with self._lock:
+            for (name, key), value in list(self._counters.items()) + list(collected.items()):
+                result.setdefault(name, []).append({'labels': dict(key), 'value': value})
+            for (name, key), histogram in self._histograms.items():
+                result.setdefault(name, []).append({
+                    'labels': dict(key),
+                    'buckets': dict(zip(self.buckets, histogram['buckets'])),
+                    'sum': histogram['sum'],
+                    'count': histogram['count']
+                })
+        return result
+
+    def to_prometheus(self) -> str:
+        """
+        Exports every metric in the Prometheus text exposition format.
+
+        :return: the metrics, ready to be served to a Prometheus scraper
+
+        :rtype: str
+
+        """
+        collected = self._collect()
+        series = dict()
+        with self._lock:
+            values = sorted(list(self._counters.items()) + list(collected.items()), key=str)
+            for (name, key), value in values:
+                series.setdefault(name, []).append(f'{name}{_format_labels(key)} {float(value)!r}')
+            for (name, key), histogram in sorted(self._histograms.items(), key=lambda item: str(item[0])):
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(key, (("le", repr(float(bound))),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(key, (("le", "+Inf"),))} {histogram["count"]}')
+                lines.append(f'{name}_sum{_format_labels(key)} {histogram["sum"]!r}')
+                lines.append(f'{name}_count{_format_labels(key)} {histogram["count"]}')
+        output = []
+        for name in sorted(series):
+            kind, description = METRICS.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {description}')
+            output.append(f'# TYPE {name} {kind}')
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+    def start_http_server(self, port: int, address: str = '') -> http.server.HTTPServer:
+        """
+        Serves the metrics in the Prometheus text format on a background (daemon) thread, for Prometheus to scrape.
+
+        :param port: TCP port to listen on
+        :param address: address to listen on (Default: all interfaces)
+
+        :return: the server. Call its shutdown() method to stop it.
+
+        :rtype: http.server.HTTPServer
+
+        """
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target=server.serve_forever, name='tdxlib-metrics', daemon=True).start()
+        return server
+
+
+def circuit_gauges(breaker) -> list:
+    """
+    Reports the state of a circuit breaker as gauges, for a collector.
+
+    :param breaker: a TDXCircuitBreaker
+
+    :return: list of (name, labels, value) tuples
+
+    :rtype: list
+
+    """
+    states = {tdxlib.tdx_circuit_breaker.CLOSED: 0, tdxlib.tdx_circuit_breaker.HALF_OPEN: 1,
+              tdxlib.tdx_circuit_breaker.OPEN: 2}
+    gauges = []
+    for family, circuit in breaker.state().items():
+        gauges.append(('tdxlib_circuit_state', {'family': family}, states[circuit['state']]))
+        gauges.append(('tdxlib_circuit_trips_total', {'family': family}, circuit['trips']))
+        gauges.append(('tdxlib_circuit_rejected_total', {'family': family}, circuit['rejected']))
+    return gauges
+
+
+def cache_gauges(cache) -> list:
+    """
+    Reports the size and counters of each region of a cache as gauges, for a collector.
+
+    :param cache: a TDXCache
+
+    :return: list of (name, labels, value) tuples
+
+    :rtype: list
+
+    """
+    gauges = []
+    for region, stats in cache.stats().items():
+        gauges.append(('tdxlib_cache_entries', {'region': region}, stats['entries']))
+        for counter in ['hits', 'misses', 'evictions', 'expirations']:
+            gauges.append((f'tdxlib_cache_{counter}_total', {'region': region}, stats[counter]))
+    return gauges
+
+
+def metrics_from_config(config) -> TDXMetricsRegistry:
+    """
+    Builds the metrics registry for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXMetricsRegistry (which records nothing, if metrics is turned off in the config)
+
+    :rtype: TDXMetricsRegistry
+
+    """
+    return TDXMetricsRegistry(enabled=config.metrics)
@@ -0,0 +1,52 @@
+import contextlib
+import contextvars
+
+
+# Latency-sensitive requests, such as a help desk tool looking up one ticket. This is the default lane.
+INTERACTIVE = 'interactive'
+# Background batch work, such as update_assets() or edit_tickets() on many items
+BULK = 'bulk'
+LANES = (INTERACTIVE, BULK)
+
+# Lane of the current operation, or None if it hasn't been set
+_lane = contextvars.ContextVar('tdx_priority', default=None)
+
+
+@contextlib.contextmanager
+def priority(lane: str, override: bool = True):
+    """
+    Puts every TDX request made inside the block into a priority lane. Interactive requests get ahead of bulk ones
+    when they wait for the rate limit or for a free request slot, and a share of the rate-limit budget is held back
+    for them (see bulk_reserve in the config).
+
+    The lane is carried in a context variable, so it follows the code into asyncio tasks and into the threads of
+    bulk operations.
+
+    :param lane: tdx_priority.INTERACTIVE or tdx_priority.BULK
+    :param override: if False, keep the lane of an enclosing block if there is one, and only use this lane
+                     otherwise (Default: True)
+
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown priority lane {lane}. Use {' or '.join(LANES)}.")
+    if not override and _lane.get() is not None:
+        yield _lane.get()
+        return
+    token = _lane.set(lane)
+    try:
+        yield lane
+    finally:
+        _lane.reset(token)
+
+
+def current() -> str:
+    """
+    Reports the lane of the current operation.
+
+    :return: the lane set by the innermost priority() block, or INTERACTIVE if there isn't one
+
+    :rtype: str
+
+    """
+    return _lane.get() or INTERACTIVE
+
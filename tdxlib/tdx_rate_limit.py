@@ -0,0 +1,397 @@
+import calendar
+import contextlib
+import datetime
+import json
+import math
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+import tdxlib.tdx_priority
+
+
+RESET_TIME_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+
+
+def parse_http_date(value: str) -> float:
+    """
+    Parses a date from an HTTP header (such as X-RateLimit-Reset or Date) into a unix timestamp.
+
+    :param value: the header value, e.g. 'Tue, 15 Nov 1994 08:12:31 GMT'
+
+    :return: seconds since the epoch
+
+    :rtype: float
+
+    """
+    return float(calendar.timegm(datetime.datetime.strptime(value, RESET_TIME_FORMAT).timetuple()))
+
+
+class TDXMemoryRateLimitStore:
+    """
+    Keeps rate-limit budgets in memory. Integrations in the same process that talk to the same tenant as the same
+    user share one budget through the module-level shared_memory_store.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budgets = dict()
+
+    @contextlib.contextmanager
+    def transaction(self, key: str):
+        """
+        Gives exclusive access to the budget state stored under key. Changes made to the yielded dict are kept.
+
+        :param key: the budget to open (usually tenant and user)
+
+        """
+        with self._lock:
+            yield self._budgets.setdefault(key, dict())
+
+    def record(self, key: str, owner: str, request_url: str, wait: float):
+        """
+        Records that owner consumed one request from the budget. The memory store doesn't keep a history.
+        """
+        pass
+
+    def usage(self, key: str = None, since: float = None) -> list:
+        """
+        Reports who consumed what from a budget. The memory store doesn't keep a history.
+
+        :return: an empty list
+
+        """
+        return []
+
+
+shared_memory_store = TDXMemoryRateLimitStore()
+
+
+class TDXSQLiteRateLimitStore:
+    """
+    Keeps rate-limit budgets in a SQLite database, so several processes on one host (cron jobs, web hooks, workers)
+    can pace themselves against the same TDX budget instead of over-committing it.
+
+    Every budget change happens inside a BEGIN IMMEDIATE transaction, which SQLite serialises across processes.
+    Each request slot handed out is also logged with the owner that claimed it.
+    """
+
+    def __init__(self, path: str, retention_secs: float = 86400, prune_interval: float = 60):
+        """
+        :param path: path of the SQLite database file. It is created if it doesn't exist.
+        :param retention_secs: how long to keep the consumption log, in seconds (Default: one day)
+        :param prune_interval: how often to prune the consumption log, in seconds (Default: one minute)
+
+        """
+        self.path = path
+        self.retention_secs = retention_secs
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS budgets (key TEXT PRIMARY KEY, state TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS consumption (ts REAL NOT NULL, key TEXT NOT NULL, '
+                     'owner TEXT NOT NULL, url TEXT, wait REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS consumption_ts ON consumption (key, ts)')
+        conn.execute('CREATE INDEX IF NOT EXISTS consumption_age ON consumption (ts)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so each thread gets its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self, key: str):
+        """
+        Gives exclusive access (across threads and processes) to the budget state stored under key.
+        Changes made to the yielded dict are written back when the block exits.
+
+        :param key: the budget to open (usually tenant and user)
+
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT state FROM budgets WHERE key = ?', (key,)).fetchone()
+            state = json.loads(row[0]) if row else dict()
+            yield state
+            conn.execute('INSERT OR REPLACE INTO budgets (key, state) VALUES (?, ?)', (key, json.dumps(state)))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def record(self, key: str, owner: str, request_url: str, wait: float):
+        """
+        Records that owner consumed one request from the budget. Log entries older than retention_secs are pruned
+        at most once every prune_interval seconds, rather than on every request.
+
+        :param key: the budget the request came out of
+        :param owner: who made the request
+        :param request_url: the path that was requested
+        :param wait: how long the request was delayed by pacing, in seconds
+
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT INTO consumption (ts, key, owner, url, wait) VALUES (?, ?, ?, ?, ?)',
+                     (now, key, owner, request_url, wait))
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            conn.execute('DELETE FROM consumption WHERE ts < ?', (now - self.retention_secs,))
+
+    def usage(self, key: str = None, since: float = None) -> list:
+        """
+        Reports who consumed what from the shared budget.
+
+        :param key: only report on this budget (Default: all budgets)
+        :param since: only count requests after this unix timestamp (Default: the whole retained log)
+
+        :return: list of dicts with the budget key, owner, number of requests, total seconds spent waiting, and the
+                 time of the owner's last request
+
+        :rtype: list
+
+        """
+        query = 'SELECT key, owner, COUNT(*), SUM(wait), MAX(ts) FROM consumption WHERE ts >= ?'
+        params = [since or 0]
+        if key:
+            query += ' AND key = ?'
+            params.append(key)
+        query += ' GROUP BY key, owner ORDER BY COUNT(*) DESC'
+        rows = self._connect().execute(query, params).fetchall()
+        return [{'key': r[0], 'owner': r[1], 'requests': r[2], 'wait': r[3], 'last_request': r[4]} for r in rows]
+
+
+# SQLite stores opened by limiter_from_config(), one per database file
+_sqlite_stores = dict()
+_sqlite_stores_lock = threading.Lock()
+
+
+def default_owner() -> str:
+    """
+    Builds a label for this process to use in consumption logs: host, process ID and script name.
+
+    :return: a string like 'myhost:1234:nightly_sync.py'
+
+    :rtype: str
+
+    """
+    script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+    return f'{socket.gethostname()}:{os.getpid()}:{script}'
+
+
+class TDXRateLimiter:
+    """
+    Paces requests so they are spread evenly across the TDX rate-limit window, instead of bursting through the
+    whole budget and then stalling until the window resets.
+
+    The limiter is a leaky bucket (GCRA): each request is scheduled at least one interval after the previous one,
+    where the interval is the time left in the current window divided by the requests left in it. A small burst
+    of requests is allowed through without any delay. The budget is re-read from the X-RateLimit-* headers of
+    every response.
+
+    One limiter can be shared by threads and by asyncio tasks: reserve() never blocks, it only returns how long
+    the caller should wait. acquire() does the waiting for synchronous callers. The budget itself lives in a
+    store, so limiters in different integrations or processes can share it.
+
+    Interactive and bulk requests (see tdx_priority) are paced in separate queues, so interactive requests never
+    wait behind bulk ones. Bulk requests only spread the budget above bulk_reserve between themselves, and stop
+    for the rest of the window once it's down to that, leaving it for interactive requests.
+    """
+
+    def __init__(self, burst: int = 5, skew_mitigation_secs: float = 1.0, store=None, key: str = 'default',
+                 owner: str = None, bulk_reserve: float = 0.0):
+        """
+        :param burst: number of requests that can be sent back-to-back before pacing applies (Default: 5)
+        :param skew_mitigation_secs: extra seconds to wait past the reset time once the budget is spent (Default: 1)
+        :param store: where the budget is kept: a TDXMemoryRateLimitStore or TDXSQLiteRateLimitStore
+                      (Default: a new private memory store)
+        :param key: name of the budget in the store, usually tenant and user (Default: 'default')
+        :param owner: label recorded with each request in the consumption log (Default: host:pid:script)
+        :param bulk_reserve: share (0 to 1) of each window's budget that bulk requests leave for interactive ones
+                             (Default: 0.0)
+
+        """
+        self.burst = max(1, burst)
+        self.skew_mitigation_secs = skew_mitigation_secs
+        self.store = store if store is not None else TDXMemoryRateLimitStore()
+        self.key = key
+        self.owner = owner or default_owner()
+        self.bulk_reserve = min(max(bulk_reserve or 0.0, 0.0), 1.0)
+
+    @staticmethod
+    def _interval(budget: dict, start: float, reserved: int = 0) -> float:
+        # Before the first response, nothing is known about the budget, so don't pace at all.
+        if budget.get('remaining') is None or budget.get('reset_time') is None:
+            return 0.0
+        # Spread what's left of the budget over what's left of the window, starting from the next free slot
+        window_left = budget['reset_time'] - start
+        if window_left <= 0:
+            return 0.0
+        return window_left / max(budget['remaining'] - reserved, 1)
+
+    def _reserved(self, budget: dict, lane: str) -> int:
+        # Requests bulk work has to leave in the budget for interactive work
+        if lane != tdxlib.tdx_priority.BULK or not budget.get('limit'):
+            return 0
+        return math.ceil(budget['limit'] * self.bulk_reserve)
+
+    def reserve(self, request_url: str = None, lane: str = None) -> float:
+        """
+        Claims the next request slot.
+
+        :param request_url: the path about to be requested, for the consumption log (optional)
+        :param lane: tdx_priority.INTERACTIVE or tdx_priority.BULK (Default: the lane of the current context)
+
+        :return: the number of seconds the caller should wait before sending its request
+
+        :rtype: float
+
+        """
+        if lane is None:
+            lane = tdxlib.tdx_priority.current()
+        arrival_key = 'bulk_arrival' if lane == tdxlib.tdx_priority.BULK else 'theoretical_arrival'
+        with self.store.transaction(self.key) as budget:
+            now = time.time()
+            arrival = budget.get(arrival_key, 0.0)
+            reserved = self._reserved(budget, lane)
+            if budget.get('reset_time') is not None and budget['reset_time'] <= now:
+                # The window has rolled over, so the full budget is available again.
+                budget['remaining'] = budget.get('limit')
+                budget['reset_time'] = None
+            if budget.get('remaining') is not None and budget['remaining'] <= reserved \
+                    and budget.get('reset_time') is not None:
+                # Budget is spent (or down to the interactive reserve): wait for the new window.
+                wait = max(budget['reset_time'] - now + self.skew_mitigation_secs, 0.0)
+                budget[arrival_key] = budget['reset_time'] + self.skew_mitigation_secs
+            else:
+                start = max(arrival, now)
+                interval = self._interval(budget, start, reserved)
+                tolerance = interval * (self.burst - 1)
+                wait = max(0.0, start - tolerance - now)
+                budget[arrival_key] = start + interval
+                if budget.get('remaining') is not None:
+                    budget['remaining'] -= 1
+        self.store.record(self.key, self.owner, request_url, wait)
+        return wait
+
+    def acquire(self, request_url: str = None, lane: str = None) -> float:
+        """
+        Claims the next request slot and sleeps until it comes up.
+
+        :param request_url: the path about to be requested, for the consumption log (optional)
+        :param lane: tdx_priority.INTERACTIVE or tdx_priority.BULK (Default: the lane of the current context)
+
+        :return: the number of seconds slept
+
+        :rtype: float
+
+        """
+        wait = self.reserve(request_url, lane)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def update(self, headers, request_url: str = None):
+        """
+        Updates the budget from the rate-limit headers of a TDX response.
+
+        :param headers: a case-insensitive mapping of response headers
+        :param request_url: the path the response came from, for reporting (optional)
+
+        :return: a copy of the budget as written (with the limit, remaining requests, reset_time and last_url), or
+                 None if the response had no rate-limit headers
+
+        :rtype: dict
+
+        """
+        if 'X-RateLimit-Remaining' not in headers:
+            return None
+        with self.store.transaction(self.key) as budget:
+            now = time.time()
+            budget['remaining'] = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Limit' in headers:
+                budget['limit'] = int(headers['X-RateLimit-Limit'])
+            if 'X-RateLimit-Reset' in headers:
+                reset = parse_http_date(headers['X-RateLimit-Reset'])
+                # Measure the reset against the server's clock when we can, so local clock skew doesn't matter.
+                if 'Date' in headers:
+                    try:
+                        reset = now + (reset - parse_http_date(headers['Date']))
+                    except ValueError:
+                        pass
+                budget['reset_time'] = reset
+            if request_url:
+                budget['last_url'] = request_url
+            return dict(budget)
+
+    def state(self) -> dict:
+        """
+        Reports the current rate-limit budget.
+
+        :return: dict with the limit, remaining requests, seconds until the window resets, the current spacing
+                 between requests, and the seconds until the next request may be sent
+
+        :rtype: dict
+
+        """
+        with self.store.transaction(self.key) as budget:
+            now = time.time()
+            interval = self._interval(budget, now)
+            reset_time = budget.get('reset_time')
+            arrival = budget.get('theoretical_arrival', 0.0)
+            return {
+                'limit': budget.get('limit'),
+                'remaining': budget.get('remaining'),
+                'reset_in': None if reset_time is None else max(reset_time - now, 0.0),
+                'interval': interval,
+                'next_request_in': max(0.0, arrival - interval * (self.burst - 1) - now),
+                'last_url': budget.get('last_url')
+            }
+
+    def usage(self, since: float = None) -> list:
+        """
+        Reports who consumed what from this limiter's budget. Only the SQLite store keeps this history.
+
+        :param since: only count requests after this unix timestamp (Default: the whole retained log)
+
+        :return: list of dicts with the owner, number of requests, seconds spent waiting and last request time
+
+        :rtype: list
+
+        """
+        return self.store.usage(self.key, since)
+
+
+def limiter_from_config(config) -> TDXRateLimiter:
+    """
+    Builds the rate limiter for an integration from its TDXConfig. The budget is keyed on the API URL and user,
+    since that's how TeamDynamix counts requests.
+
+    rate_limit_store may be 'memory' (share the budget between integrations in this process) or the path of a
+    SQLite database (share the budget between every process on this host that uses the same file).
+
+    :param config: a TDXConfig object
+
+    :return: a TDXRateLimiter
+
+    :rtype: TDXRateLimiter
+
+    """
+    if not config.rate_limit_store or config.rate_limit_store == 'memory':
+        store = shared_memory_store
+    else:
+        with _sqlite_stores_lock:
+            if config.rate_limit_store not in _sqlite_stores:
+                _sqlite_stores[config.rate_limit_store] = TDXSQLiteRateLimitStore(config.rate_limit_store)
+            store = _sqlite_stores[config.rate_limit_store]
+    return TDXRateLimiter(burst=config.rate_limit_burst, skew_mitigation_secs=config.rate_limit_skew, store=store,
+                          key=f'{config.api_url}|{config.username or ""}', owner=config.rate_limit_owner,
+                          bulk_reserve=config.bulk_reserve)
@@ -0,0 +1,370 @@
+import asyncio
+import base64
+import functools
+import gzip
+import http.client
+import json
+import re
+import threading
+import time
+import urllib.parse
+
+import jwt
+import requests
+import requests.structures
+
+import tdxlib.tdx_rate_limit
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Response headers kept in recordings. Everything else (cookies, server details) is dropped. Date is kept so the
+# rate limiter measures a replayed X-RateLimit-Reset against it, rather than against today's clock.
+RECORDED_HEADERS = ('Content-Type', 'Date', 'X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset')
+
+# Stands in for the real token in recordings of /auth, so recordings never hold credentials. It's unsigned in
+# any meaningful sense, and doesn't expire until 2100, so replays never need to authenticate twice.
+PLACEHOLDER_TOKEN = jwt.encode({'exp': 4102444800, 'aud': 'https://www.teamdynamix.com/'},
+                               'tdxlib-replay-placeholder-signing-key', algorithm='HS256')
+
+# Start of the path of every API URL, for the live and sandbox APIs
+_API_PREFIX = re.compile(r'^/(SB)?TDWebApi/api', re.IGNORECASE)
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _path(url: str) -> str:
+    # Recordings are keyed by path and query, so they can be replayed against any host
+    parts = urllib.parse.urlsplit(url)
+    path = _API_PREFIX.sub('', parts.path)
+    return path + ('?' + parts.query if parts.query else '')
+
+
+def _body(data) -> str:
+    # Request bodies are compared after normalizing JSON, so recordings made with one JSON codec match requests
+    # encoded by another
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    try:
+        return json.dumps(json.loads(data), sort_keys=True, separators=(',', ':'))
+    except ValueError:
+        return data
+
+
+def _is_auth(path: str) -> bool:
+    return path.split('?', 1)[0].rstrip('/').endswith('/auth')
+
+
+def build_response(url: str, status_code: int, content: bytes, headers: dict = None) -> requests.Response:
+    """
+    Builds a requests Response that didn't come from the network, such as a replayed one. It can be read all at
+    once or iterated over (with iter_content()), like a streamed response.
+
+    :param url: the URL the response is for
+    :param status_code: the HTTP status code
+    :param content: the response body
+    :param headers: dict of response headers (Default: none)
+
+    :return: the response
+
+    :rtype: requests.Response
+
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.reason = http.client.responses.get(status_code, '')
+    response.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    response.encoding = 'utf-8'
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+class TDXRecordingTransport:
+    """
+    Wraps another transport and records every request and response that passes through it to a JSON lines file
+    (gzipped, if the file name ends in .gz), for TDXReplayTransport to serve back later.
+
+    Recordings keep the method, path and query, the request body, the status code, the response body, the time
+    TDX took to answer, and the Content-Type, Date and X-RateLimit-* response headers. Request headers (which hold
+    the token) are never recorded, and neither is the body of an /auth request. The token TDX returns from /auth is
+    replaced with a placeholder.
+    """
+
+    def __init__(self, transport, path: str):
+        """
+        :param transport: the transport to send requests with, such as a TDXTransport (or None, if requests sent
+                          some other way are passed to record())
+        :param path: file to append the recording to
+
+        """
+        self.transport = transport
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = _open(path, 'a')
+
+    def request(self, method: str, url: str, data=None, **kwargs) -> requests.Response:
+        """
+        Sends a request with the wrapped transport, and records it.
+
+        :param method: the HTTP verb to use
+        :param url: the full URL to call
+        :param data: the request body
+        :param kwargs: any other arguments the wrapped transport accepts
+
+        :return: the response (already downloaded in full, even if a stream was asked for)
+
+        :rtype: requests.Response
+
+        """
+        started = time.monotonic()
+        response = self.transport.request(method, url, data=data, **kwargs)
+        self.record(method, url, data, response.status_code, response.headers, response.content,
+                    time.monotonic() - started)
+        return response
+
+    def record(self, method: str, url: str, data, status_code: int, headers, content: bytes, elapsed: float):
+        """
+        Appends a request and its response to the recording.
+
+        :param method: the HTTP verb
+        :param url: the full URL
+        :param data: the request body
+        :param status_code: the HTTP status code of the response
+        :param headers: the response headers
+        :param content: the response body
+        :param elapsed: seconds TDX took to answer
+
+        :return: None
+
+        """
+        path = _path(url)
+        if _is_auth(path) and status_code == 200:
+            content = PLACEHOLDER_TOKEN.encode('utf-8')
+        entry = {
+            'method': method,
+            'url': path,
+            'body': None if _is_auth(path) else _body(data),
+            'status': status_code,
+            'headers': {key: headers[key] for key in RECORDED_HEADERS if key in headers},
+            'elapsed': round(elapsed, 4)
+        }
+        try:
+            entry['content'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['content_b64'] = base64.b64encode(content).decode('ascii')
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._file.flush()
+
+    def close(self):
+        """
+        Closes the recording file and the wrapped transport.
+        """
+        with self._lock:
+            self._file.close()
+        if self.transport is not None:
+            self.transport.close()
+
+
+class TDXAsyncRecordingTransport:
+    """
+    Records the traffic of an async integration, in the same format as TDXRecordingTransport. It wraps an httpx
+    async transport, and goes in the integration's httpx.AsyncClient in its place. Requires the httpx package.
+    """
+
+    def __init__(self, transport, path: str):
+        """
+        :param transport: the httpx transport to send requests with, such as an httpx.AsyncHTTPTransport
+        :param path: file to append the recording to
+
+        """
+        self.transport = transport
+        self.recording = TDXRecordingTransport(None, path)
+
+    async def handle_async_request(self, request: 'httpx.Request') -> 'httpx.Response':
+        started = time.monotonic()
+        data = await request.aread()
+        response = await self.transport.handle_async_request(request)
+        # Read in full, as the synchronous recorder does, even if a stream was asked for
+        content = await response.aread()
+        self.recording.record(request.method, str(request.url), data or None, response.status_code,
+                              response.headers, content, time.monotonic() - started)
+        return response
+
+    async def aclose(self):
+        self.recording.close()
+        await self.transport.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+class TDXAsyncReplayTransport:
+    """
+    Serves a recording to an async integration. It adapts a TDXReplayTransport to httpx, and goes in the
+    integration's httpx.AsyncClient in place of a network transport. Requires the httpx package.
+    """
+
+    def __init__(self, replay: 'TDXReplayTransport'):
+        """
+        :param replay: the TDXReplayTransport to answer requests from
+
+        """
+        self.replay = replay
+
+    async def handle_async_request(self, request: 'httpx.Request') -> 'httpx.Response':
+        data = await request.aread()
+        answer = functools.partial(self.replay.request, request.method, str(request.url), data=data or None)
+        if self.replay.latency or self.replay.latency_scale:
+            # Replayed response times are slept out, so keep them off the event loop
+            response = await asyncio.get_running_loop().run_in_executor(None, answer)
+        else:
+            response = answer()
+        return httpx.Response(response.status_code, headers=dict(response.headers), content=response.content)
+
+    async def aclose(self):
+        self.replay.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+class TDXReplayTransport:
+    """
+    Serves recorded responses back instead of calling TDX, so workloads can be run and profiled offline and
+    reproducibly.
+
+    Requests are matched to recordings by method, path, query and (normalized) body. When the same request was
+    recorded several times, its responses are served in the order they were recorded, and the last one is
+    repeated once they run out. Requests with no recording get a 404 (or raise LookupError, if strict).
+    """
+
+    def __init__(self, path: str, latency: float = 0.0, latency_scale: float = 0.0, rate_limit: int = None,
+                 rate_limit_window: float = 60.0, strict: bool = False):
+        """
+        :param path: recording to replay, made by TDXRecordingTransport
+        :param latency: seconds to wait before each response (Default: 0.0)
+        :param latency_scale: how much of the recorded response time to wait, on top of latency. 1.0 replays at
+                              the speed of the recording, 0.0 as fast as possible. (Default: 0.0)
+        :param rate_limit: if set, simulate a TDX rate limit of this many requests per window: the X-RateLimit-*
+                           headers are generated instead of replayed, and requests over the limit get a 429
+                           (Default: None)
+        :param rate_limit_window: length of the simulated rate-limit window, in seconds (Default: 60.0)
+        :param strict: raise LookupError for requests with no recording, instead of answering 404 (Default: False)
+
+        """
+        self.path = path
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.strict = strict
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._recordings = dict()
+        self._served = dict()
+        self._window_start = None
+        self._window_count = 0
+        with _open(path, 'r') as recording:
+            for line in recording:
+                if line.strip():
+                    entry = json.loads(line)
+                    key = (entry['method'], entry['url'], entry.get('body'))
+                    self._recordings.setdefault(key, []).append(entry)
+
+    def _next(self, key: tuple):
+        with self._lock:
+            entries = self._recordings.get(key)
+            if not entries:
+                return None
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return entries[min(served, len(entries) - 1)]
+
+    def _rate_limit_headers(self) -> tuple:
+        # Returns whether the request is allowed, and the headers TDX would send with the response
+        with self._lock:
+            now = time.time()
+            if self._window_start is None or now >= self._window_start + self.rate_limit_window:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            reset = time.gmtime(self._window_start + self.rate_limit_window)
+            return self._window_count <= self.rate_limit, {
+                'Date': time.strftime(tdxlib.tdx_rate_limit.RESET_TIME_FORMAT, time.gmtime(now)),
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(self.rate_limit - self._window_count, 0)),
+                'X-RateLimit-Reset': time.strftime(tdxlib.tdx_rate_limit.RESET_TIME_FORMAT, reset)
+            }
+
+    def request(self, method: str, url: str, data=None, **kwargs) -> requests.Response:
+        """
+        Answers a request from the recording.
+
+        :param method: the HTTP verb
+        :param url: the full URL
+        :param data: the request body
+        :param kwargs: other request arguments, which are ignored
+
+        :return: the recorded response
+
+        :rtype: requests.Response
+
+        """
+        path = _path(url)
+        entry = self._next((method, path, None if _is_auth(path) else _body(data)))
+        if entry is None:
+            self.misses += 1
+            if self.strict:
+                raise LookupError(f"No recorded response for {method} {path}")
+            return build_response(url, 404, b'{"Message": "No recorded response for this request."}',
+                                  {'Content-Type': 'application/json'})
+        headers = dict(entry['headers'])
+        status = entry['status']
+        if self.rate_limit:
+            allowed, rate_limit_headers = self._rate_limit_headers()
+            headers.update(rate_limit_headers)
+            if not allowed:
+                return build_response(url, 429, b'{"Message": "Rate limit exceeded."}', headers)
+        delay = self.latency + self.latency_scale * entry.get('elapsed', 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if 'content_b64' in entry:
+            content = base64.b64decode(entry['content_b64'])
+        else:
+            content = entry['content'].encode('utf-8')
+        return build_response(url, status, content, headers)
+
+    def close(self):
+        pass
+
+
+def replay_from_config(config) -> TDXReplayTransport:
+    """
+    Builds the replay transport for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object, with replay_file set
+
+    :return: a TDXReplayTransport
+
+    :rtype: TDXReplayTransport
+
+    """
+    return TDXReplayTransport(config.replay_file, latency_scale=config.replay_latency_scale,
+                              rate_limit=config.replay_rate_limit or None)
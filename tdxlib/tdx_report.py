@@ -1,4 +1,6 @@
 import json
+from typing import Dict
+from typing import List
 from typing import Optional
 from enum import Enum
 import tdxlib.tdx_api_exceptions
@@ -60,11 +62,11 @@ class DisplayColumn(TypedDict):
 class TDXReportData(TypedDict):
     Description: Optional[str]
     MaxResults: int
-    DisplayedColumns: Optional[list[DisplayColumn]]
-    SortOrder: Optional[list[OrderByColumn]]
+    DisplayedColumns: Optional[List[DisplayColumn]]
+    SortOrder: Optional[List[OrderByColumn]]
     ChartType: Optional[str]
-    ChartSettings: Optional[list[ChartSetting]]
-    DataRows: Optional[list[dict[str, object]]]
+    ChartSettings: Optional[List[ChartSetting]]
+    DataRows: Optional[List[Dict[str, object]]]
     ID: int
     Name: str
     CreatedUid: Optional[str]
@@ -3,14 +3,16 @@ import copy
 import datetime
 from tdxlib.tdx_integration import TDXIntegration
 import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_tracing
 from typing import Union
 from typing import BinaryIO
 import json
 
+@tdxlib.tdx_tracing.traced
 class TDXReportIntegration(TDXIntegration):
     def __init__(self, filename: str = None, config=None):
         tdxlib.tdx_integration.TDXIntegration.__init__(self, filename, config)
-        self.clean_cache()
+
     def make_report_call(self, url: str, action: str, post_body: dict = None):
         url_string = '/reports'
         if len(url) > 0:
@@ -26,8 +28,16 @@ class TDXReportIntegration(TDXIntegration):
         if action == 'patch' and post_body:
             return self.make_patch(url_string, post_body)
         raise tdxlib.tdx_api_exceptions.TdxApiHTTPRequestError('No method ' + action + ' or no post information')
-    def get_report_by_id(self, id: int, withData: bool = False, dataSortExpression: str = "") -> tdxlib.tdx_report.TDXReport:
+    def get_report_by_id(self, id: int, withData: bool = False, dataSortExpression: str = "", raw: bool = False,
+                         stream: bool = False) -> tdxlib.tdx_report.TDXReport:
         url_string = f"{id}?withData={withData}&dataSortExpression={dataSortExpression}"
+        if stream:
+            # Yield the rows of the report's DataRows one at a time, as they are downloaded
+            return self.make_get(f'/reports/{id}?withData=True&dataSortExpression={dataSortExpression}',
+                                 stream=True, stream_key='DataRows')
+        if raw:
+            # Hand back the undecoded JSON bytes, for callers that pass report data straight through
+            return self.make_get(f'/reports/{url_string}', raw=True)
         report_data = self.make_report_call(url_string, 'get')
         if report_data:
             #return tdxlib.tdx_report.TDXReport.__init__(integration=self, json=report_data)
@@ -0,0 +1,259 @@
+import time
+from typing import Optional
+
+import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_circuit_breaker
+import tdxlib.tdx_deadline
+import tdxlib.tdx_metrics
+import tdxlib.tdx_retry
+
+
+class TDXRequest:
+    """
+    Everything about one call to the TDX API that doesn't depend on how the request is sent, shared by
+    TDXIntegration and TDXAsyncIntegration so the two can't drift apart: preparing the request, deciding whether
+    it may be sent, sorting out what came back, deciding whether to retry, and recording metrics and the tracing
+    span. The integrations only send the request and sleep between attempts.
+
+    It's used as a context manager around the integration's retry loop, which opens the call's span and records
+    the call when the loop is done. Each pass of the loop starts with begin(). After sending, the loop reports the
+    outcome with answered() or failed(), then uses reauthenticate(), check() and decode() on the response. If
+    that raises one of self.errors, retry_delay() says how long to wait before the next pass, or to give up.
+    """
+
+    def __init__(self, integration, method: str, request_url: str, ok_codes: list, body=None, files: dict = None,
+                 retries: int = None, label: str = None, stream: bool = False, transport_errors: tuple = ()):
+        """
+        :param integration: the TDXIntegration or TDXAsyncIntegration making the call
+        :param method: the HTTP verb
+        :param request_url: the path (everything after /TDWebAPI/api/) to call
+        :param ok_codes: the status codes that mean success
+        :param body: the request body, to be encoded with the integration's JSON codec (Default: None)
+        :param files: the files of a multipart upload (Default: None)
+        :param retries: the number of times to retry a failed request (Default: retries from the retry policy)
+        :param label: how the call is described in log messages (Default: method)
+        :param stream: whether the response body is streamed, rather than downloaded before the call returns
+        :param transport_errors: the exception classes the integration's HTTP library raises
+
+        """
+        self.integration = integration
+        self.method = method
+        self.request_url = request_url
+        self.ok_codes = ok_codes
+        self.files = files
+        self.label = label or method
+        self.stream = stream
+        self.url = integration.config.api_url + request_url
+        self.data = None if body is None else integration.codec.dumps(body)
+        self.policy = integration.retry_policy if retries is None else integration.retry_policy.with_retries(retries)
+        self.family = tdxlib.tdx_circuit_breaker.endpoint_family(request_url)
+        self.template = tdxlib.tdx_metrics.endpoint_template(request_url)
+        self.errors = tuple(transport_errors) + (tdxlib.tdx_api_exceptions.TdxApiHTTPError,
+                                                 integration.codec.decode_error)
+        self.attempt = 0
+        self.reauthenticated = False
+        self.outcome = 'error'
+        self._started = None
+        self._span_context = None
+        self._span = None
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        self._span_context = self.integration.tracer.span(f'{self.method} {self.template}',
+                                                          {'http.request.method': self.method,
+                                                           'url.template': self.template})
+        self._span = self._span_context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None and issubclass(exc_type, tdxlib.tdx_api_exceptions.TdxApiCircuitOpenError):
+            self.outcome = 'circuit_open'
+        self.integration.metrics.record_call(self.method, self.template, self.outcome, self.attempt,
+                                             time.monotonic() - self._started)
+        if isinstance(self.outcome, int):
+            self._span.set_attribute('http.response.status_code', self.outcome)
+        else:
+            self._span.set_attribute('error.type', self.outcome)
+        self._span.set_attribute('tdx.retries', self.attempt)
+        return self._span_context.__exit__(exc_type, exc_val, exc_tb)
+
+    def begin(self) -> bool:
+        """
+        Checks whether the next attempt may be sent.
+
+        :return: True to go ahead, or False if the deadline has passed (which is logged)
+
+        :raises TdxApiCircuitOpenError: if the circuit breaker for the endpoint family is open
+
+        """
+        if tdxlib.tdx_deadline.expired():
+            self.out_of_time("Deadline has passed.")
+            return False
+        breaker = self.integration.circuit_breaker
+        if not breaker.allow(self.family):
+            message = f"{self.label} to {self.request_url} not sent. Too many recent failures from /{self.family}, " \
+                      f"trying again in {breaker.retry_in(self.family):.0f} seconds."
+            self.integration.logger.error(message)
+            raise tdxlib.tdx_api_exceptions.TdxApiCircuitOpenError(message)
+        return True
+
+    def out_of_time(self, reason: str):
+        """
+        Logs that the call ran out of time before a request could be sent.
+
+        :param reason: what happened, for the log
+
+        :return: None
+
+        """
+        self.integration.logger.error(f"{self.label} to {self.request_url} not sent. {reason}")
+        self.outcome = 'deadline'
+
+    def headers(self, token: str) -> dict:
+        """
+        Prepares the headers of the next attempt, and rewinds any files being uploaded so they're sent in full.
+
+        :param token: the current TDX token
+
+        :return: dict of request headers
+
+        :rtype: dict
+
+        """
+        headers = {"Authorization": 'Bearer ' + token}
+        if self.files is None:
+            headers["Content-Type"] = "application/json; charset=utf-8"
+        else:
+            tdxlib.tdx_retry.rewind_files(self.files)
+        return headers
+
+    def answered(self, response, latency: float):
+        """
+        Records an attempt that got a response, in the metrics and with the circuit breaker.
+
+        :param response: the response, from requests or httpx
+        :param latency: seconds until the response headers arrived
+
+        :return: None
+
+        """
+        self.outcome = response.status_code
+        self.integration.metrics.record_request(self.method, self.template, self.outcome, latency,
+                                                len(self.data or ''), 0 if self.stream else len(response.content))
+        if response.status_code in tdxlib.tdx_circuit_breaker.FAILURE_STATUSES:
+            self.integration.circuit_breaker.record_failure(self.family)
+        else:
+            self.integration.circuit_breaker.record_success(self.family)
+
+    def failed(self, error: BaseException, latency: float) -> Optional[str]:
+        """
+        Records an attempt that got no response, in the metrics and with the circuit breaker.
+
+        :param error: the exception the transport raised
+        :param latency: seconds until it was raised
+
+        :return: tdx_retry.CONNECT_ERROR or NETWORK_ERROR, or None if the error isn't a network failure
+
+        :rtype: str
+
+        """
+        kind = tdxlib.tdx_retry.classify_error(error)
+        if kind:
+            self.integration.circuit_breaker.record_failure(self.family)
+        self.outcome = kind or 'error'
+        self.integration.metrics.record_request(self.method, self.template, self.outcome, latency,
+                                                len(self.data or ''))
+        return kind
+
+    def ok(self, response) -> bool:
+        return response.status_code in self.ok_codes
+
+    def reauthenticate(self, response) -> bool:
+        """
+        Checks whether TDX rejected the token. The first time it does, the token is dropped so the next attempt
+        authenticates again.
+
+        :param response: the response
+
+        :return: True if the request should be sent again straight away
+
+        :rtype: bool
+
+        """
+        if response.status_code != 401 or self.reauthenticated:
+            return False
+        # The token was revoked, or came from a stale cache. Get a new one and try again.
+        self.reauthenticated = True
+        self.integration._invalidate_token()
+        return True
+
+    def check(self, response):
+        """
+        Checks that a response is a success.
+
+        :param response: the response, from requests or httpx (with its body read)
+
+        :return: None
+
+        :raises TdxApiHTTPError: if the status code isn't one of ok_codes
+
+        """
+        if not self.ok(response):
+            # requests calls it reason, and httpx reason_phrase
+            reason = getattr(response, 'reason_phrase', None) or getattr(response, 'reason', None) or ''
+            raise tdxlib.tdx_api_exceptions.TdxApiHTTPError(
+                " Response code: " + str(response.status_code) + " " + reason + "\n" + "Returned: " + response.text)
+
+    def decode(self, response, raw: bool = False):
+        """
+        Decodes the body of a successful response.
+
+        :param response: the response
+        :param raw: return the body as bytes instead (Default: False)
+
+        :return: the decoded JSON, the body itself if raw is True, or None if it's empty
+
+        """
+        if raw:
+            return response.content
+        if len(response.content) == 0:
+            return None
+        return self.integration.codec.loads(response.content)
+
+    def retry_delay(self, error: Exception, response=None) -> Optional[float]:
+        """
+        Decides whether to try again after an attempt raised one of self.errors, and logs what happened.
+
+        :param error: the exception
+        :param response: the response to the attempt, if there was one
+
+        :return: seconds to wait before the next attempt, or None to give up
+
+        :rtype: float
+
+        """
+        logger = self.integration.logger
+        error_kind = None
+        if isinstance(error, self.integration.codec.decode_error):
+            message = f'Invalid JSON received from {self.label} to {self.url}:\n'
+            if response is not None:
+                message += response.text
+            logger.error(message)
+            self.outcome = 'invalid_json'
+            return None
+        if isinstance(error, tdxlib.tdx_api_exceptions.TdxApiHTTPError):
+            message = f"{self.label} to {self.request_url} returned non-success code. {str(error)}"
+        else:
+            message = f"{self.label} to {self.request_url} failed. Exception: {str(error)}"
+            error_kind = tdxlib.tdx_retry.classify_error(error)
+        delay = self.policy.next_delay(self.method, self.attempt,
+                                       status_code=None if response is None else response.status_code,
+                                       headers=None if response is None else response.headers,
+                                       error_kind=error_kind)
+        left = tdxlib.tdx_deadline.remaining()
+        if delay is None or (left is not None and delay >= left):
+            logger.error(message)
+            return None
+        logger.warning(f"{message} Retrying in {delay:.1f} seconds.")
+        self.attempt += 1
+        return delay
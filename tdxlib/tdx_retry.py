@@ -0,0 +1,228 @@
+import copy
+import email.utils
+import random
+import time
+from typing import Optional
+
+import requests
+import urllib3
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+# Responses that mean "try again later", rather than "this request is wrong"
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Methods that can be repeated without changing the result beyond the first success
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# Kinds of transport error, as reported by classify_error()
+CONNECT_ERROR = 'connect'
+NETWORK_ERROR = 'network'
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """
+    Parses a Retry-After header, which may be a number of seconds or an HTTP date.
+
+    :param value: the header value, e.g. '120' or 'Tue, 15 Nov 1994 08:12:31 GMT'
+
+    :return: seconds to wait, or None if the header can't be parsed
+
+    :rtype: float
+
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(email.utils.mktime_tz(parsed) - time.time(), 0.0)
+
+
+def classify_requests_error(error: Exception) -> Optional[str]:
+    """
+    Sorts an exception from the requests library into the kinds of error the retry policy cares about.
+
+    :param error: an exception raised by requests
+
+    :return: CONNECT_ERROR if the request never reached the server, NETWORK_ERROR if it failed in transit (so the
+             server may have acted on it), or None if retrying won't help
+
+    :rtype: str
+
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return CONNECT_ERROR
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        if isinstance(reason, urllib3.exceptions.NewConnectionError):
+            return CONNECT_ERROR
+        return NETWORK_ERROR
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return NETWORK_ERROR
+    return None
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Sorts an exception from requests or httpx into the kinds of error the retry policy cares about, so the
+    synchronous and async integrations retry the same failures.
+
+    :param error: an exception raised while sending a request
+
+    :return: CONNECT_ERROR if the request never reached the server, NETWORK_ERROR if it failed in transit (so the
+             server may have acted on it), or None if retrying won't help
+
+    :rtype: str
+
+    """
+    if httpx is not None and isinstance(error, httpx.HTTPError):
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return CONNECT_ERROR
+        if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+            return NETWORK_ERROR
+        return None
+    return classify_requests_error(error)
+
+
+def rewind_files(files: dict):
+    """
+    Seeks the files of a multipart upload back to the start, so a retried upload sends the whole file again.
+
+    :param files: the files dict passed to the HTTP library, mapping field names to file objects or
+                  (filename, file object) tuples
+
+    :return: None
+
+    """
+    for value in files.values():
+        file = value[1] if isinstance(value, tuple) else value
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+
+class TDXRetryPolicy:
+    """
+    Decides whether a failed request should be retried, and how long to wait first.
+
+    Requests are retried on 429 and 5xx responses and on transient network errors, with exponential backoff and
+    full jitter, so a crowd of workers doesn't retry in lock-step. A Retry-After header from the server is honored.
+
+    Writes are only retried when that's safe: PUT and DELETE are idempotent, but a POST or PATCH is only retried
+    if the server can't have acted on it (the connection was never made, or the server answered 429), unless
+    retry_writes is set.
+    """
+
+    def __init__(self, retries: int = 3, backoff: float = 0.5, backoff_max: float = 30.0,
+                 retry_writes: bool = False, statuses=RETRY_STATUSES):
+        """
+        :param retries: how many times to retry a failed request (Default: 3)
+        :param backoff: base delay in seconds. Retry n waits up to backoff * 2^n (Default: 0.5)
+        :param backoff_max: longest delay in seconds between attempts, unless the server asks for more (Default: 30)
+        :param retry_writes: also retry POST and PATCH after errors where they might have been processed
+                             (Default: False)
+        :param statuses: HTTP status codes to retry (Default: 429, 500, 502, 503, 504)
+
+        """
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_writes = retry_writes
+        self.statuses = frozenset(statuses)
+
+    def with_retries(self, retries: int) -> 'TDXRetryPolicy':
+        """
+        Makes a copy of this policy with a different number of retries, for per-call overrides.
+
+        :param retries: how many times to retry a failed request
+
+        :return: a new TDXRetryPolicy
+
+        """
+        policy = copy.copy(self)
+        policy.retries = max(0, retries)
+        return policy
+
+    def is_retryable(self, method: str, status_code: int = None, error_kind: str = None) -> bool:
+        """
+        Decides whether a failed request may be sent again.
+
+        :param method: the HTTP method of the request
+        :param status_code: the HTTP status the server answered with, if any
+        :param error_kind: CONNECT_ERROR or NETWORK_ERROR if the request failed in transit
+
+        :return: True if the request can safely be retried
+
+        :rtype: bool
+
+        """
+        safe = method.upper() in IDEMPOTENT_METHODS or self.retry_writes
+        if error_kind == CONNECT_ERROR:
+            return True
+        if error_kind == NETWORK_ERROR:
+            return safe
+        if status_code in self.statuses:
+            # A 429 is rejected before TDX does anything with the request, so it's always safe to repeat
+            return safe or status_code == 429
+        return False
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Picks a delay for a retry using exponential backoff with full jitter.
+
+        :param attempt: how many attempts have been made so far (starting at 0)
+
+        :return: seconds to wait
+
+        :rtype: float
+
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def next_delay(self, method: str, attempt: int, status_code: int = None, headers=None,
+                   error_kind: str = None) -> Optional[float]:
+        """
+        Decides what to do after a failed attempt.
+
+        :param method: the HTTP method of the request
+        :param attempt: how many attempts have failed before this one (starting at 0)
+        :param status_code: the HTTP status the server answered with, if any
+        :param headers: the response headers, if any (for Retry-After)
+        :param error_kind: CONNECT_ERROR or NETWORK_ERROR if the request failed in transit
+
+        :return: seconds to wait before retrying, or None to give up
+
+        :rtype: float
+
+        """
+        if attempt >= self.retries or not self.is_retryable(method, status_code, error_kind):
+            return None
+        if headers is not None and 'Retry-After' in headers:
+            retry_after = parse_retry_after(headers['Retry-After'])
+            if retry_after is not None:
+                return retry_after
+        return self.backoff_delay(attempt)
+
+
+def policy_from_config(config) -> TDXRetryPolicy:
+    """
+    Builds the retry policy for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXRetryPolicy
+
+    :rtype: TDXRetryPolicy
+
+    """
+    return TDXRetryPolicy(retries=config.retries, backoff=config.retry_backoff, backoff_max=config.retry_backoff_max,
+                          retry_writes=config.retry_writes)
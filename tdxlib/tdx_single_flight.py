@@ -0,0 +1,140 @@
+import asyncio
+import copy
+import logging
+import threading
+
+import tdxlib.tdx_deadline
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class _AsyncCall:
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.followers = 0
+
+
+class TDXSingleFlight:
+    """
+    Coalesces identical requests made at the same time from several threads.
+
+    The first caller for a key (the leader) does the work. Anyone who asks for the same key before it finishes waits
+    for the leader's result instead of making their own request. Followers get a deep copy of the result, so
+    nobody can change what another caller sees.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('tdx_integration')
+        self._lock = threading.Lock()
+        self._calls = dict()
+        self.coalesced = 0
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Calls function(*args, **kwargs), unless a call for the same key is already running, in which case its
+        result is used instead.
+
+        :param key: identifies calls that give the same result, such as a request URL
+        :param function: the function to call
+        :param args: positional arguments for function
+        :param kwargs: keyword arguments for function
+
+        :return: what function returned (a copy of it, for followers). If the leader raised an exception, followers
+                 raise it too. A follower whose deadline passes while waiting gets None.
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+            else:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+        if leader:
+            try:
+                call.result = function(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            # The followers copy the result, so it mustn't change under them
+            return copy.deepcopy(call.result) if call.followers else call.result
+        if not call.done.wait(tdxlib.tdx_deadline.remaining()):
+            self.logger.error(f"Deadline passed while waiting for a duplicate request to {key} to finish.")
+            return None
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+
+class TDXAsyncSingleFlight:
+    """
+    Coalesces identical requests made at the same time from several asyncio tasks. Works the same way as
+    TDXSingleFlight.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('tdx_integration')
+        self._calls = dict()
+        self.coalesced = 0
+
+    async def do(self, key, function, *args, **kwargs):
+        """
+        Awaits function(*args, **kwargs), unless a call for the same key is already running, in which case its
+        result is used instead.
+
+        :param key: identifies calls that give the same result, such as a request URL
+        :param function: the coroutine function to call
+        :param args: positional arguments for function
+        :param kwargs: keyword arguments for function
+
+        :return: what function returned (a copy of it, for followers). If the leader raised an exception, followers
+                 raise it too. A follower whose deadline passes while waiting gets None.
+
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _AsyncCall()
+            self._calls[key] = call
+            try:
+                result = await function(*args, **kwargs)
+            except BaseException as e:
+                if isinstance(e, asyncio.CancelledError):
+                    call.future.cancel()
+                else:
+                    call.future.set_exception(e)
+                    # Mark the exception as retrieved, in case there were no followers to see it
+                    call.future.exception()
+                raise
+            else:
+                call.future.set_result(result)
+                # The followers copy the result, so it mustn't change under them
+                return copy.deepcopy(result) if call.followers else result
+            finally:
+                del self._calls[key]
+        call.followers += 1
+        self.coalesced += 1
+        try:
+            # shield(), so a follower timing out or being cancelled doesn't cancel the leader's request
+            result = await asyncio.wait_for(asyncio.shield(call.future), tdxlib.tdx_deadline.remaining())
+        except asyncio.TimeoutError:
+            self.logger.error(f"Deadline passed while waiting for a duplicate request to {key} to finish.")
+            return None
+        except asyncio.CancelledError:
+            if not call.future.cancelled():
+                raise
+            # The leader was cancelled, so nobody is making the request any more. Make it here instead.
+            return await self.do(key, function, *args, **kwargs)
+        return copy.deepcopy(result)
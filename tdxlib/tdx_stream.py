@@ -0,0 +1,230 @@
+import re
+from typing import Callable, Iterable, Iterator
+
+import tdxlib.tdx_json
+
+
+# Characters that change the structure of a JSON document, outside of strings
+_STRUCTURAL = re.compile(rb'["\[\]{},:]')
+# Characters that matter inside a JSON string
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+class TDXJSONArrayStream:
+    """
+    Parses the elements of a JSON array incrementally, as the bytes of the document arrive.
+
+    The array can be the whole document (like a ticket or asset search response), or the value of a key in the
+    top-level object (like the DataRows of a report). Each element is decoded as soon as its last byte arrives,
+    and the bytes before it are dropped, so memory use is bounded by the largest element rather than the whole
+    response.
+    """
+
+    def __init__(self, key: str = None, codec: tdxlib.tdx_json.TDXJSONCodec = None):
+        """
+        :param key: key in the top-level object whose array should be streamed. None if the whole document is the
+                    array. (Default: None)
+        :param codec: TDXJSONCodec to decode elements with (Default: the fastest one installed)
+
+        """
+        self.key = key
+        self.codec = codec or tdxlib.tdx_json.TDXJSONCodec()
+        self.done = False
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = None
+        # Depth just inside the target array, once it has been found
+        self._array_depth = None
+        # Start of the current array element (just after the '[' or ',' before it)
+        self._element_start = None
+        # Raw text of the last string seen at the top level of the object (a possible key), in key mode
+        self._last_string = None
+        self._key_matched = False
+
+    def feed(self, chunk: bytes) -> list:
+        """
+        Adds the next chunk of the document.
+
+        :param chunk: the next bytes of the JSON document
+
+        :return: list of array elements completed by this chunk, decoded
+
+        :rtype: list
+
+        """
+        if self.done or not chunk:
+            return []
+        self._buffer += chunk
+        elements = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and not self.done:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if not match:
+                    pos = len(buffer)
+                    break
+                if buffer[match.start()] == 0x5C:  # backslash
+                    if match.start() + 1 >= len(buffer):
+                        # The escaped character hasn't arrived yet
+                        pos = match.start()
+                        break
+                    pos = match.start() + 2
+                    continue
+                self._in_string = False
+                pos = match.end()
+                if self._array_depth is None and self._depth == 1:
+                    self._last_string = bytes(buffer[self._string_start:pos])
+                continue
+            match = _STRUCTURAL.search(buffer, pos)
+            if not match:
+                pos = len(buffer)
+                break
+            char = buffer[match.start()]
+            pos = match.end()
+            if char == 0x22:  # "
+                self._in_string = True
+                self._string_start = match.start()
+            elif self._array_depth is not None:
+                if char in b'[{':
+                    self._depth += 1
+                elif char in b']}':
+                    if self._depth == self._array_depth:
+                        self._add_element(elements, match.start())
+                        self.done = True
+                    self._depth -= 1
+                elif char == 0x2C and self._depth == self._array_depth:  # ,
+                    self._add_element(elements, match.start())
+                    self._element_start = pos
+            elif char in b'[{':
+                if char == 0x5B and (self._key_matched and self._depth == 1 or self.key is None and self._depth == 0):
+                    self._array_depth = self._depth + 1
+                    self._element_start = pos
+                self._depth += 1
+            elif char in b']}':
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == 0x3A:  # :
+                    self._key_matched = self._last_string is not None and \
+                        self.codec.loads(self._last_string) == self.key
+                else:
+                    self._key_matched = False
+                self._last_string = None
+        self._pos = pos
+        self._compact()
+        return elements
+
+    def close(self):
+        """
+        Checks that the whole array arrived.
+
+        :return: None
+
+        """
+        if self._array_depth is not None and not self.done:
+            raise ValueError("JSON document ended in the middle of the array being streamed.")
+        if self._array_depth is None and self.key is None:
+            raise ValueError("JSON document didn't contain an array.")
+
+    def _add_element(self, elements: list, end: int):
+        text = bytes(self._buffer[self._element_start:end]).strip()
+        if text:
+            elements.append(self.codec.loads(text))
+
+    def _compact(self):
+        # Drop everything that can't be needed again
+        keep = self._pos
+        if self._in_string and self._string_start is not None:
+            keep = min(keep, self._string_start)
+        if self._array_depth is not None and self._element_start is not None:
+            keep = min(keep, self._element_start)
+        if keep > 0:
+            del self._buffer[:keep]
+            self._pos -= keep
+            if self._string_start is not None:
+                self._string_start -= keep
+            if self._element_start is not None:
+                self._element_start -= keep
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str = None,
+                    codec: tdxlib.tdx_json.TDXJSONCodec = None) -> Iterator:
+    """
+    Yields the elements of a JSON array as they are parsed from a stream of chunks.
+
+    :param chunks: iterable of bytes, such as requests.Response.iter_content()
+    :param key: key in the top-level object whose array should be streamed, or None if the whole document is the
+                array (Default: None)
+    :param codec: TDXJSONCodec to decode elements with (Default: the fastest one installed)
+
+    :return: generator of decoded array elements
+
+    """
+    stream = TDXJSONArrayStream(key, codec)
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+        if stream.done:
+            return
+    stream.close()
+
+
+class TDXResponseStream:
+    """
+    Iterates over the elements of a streamed response, and closes the response once they have all been read.
+
+    A plain generator only runs its cleanup if someone starts iterating it, so a stream that was never read
+    (or was thrown away partway through) would keep its pooled connection, and its concurrency slot, forever.
+    This closes the response when the elements run out, when reading them fails, when close() is called, or
+    when the stream is garbage collected, whichever comes first. It can also be used in a with block.
+    """
+
+    def __init__(self, elements: Iterator, on_close: Callable[[], None]):
+        """
+        :param elements: iterator of decoded elements, such as from iter_json_array()
+        :param on_close: function called (once) with no arguments to close the response
+
+        """
+        self._elements = elements
+        self._on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        try:
+            return next(self._elements)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
+
+    def close(self):
+        """
+        Stops the stream and closes the response. Calling it again does nothing.
+
+        :return: None
+
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            close_elements = getattr(self._elements, 'close', None)
+            if close_elements:
+                close_elements()
+        finally:
+            self._on_close()
@@ -0,0 +1,996 @@
+import argparse
+import datetime
+import http.server
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+
+import jwt
+
+import tdxlib.tdx_constants
+import tdxlib.tdx_rate_limit
+import tdxlib.tdx_replay
+
+# Start of the path of every API URL, for the live and sandbox APIs. The stub answers on both.
+_API_PREFIX = re.compile(r'^/(SB)?TDWebApi/api', re.IGNORECASE)
+
+# Tokens the stub hands out are signed with this, so it can tell its own tokens from made-up ones
+_SIGNING_KEY = 'tdxlib-stub-server-signing-key-for-local-testing'
+_AUDIENCE = 'https://www.teamdynamix.com/'
+
+_FIRST_NAMES = ('Alex', 'Blake', 'Casey', 'Dana', 'Emery', 'Frankie', 'Gray', 'Harper', 'Jordan', 'Kai', 'Logan',
+                'Morgan', 'Parker', 'Quinn', 'Riley', 'Sawyer', 'Taylor', 'Avery')
+_LAST_NAMES = ('Adams', 'Brooks', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito', 'Jensen', 'Khan',
+               'Lopez', 'Moreau', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Silva')
+_SUBJECTS = ('Printer', 'VPN', 'Email', 'Laptop', 'Password', 'Wi-Fi', 'Projector', 'Software', 'Phone', 'Account')
+_PROBLEMS = ('not working', 'request', 'access issue', 'running slowly', 'needs replacing', 'setup', 'error message')
+
+
+def _date(value: datetime.datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _is_true(value) -> bool:
+    return str(value).lower() == 'true'
+
+
+def _contains(text, *values) -> bool:
+    # Case-insensitive substring match of a search text against any of the values. Empty searches match everything.
+    if not text:
+        return True
+    text = str(text).lower()
+    return any(value is not None and text in str(value).lower() for value in values)
+
+
+def _by_name_first(items: list, text: str) -> list:
+    # Puts exact name matches first, the way TDX ranks search results
+    return sorted(items, key=lambda item: str(item.get('Name', '')).lower() != str(text or '').lower())
+
+
+class TDXStubData:
+    """
+    Synthetic TDX data for the stub server: people, accounts, groups, locations, custom attributes, tickets (with
+    feeds and tasks), assets, products, KB articles, services and reports. The same scale and seed always generate
+    the same data.
+
+    Fixed reference data uses the names TDX ships with (ticket statuses "New", "Open" and "Closed", asset statuses
+    "Inventory", "In Use" and "Broken", and so on), so tdxlib's defaults find what they look for.
+    """
+
+    ticket_status_names = (('New', 1), ('Open', 2), ('In Process', 2), ('On Hold', 5), ('Resolved', 3),
+                           ('Closed', 3), ('Cancelled', 4))
+    asset_status_names = ('Inventory', 'In Use', 'Broken', 'Retired', 'Disposed')
+
+    def __init__(self, scale: float = 1, seed: int = 0):
+        """
+        :param scale: how much data to generate. Scale 1 is 200 tickets, 200 assets, 50 people and 10 each of
+                      accounts, groups and locations, and everything grows in proportion. (Default: 1)
+        :param seed: seed for the random generator (Default: 0)
+
+        """
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.now = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+        def named(names, start: int, **extra) -> list:
+            return [dict({'ID': start + i, 'Name': name, 'IsActive': True, 'Order': i + 1}, **extra)
+                    for i, name in enumerate(names)]
+
+        # Ticket reference data
+        self.ticket_types = named(['Service Request', 'Standard Incident', 'Major Incident', 'Change', 'Problem'],
+                                  3001, CategoryID=1, CategoryName='General')
+        self.ticket_statuses = [{'ID': 4001 + i, 'Name': name, 'StatusClass': status_class, 'IsActive': True,
+                                 'Order': i + 1, 'IsDefault': i == 0}
+                                for i, (name, status_class) in enumerate(self.ticket_status_names)]
+        self.ticket_priorities = named(['Low', 'Medium', 'High', 'Emergency'], 5001, IsDefault=False)
+        self.ticket_urgencies = named(['Low', 'Normal', 'High'], 6001, IsDefault=False)
+        self.ticket_impacts = named(['Low', 'Medium', 'High'], 7001, IsDefault=False)
+        self.ticket_sources = named(['Email', 'Phone', 'Walk-In', 'Web'], 8001, IsDefault=False)
+        self.ticket_forms = named(['Default Ticket Form', 'Hardware Request Form'], 11001, IsDefaultForApp=False)
+        self.ticket_forms[0]['IsDefaultForApp'] = True
+
+        # Asset reference data
+        self.asset_statuses = named(self.asset_status_names, 2001, IsOutOfService=False)
+        self.asset_forms = named(['Default Asset Form', 'Computer Form'], 10001, IsDefaultForApp=False)
+        self.asset_forms[0]['IsDefaultForApp'] = True
+        self.product_types = named(['Laptop', 'Desktop', 'Monitor', 'Printer', 'Phone'], 80001, ParentID=0,
+                                   Subtypes=[])
+        self.vendors = named([f'Vendor {i + 1}' for i in range(self.count(5))], 90001, IsManufacturer=True)
+        self.product_models = [
+            {'ID': 70001 + i, 'Name': f'MODEL-{i + 1:03d}', 'IsActive': True,
+             'ProductTypeID': self.pick(self.product_types)['ID'], 'ManufacturerID': self.pick(self.vendors)['ID'],
+             'PartNumber': f'PN-{i + 1:05d}'}
+            for i in range(self.count(20))]
+
+        # Organization
+        self.people = [self.person(i) for i in range(self.count(50))]
+        self.accounts = named(['Information Technology'] + [f'Department {i + 1}' for i in range(self.count(10) - 1)],
+                              50001)
+        self.groups = named([f'Support Group {i + 1}' for i in range(self.count(10))], 60001)
+        self.members = {group['ID']: self.random.sample(self.people, min(5, len(self.people)))
+                        for group in self.groups}
+        self.locations = [
+            dict(location, Rooms=[{'ID': location['ID'] * 100 + r, 'Name': f'Room {r + 101}'} for r in range(3)])
+            for location in named([f'Building {i + 1}' for i in range(self.count(10))], 9001)]
+
+        # Custom attributes, for tickets, assets, configuration items and accounts
+        self.custom_attributes = dict()
+        attribute_ids = itertools.count(30001)
+        choice_ids = itertools.count(40001)
+        for component in ('ticket', 'asset', 'configuration_item', 'account'):
+            component_id = tdxlib.tdx_constants.component_ids[component]
+            self.custom_attributes[component_id] = [
+                {'ID': next(attribute_ids), 'Name': name, 'ComponentID': component_id, 'FieldType': field_type,
+                 'IsActive': True, 'IsRequired': False,
+                 'Choices': [{'ID': next(choice_ids), 'Name': f'Option {c}', 'IsActive': True} for c in 'ABC']
+                 if field_type == 'dropdown' else []}
+                for name, field_type in (('Department Code', 'dropdown'), ('Support Tier', 'dropdown'),
+                                         ('Notes', 'textbox'))]
+
+        # Tickets, with feeds and tasks
+        self.tickets = dict()
+        self.feeds = dict()
+        self.tasks = dict()
+        self.task_feeds = dict()
+        self.ticket_assets = dict()
+        task_ids = itertools.count(2000001)
+        for i in range(self.count(200)):
+            ticket = self.ticket(1000001 + i)
+            self.tickets[ticket['ID']] = ticket
+            self.feeds[ticket['ID']] = [self.feed_entry() for _ in range(self.random.randint(1, 3))]
+            self.tasks[ticket['ID']] = dict()
+            for _ in range(self.random.choice((0, 0, 1, 2))):
+                task = self.task(next(task_ids), ticket['ID'])
+                self.tasks[ticket['ID']][task['ID']] = task
+                self.task_feeds[task['ID']] = [self.feed_entry()]
+            self.ticket_assets[ticket['ID']] = []
+        self.next_ticket_id = itertools.count(1000001 + len(self.tickets))
+        self.next_task_id = task_ids
+
+        # Assets
+        self.assets = dict()
+        self.asset_users = dict()
+        for i in range(self.count(200)):
+            asset = self.asset(100001 + i)
+            self.assets[asset['ID']] = asset
+            self.asset_users[asset['ID']] = [self.pick(self.people)['UID']]
+        self.next_asset_id = itertools.count(100001 + len(self.assets))
+
+        # Client portal
+        self.article_categories = named(['Getting Started', 'Accounts', 'Networking', 'Hardware'], 12001,
+                                        ParentID=0, IsPublic=True, Subcategories=[])
+        self.articles = {1 + i: self.article(1 + i) for i in range(self.count(40))}
+        self.service_categories = named(['Accounts and Access', 'Hardware', 'Software'], 13001, ParentID=0,
+                                        Subcategories=[])
+        self.services = {1 + i: self.service(1 + i) for i in range(self.count(20))}
+
+        # Reports
+        self.reports = {14001 + i: self.report(14001 + i, name) for i, name in
+                        enumerate(['Open Tickets', 'Tickets by Group', 'Assets by Location'])}
+
+    def count(self, base: int) -> int:
+        """
+        :param base: how many of something there are at scale 1
+
+        :return: how many there are at this scale (at least 1)
+
+        :rtype: int
+
+        """
+        return max(1, int(base * self.scale))
+
+    def pick(self, items: list) -> dict:
+        return self.random.choice(items)
+
+    def date(self, days_back: int = 365) -> str:
+        return _date(self.now - datetime.timedelta(minutes=self.random.randint(0, days_back * 24 * 60)))
+
+    def person(self, i: int) -> dict:
+        first = _FIRST_NAMES[i % len(_FIRST_NAMES)]
+        last = _LAST_NAMES[(i // len(_FIRST_NAMES)) % len(_LAST_NAMES)]
+        username = f'{first[0]}{last}{i + 1}'.lower()
+        return {'UID': str(uuid.UUID(int=self.random.getrandbits(128), version=4)), 'FirstName': first,
+                'LastName': last, 'FullName': f'{first} {last}', 'UserName': username,
+                'PrimaryEmail': f'{username}@example.edu', 'AlertEmail': f'{username}@example.edu',
+                'AlternateID': str(10000 + i), 'IsActive': True, 'IsEmployee': True,
+                'DefaultAccountID': 50001, 'Title': 'Staff'}
+
+    def attributes(self, component: str) -> list:
+        # A value for each custom attribute of the component, the way TDX includes them in full records
+        result = []
+        for attribute in self.custom_attributes[tdxlib.tdx_constants.component_ids[component]]:
+            if attribute['Choices']:
+                choice = self.pick(attribute['Choices'])
+                result.append({'ID': attribute['ID'], 'Name': attribute['Name'], 'Value': str(choice['ID']),
+                               'ValueText': choice['Name']})
+            else:
+                result.append({'ID': attribute['ID'], 'Name': attribute['Name'], 'Value': 'Synthetic value',
+                               'ValueText': 'Synthetic value'})
+        return result
+
+    def ticket(self, ticket_id: int) -> dict:
+        requestor = self.pick(self.people)
+        responsible = self.pick(self.people)
+        group = self.pick(self.groups)
+        status = self.pick(self.ticket_statuses)
+        ticket_type = self.pick(self.ticket_types)
+        priority = self.pick(self.ticket_priorities)
+        account = self.pick(self.accounts)
+        created = self.date()
+        return {
+            'ID': ticket_id, 'Title': f'{self.pick(_SUBJECTS)} {self.pick(_PROBLEMS)}',
+            'Description': 'Synthetic ticket generated by the tdxlib stub server.',
+            'TypeID': ticket_type['ID'], 'TypeName': ticket_type['Name'], 'Classification': 46,
+            'ClassificationName': 'Incident', 'FormID': self.ticket_forms[0]['ID'],
+            'StatusID': status['ID'], 'StatusName': status['Name'], 'StatusClass': status['StatusClass'],
+            'PriorityID': priority['ID'], 'PriorityName': priority['Name'],
+            'UrgencyID': self.pick(self.ticket_urgencies)['ID'], 'ImpactID': self.pick(self.ticket_impacts)['ID'],
+            'SourceID': self.pick(self.ticket_sources)['ID'],
+            'AccountID': account['ID'], 'AccountName': account['Name'],
+            'RequestorUid': requestor['UID'], 'RequestorName': requestor['FullName'],
+            'RequestorEmail': requestor['PrimaryEmail'],
+            'ResponsibleUid': responsible['UID'], 'ResponsibleFullName': responsible['FullName'],
+            'ResponsibleGroupID': group['ID'], 'ResponsibleGroupName': group['Name'],
+            'LocationID': self.pick(self.locations)['ID'],
+            'CreatedDate': created, 'ModifiedDate': created, 'StartDate': created,
+            'IsOnHold': status['StatusClass'] == 5, 'Attributes': self.attributes('ticket')
+        }
+
+    def feed_entry(self, body: str = None, private: bool = False) -> dict:
+        author = self.pick(self.people)
+        return {'ID': next(self.ids), 'CreatedDate': self.date(), 'CreatedUid': author['UID'],
+                'CreatedFullName': author['FullName'], 'Body': body or 'Synthetic update.', 'IsPrivate': private,
+                'Notify': [], 'Replies': []}
+
+    def task(self, task_id: int, ticket_id: int) -> dict:
+        responsible = self.pick(self.people)
+        return {'ID': task_id, 'TicketID': ticket_id, 'Title': f'Task {task_id}', 'Description': 'Synthetic task.',
+                'ResponsibleUid': responsible['UID'], 'ResponsibleFullName': responsible['FullName'],
+                'ResponsibleGroupID': 0, 'PercentComplete': self.random.choice((0, 50, 100)), 'Order': 1,
+                'CreatedDate': self.date(), 'StartDate': self.date(), 'EndDate': self.date(),
+                'CompleteWithinMinutes': 60, 'EstimatedMinutes': 30, 'PredecessorID': None}
+
+    def asset(self, asset_id: int) -> dict:
+        model = self.pick(self.product_models)
+        status = self.pick(self.asset_statuses)
+        location = self.pick(self.locations)
+        owner = self.pick(self.people)
+        created = self.date()
+        return {
+            'ID': asset_id, 'Name': f'ASSET-{asset_id}', 'Tag': str(asset_id),
+            'SerialNumber': f'SN{self.random.getrandbits(40):010X}', 'FormID': self.asset_forms[0]['ID'],
+            'StatusID': status['ID'], 'StatusName': status['Name'],
+            'ProductModelID': model['ID'], 'ProductModelName': model['Name'],
+            'ManufacturerID': model['ManufacturerID'], 'SupplierID': model['ManufacturerID'],
+            'LocationID': location['ID'], 'LocationName': location['Name'],
+            'LocationRoomID': location['Rooms'][0]['ID'], 'LocationRoomName': location['Rooms'][0]['Name'],
+            'OwningCustomerID': owner['UID'], 'OwningCustomerName': owner['FullName'],
+            'OwningDepartmentID': self.pick(self.accounts)['ID'], 'ParentID': 0,
+            'PurchaseCost': round(self.random.uniform(100, 3000), 2), 'AcquisitionDate': created,
+            'CreatedDate': created, 'ModifiedDate': created, 'Attributes': self.attributes('asset')
+        }
+
+    def article(self, article_id: int) -> dict:
+        category = self.pick(self.article_categories)
+        return {'ID': article_id, 'Subject': f'How to fix {self.pick(_SUBJECTS).lower()} problems ({article_id})',
+                'Body': '<p>Synthetic knowledge base article.</p>', 'Summary': 'Synthetic article.',
+                'CategoryID': category['ID'], 'CategoryName': category['Name'], 'Status': 3, 'IsPublic': True,
+                'IsPublished': True, 'CreatedDate': self.date(), 'ModifiedDate': self.date(), 'Tags': []}
+
+    def service(self, service_id: int) -> dict:
+        category = self.pick(self.service_categories)
+        return {'ID': service_id, 'Name': f'{self.pick(_SUBJECTS)} Service {service_id}',
+                'ShortDescription': 'Synthetic service.', 'CategoryID': category['ID'],
+                'CategoryName': category['Name'], 'IsActive': True, 'IsPublic': True}
+
+    def report(self, report_id: int, name: str) -> dict:
+        columns = [{'HeaderText': header, 'ColumnName': column, 'DataType': 0, 'SortColumnExpression': column}
+                   for header, column in (('ID', 'TicketID'), ('Title', 'Title'), ('Status', 'StatusName'))]
+        rows = [{'TicketID': ticket['ID'], 'Title': ticket['Title'], 'StatusName': ticket['StatusName']}
+                for ticket in itertools.islice(self.tickets.values(), self.count(100))]
+        return {'ID': report_id, 'Name': name, 'Description': 'Synthetic report.', 'MaxResults': len(rows),
+                'DisplayedColumns': columns, 'SortOrder': [], 'ChartType': None, 'ChartSettings': [],
+                'DataRows': rows, 'CreatedUid': self.people[0]['UID'], 'CreatedFullName': self.people[0]['FullName'],
+                'CreatedDate': self.date(), 'OwningGroupID': None, 'OwningGroupName': '', 'SystemAppName': 'Tickets',
+                'PlatformAppID': 0, 'PlatformAppName': None, 'ReportSourceID': 1, 'ReportSourceName': 'Tickets',
+                'Uri': f'api/reports/{report_id}'}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1, so clients can keep connections alive the way they would with TDX
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, so without this, Nagle's algorithm holds up every response
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, content, headers = self.server.stub.dispatch(self.command, self.path,
+                                                             self.headers.get('Authorization'), body)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TDXStubServer:
+    """
+    A local stand-in for the TDX web API, for load-testing tdxlib's concurrency, rate limiting and caching without
+    touching a real TDX instance. It speaks the subset of the API tdxlib uses (authentication, tickets and their
+    feeds and tasks, assets, ticket and asset reference data, people, accounts, groups, locations, custom
+    attributes, the knowledge base and services, and reports), serves synthetic data from TDXStubData, and sends
+    X-RateLimit-* headers (and 429s) the way TDX does.
+
+    Any username and password are accepted. Point an integration at the stub with the config from config():
+
+        with TDXStubServer(scale=10) as stub:
+            tdx = tdxlib.tdx_ticket_integration.TDXTicketIntegration(config=stub.config())
+
+    or run it on its own with "python -m tdxlib.tdx_stub_server --port 8080" and set full_host to
+    http://localhost:8080 (and sandbox to false).
+    """
+
+    ticket_app_id = 12
+    asset_app_id = 34
+    client_portal_app_id = 56
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, scale: float = 1, seed: int = 0,
+                 rate_limit: int = 60, rate_limit_window: float = 60.0, latency: float = 0.0,
+                 token_lifetime: float = 86400):
+        """
+        :param host: address to listen on (Default: 127.0.0.1)
+        :param port: TCP port to listen on. 0 picks a free one. (Default: 0)
+        :param scale: how much synthetic data to generate, see TDXStubData (Default: 1)
+        :param seed: seed for the synthetic data (Default: 0)
+        :param rate_limit: requests allowed per rate-limit window, like TDX's limit. 0 turns it off. (Default: 60)
+        :param rate_limit_window: length of the rate-limit window, in seconds (Default: 60.0)
+        :param latency: seconds to wait before answering each request (Default: 0.0)
+        :param token_lifetime: seconds the tokens from /auth are valid for (Default: 86400, a day)
+
+        """
+        self.host = host
+        self.port = port
+        self.data = TDXStubData(scale, seed)
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.latency = latency
+        self.token_lifetime = token_lifetime
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._window_start = None
+        self._window_count = 0
+        self._server = None
+        self._thread = None
+        self._routes = [(method, re.compile(pattern), handler) for method, pattern, handler in (
+            ('POST', r'/auth', self._auth),
+            ('POST', r'/auth/loginadmin', self._auth),
+            ('GET', r'/people/lookup', self._people_lookup),
+            ('GET', r'/people/([0-9a-fA-F-]{36})', self._person),
+            ('GET', r'/accounts', self._accounts),
+            ('POST', r'/accounts', self._create_account),
+            ('POST', r'/accounts/search', self._search_accounts),
+            ('GET', r'/accounts/(\d+)', self._account),
+            ('PUT', r'/accounts/(\d+)', self._edit_account),
+            ('POST', r'/groups/search', self._search_groups),
+            ('GET', r'/groups/(\d+)', self._group),
+            ('GET', r'/groups/(\d+)/members', self._group_members),
+            ('GET', r'/locations', self._locations),
+            ('POST', r'/locations/search', self._search_locations),
+            ('GET', r'/locations/(\d+)', self._location),
+            ('POST', r'/locations/(\d+)/rooms', self._create_room),
+            ('GET', r'/attributes/custom', self._custom_attributes),
+            ('GET', r'/reports', self._reports),
+            ('GET', r'/reports/(\d+)', self._report),
+            ('GET', r'/\d+/tickets/(forms|types|statuses|priorities|urgencies|impacts|sources)', self._ticket_list),
+            ('GET', r'/\d+/tickets/statuses/(\d+)', self._ticket_status),
+            ('POST', r'/\d+/tickets/statuses/search', self._search_ticket_statuses),
+            ('POST', r'/\d+/tickets/search', self._search_tickets),
+            ('POST', r'/\d+/tickets', self._create_ticket),
+            ('GET', r'/\d+/tickets/(\d+)', self._ticket),
+            ('POST', r'/\d+/tickets/(\d+)', self._edit_ticket),
+            ('PATCH', r'/\d+/tickets/(\d+)', self._edit_ticket),
+            ('GET', r'/\d+/tickets/(\d+)/feed', self._ticket_feed),
+            ('POST', r'/\d+/tickets/(\d+)/feed', self._update_ticket),
+            ('GET', r'/\d+/tickets/(\d+)/tasks', self._tasks),
+            ('POST', r'/\d+/tickets/(\d+)/tasks', self._create_task),
+            ('GET', r'/\d+/tickets/(\d+)/tasks/(\d+)', self._task),
+            ('PUT', r'/\d+/tickets/(\d+)/tasks/(\d+)', self._edit_task),
+            ('DELETE', r'/\d+/tickets/(\d+)/tasks/(\d+)', self._delete_task),
+            ('GET', r'/\d+/tickets/(\d+)/tasks/(\d+)/feed', self._task_feed),
+            ('POST', r'/\d+/tickets/(\d+)/tasks/(\d+)/feed', self._update_task),
+            ('GET', r'/\d+/tickets/(\d+)/assets', self._ticket_assets),
+            ('POST', r'/\d+/tickets/(\d+)/assets/(\d+)', self._add_ticket_asset),
+            ('GET', r'/\d+/assets/(forms|statuses|models|vendors|models/types)', self._asset_list),
+            ('POST', r'/\d+/assets/(models|vendors|models/types)', self._create_asset_item),
+            ('PUT', r'/\d+/assets/models/types/(\d+)', self._edit_product_type),
+            ('POST', r'/\d+/assets/models/types/search', self._search_product_types),
+            ('POST', r'/\d+/assets/search', self._search_assets),
+            ('POST', r'/\d+/assets', self._create_asset),
+            ('GET', r'/\d+/assets/(\d+)', self._asset),
+            ('POST', r'/\d+/assets/(\d+)', self._edit_asset),
+            ('GET', r'/\d+/assets/(\d+)/users', self._asset_users),
+            ('POST', r'/\d+/assets/(\d+)/users/([0-9a-fA-F-]{36})', self._add_asset_user),
+            ('DELETE', r'/\d+/assets/(\d+)/users/([0-9a-fA-F-]{36})', self._remove_asset_user),
+            ('GET', r'/\d+/(knowledgebase|services)/categories', self._portal_categories),
+            ('POST', r'/\d+/(knowledgebase|services)/search', self._search_portal),
+            ('GET', r'/\d+/(knowledgebase|services)/(\d+)', self._portal_item),
+        )]
+
+    # #### RUNNING THE SERVER #### #
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def start(self) -> 'TDXStubServer':
+        """
+        Starts serving on a background (daemon) thread.
+
+        :return: the server, for chaining
+
+        :rtype: TDXStubServer
+
+        """
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='tdxlib-stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def config(self, **overrides) -> dict:
+        """
+        Builds a config dict for an integration that talks to this server.
+
+        :param overrides: any other config values to set
+
+        :return: a dict to pass as the config of an integration (or a TDXConfig)
+
+        :rtype: dict
+
+        """
+        config = {
+            'full_host': self.url,
+            'sandbox': 'false',
+            'username': 'stub-user',
+            'password': 'stub-password',
+            'ticket_app_id': str(self.ticket_app_id),
+            'asset_app_id': str(self.asset_app_id),
+            'client_portal_app_id': str(self.client_portal_app_id)
+        }
+        config.update({key: str(value) for key, value in overrides.items()})
+        return config
+
+    # #### HANDLING REQUESTS #### #
+
+    def _rate_limit_headers(self) -> tuple:
+        # Returns whether the request is allowed, and the headers TDX would send with the response
+        now = time.time()
+        headers = {'Date': time.strftime(tdxlib.tdx_rate_limit.RESET_TIME_FORMAT, time.gmtime(now))}
+        if not self.rate_limit:
+            return True, headers
+        with self._lock:
+            if self._window_start is None or now >= self._window_start + self.rate_limit_window:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            headers.update({
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(self.rate_limit - self._window_count, 0)),
+                'X-RateLimit-Reset': time.strftime(tdxlib.tdx_rate_limit.RESET_TIME_FORMAT,
+                                                   time.gmtime(self._window_start + self.rate_limit_window))
+            })
+            return self._window_count <= self.rate_limit, headers
+
+    def _authorized(self, authorization: str) -> bool:
+        if not authorization or not authorization.startswith('Bearer '):
+            return False
+        try:
+            jwt.decode(authorization[len('Bearer '):], _SIGNING_KEY, algorithms=['HS256'], audience=_AUDIENCE)
+        except jwt.PyJWTError:
+            return False
+        return True
+
+    def dispatch(self, method: str, target: str, authorization: str = None, body: bytes = b'') -> tuple:
+        """
+        Answers one request. The HTTP handler calls this, and it can be called directly to skip the network.
+
+        :param method: the HTTP verb
+        :param target: the request path and query, starting with /TDWebApi/api or /SBTDWebApi/api
+        :param authorization: the Authorization header, if any
+        :param body: the request body
+
+        :return: the status code, the response body (as bytes) and a dict of response headers
+
+        :rtype: tuple
+
+        """
+        with self._lock:
+            self.requests += 1
+        allowed, headers = self._rate_limit_headers()
+        if not allowed:
+            with self._lock:
+                self.rate_limited += 1
+            return self._reply(429, {'Message': 'Rate limit exceeded.'}, headers)
+        if self.latency > 0:
+            time.sleep(self.latency)
+        parts = urllib.parse.urlsplit(target)
+        if not _API_PREFIX.match(parts.path):
+            return self._reply(404, {'Message': 'Not found.'}, headers)
+        path = _API_PREFIX.sub('', parts.path).rstrip('/')
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(parts.query).items()}
+        if not path.startswith('/auth') and not self._authorized(authorization):
+            return self._reply(401, {'Message': 'Authorization has been denied for this request.'}, headers)
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            return self._reply(400, {'Message': 'The request body is not valid JSON.'}, headers)
+        known_path = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if match:
+                known_path = True
+                if route_method == method:
+                    # Handlers run one at a time, so they can change the data without locking it themselves
+                    with self._lock:
+                        status, result = handler(query, payload, *match.groups())
+                    return self._reply(status, result, headers)
+        if known_path:
+            return self._reply(405, {'Message': f'The requested resource does not support {method}.'}, headers)
+        return self._reply(404, {'Message': 'No HTTP resource was found that matches the request URI.'}, headers)
+
+    @staticmethod
+    def _reply(status: int, result, headers: dict) -> tuple:
+        if result is None:
+            return status, b'', headers
+        if isinstance(result, str):
+            return status, result.encode('utf-8'), dict(headers, **{'Content-Type': 'text/plain; charset=utf-8'})
+        return status, json.dumps(result).encode('utf-8'), \
+            dict(headers, **{'Content-Type': 'application/json; charset=utf-8'})
+
+    @staticmethod
+    def _found(item) -> tuple:
+        if item is None:
+            return 404, {'Message': 'Not found.'}
+        return 200, item
+
+    @staticmethod
+    def _limit(items: list, maximum) -> list:
+        return items[:int(maximum)] if maximum not in (None, '', 0, '0') else items
+
+    # #### AUTHENTICATION, PEOPLE AND ORGANIZATION #### #
+
+    def _auth(self, query, body):
+        body = body or {}
+        if not (body.get('username') and body.get('password')) and \
+                not (body.get('BEID') and body.get('WebServicesKey')):
+            return 401, 'Invalid username or password.'
+        return 200, jwt.encode({'exp': int(time.time() + self.token_lifetime), 'aud': _AUDIENCE,
+                                'sub': body.get('username') or 'admin'}, _SIGNING_KEY, algorithm='HS256')
+
+    def _people_lookup(self, query, body):
+        text = query.get('searchText', '')
+        people = [person for person in self.data.people if _contains(
+            text, person['FullName'], person['PrimaryEmail'], person['UserName'], person['AlternateID'])]
+        return 200, self._limit(people, query.get('maxResults', 50))
+
+    def _person(self, query, body, uid):
+        return self._found(next((person for person in self.data.people if person['UID'] == uid.lower()), None))
+
+    def _accounts(self, query, body):
+        return 200, self.data.accounts
+
+    def _search_accounts(self, query, body):
+        search = (body or {}).get('search', body or {})
+        accounts = [account for account in self.data.accounts if _contains(search.get('SearchText'), account['Name'])
+                    and ('IsActive' not in search or account['IsActive'] == _is_true(search['IsActive']))]
+        return 200, self._limit(accounts, search.get('MaxResults'))
+
+    def _account(self, query, body, account_id):
+        return self._found(next((item for item in self.data.accounts if item['ID'] == int(account_id)), None))
+
+    def _create_account(self, query, body):
+        account = dict(body or {}, ID=max(item['ID'] for item in self.data.accounts) + 1)
+        account.setdefault('IsActive', True)
+        self.data.accounts.append(account)
+        return 201, account
+
+    def _edit_account(self, query, body, account_id):
+        account = next((item for item in self.data.accounts if item['ID'] == int(account_id)), None)
+        if account is None:
+            return self._found(None)
+        account.update(body or {})
+        account['ID'] = int(account_id)
+        return 200, account
+
+    def _search_groups(self, query, body):
+        search = (body or {}).get('search', body or {})
+        return 200, [group for group in self.data.groups if _contains(search.get('NameLike'), group['Name'])
+                     and ('IsActive' not in search or group['IsActive'] == _is_true(search['IsActive']))]
+
+    def _group(self, query, body, group_id):
+        return self._found(next((group for group in self.data.groups if group['ID'] == int(group_id)), None))
+
+    def _group_members(self, query, body, group_id):
+        return self._found(self.data.members.get(int(group_id)))
+
+    def _locations(self, query, body):
+        return 200, [{key: value for key, value in location.items() if key != 'Rooms'}
+                     for location in self.data.locations]
+
+    def _search_locations(self, query, body):
+        search = (body or {}).get('search', body or {})
+        return 200, [{key: value for key, value in location.items() if key != 'Rooms'}
+                     for location in self.data.locations if _contains(search.get('NameLike'), location['Name'])
+                     and ('IsActive' not in search or location['IsActive'] == _is_true(search['IsActive']))]
+
+    def _location(self, query, body, location_id):
+        return self._found(next((item for item in self.data.locations if item['ID'] == int(location_id)), None))
+
+    def _create_room(self, query, body, location_id):
+        location = next((item for item in self.data.locations if item['ID'] == int(location_id)), None)
+        if location is None:
+            return self._found(None)
+        room = dict(body or {}, ID=location['ID'] * 100 + len(location['Rooms']))
+        location['Rooms'].append(room)
+        return 201, room
+
+    def _custom_attributes(self, query, body):
+        return 200, self.data.custom_attributes.get(int(query.get('componentId') or 0), [])
+
+    def _reports(self, query, body):
+        return 200, [{key: value for key, value in report.items() if key != 'DataRows'}
+                     for report in self.data.reports.values()]
+
+    def _report(self, query, body, report_id):
+        report = self.data.reports.get(int(report_id))
+        if report is None or _is_true(query.get('withData')):
+            return self._found(report)
+        return 200, dict(report, DataRows=None)
+
+    # #### TICKETS #### #
+
+    def _ticket_list(self, query, body, kind):
+        return 200, {'forms': self.data.ticket_forms, 'types': self.data.ticket_types,
+                     'statuses': self.data.ticket_statuses, 'priorities': self.data.ticket_priorities,
+                     'urgencies': self.data.ticket_urgencies, 'impacts': self.data.ticket_impacts,
+                     'sources': self.data.ticket_sources}[kind]
+
+    def _ticket_status(self, query, body, status_id):
+        return self._found(next((item for item in self.data.ticket_statuses if item['ID'] == int(status_id)), None))
+
+    def _search_ticket_statuses(self, query, body):
+        text = (body or {}).get('SearchText')
+        return 200, _by_name_first([item for item in self.data.ticket_statuses if _contains(text, item['Name'])],
+                                   text)
+
+    def _search_tickets(self, query, body):
+        search = body or {}
+        filters = {'StatusIDs': 'StatusID', 'TypeIDs': 'TypeID', 'PriorityIDs': 'PriorityID',
+                   'AccountIDs': 'AccountID', 'RequestorUids': 'RequestorUid', 'ResponsibilityUids': 'ResponsibleUid',
+                   'ResponsibilityGroupIDs': 'ResponsibleGroupID', 'LocationIDs': 'LocationID'}
+        tickets = [
+            # Search results leave out custom attributes, like TDX's do
+            {key: value for key, value in ticket.items() if key != 'Attributes'}
+            for ticket in self.data.tickets.values()
+            if _contains(search.get('SearchText'), ticket['Title'], ticket['Description'], ticket['ID'])
+            and all(ticket[field] in search[key] for key, field in filters.items() if search.get(key))]
+        return 200, self._limit(tickets, search.get('MaxResults'))
+
+    def _create_ticket(self, query, body):
+        ticket = dict(body or {})
+        missing = [key for key in ('TypeID', 'AccountID', 'PriorityID', 'StatusID', 'Title') if key not in ticket]
+        if missing:
+            return 400, {'Message': 'Missing required fields: ' + ', '.join(missing)}
+        now = _date(datetime.datetime.now(datetime.timezone.utc))
+        ticket.update({'ID': next(self.data.next_ticket_id), 'CreatedDate': now, 'ModifiedDate': now})
+        ticket.setdefault('Attributes', [])
+        self.data.tickets[ticket['ID']] = ticket
+        self.data.feeds[ticket['ID']] = []
+        self.data.tasks[ticket['ID']] = dict()
+        self.data.ticket_assets[ticket['ID']] = []
+        return 201, ticket
+
+    def _ticket(self, query, body, ticket_id):
+        return self._found(self.data.tickets.get(int(ticket_id)))
+
+    def _edit_ticket(self, query, body, ticket_id):
+        ticket = self.data.tickets.get(int(ticket_id))
+        if ticket is None:
+            return self._found(None)
+        if isinstance(body, list):
+            # A JSON patch document
+            for operation in body:
+                if operation.get('op') in ('add', 'replace'):
+                    ticket[operation['path'].strip('/')] = operation.get('value')
+        else:
+            ticket.update(body or {})
+        ticket['ID'] = int(ticket_id)
+        ticket['ModifiedDate'] = _date(datetime.datetime.now(datetime.timezone.utc))
+        return 200, ticket
+
+    def _ticket_feed(self, query, body, ticket_id):
+        return self._found(self.data.feeds.get(int(ticket_id)))
+
+    def _update_ticket(self, query, body, ticket_id):
+        ticket = self.data.tickets.get(int(ticket_id))
+        if ticket is None:
+            return self._found(None)
+        body = body or {}
+        if body.get('NewStatusID'):
+            ticket['StatusID'] = body['NewStatusID']
+        entry = self.data.feed_entry(body.get('Comments'), bool(body.get('IsPrivate')))
+        self.data.feeds[ticket['ID']].insert(0, entry)
+        return 201, entry
+
+    def _tasks(self, query, body, ticket_id):
+        tasks = self.data.tasks.get(int(ticket_id))
+        return self._found(None if tasks is None else list(tasks.values()))
+
+    def _create_task(self, query, body, ticket_id):
+        tasks = self.data.tasks.get(int(ticket_id))
+        if tasks is None:
+            return self._found(None)
+        task = dict(body or {}, ID=next(self.data.next_task_id), TicketID=int(ticket_id))
+        tasks[task['ID']] = task
+        self.data.task_feeds[task['ID']] = []
+        return 201, task
+
+    def _task(self, query, body, ticket_id, task_id):
+        return self._found(self.data.tasks.get(int(ticket_id), {}).get(int(task_id)))
+
+    def _edit_task(self, query, body, ticket_id, task_id):
+        task = self.data.tasks.get(int(ticket_id), {}).get(int(task_id))
+        if task is None:
+            return self._found(None)
+        task.update(body or {})
+        task.update({'ID': int(task_id), 'TicketID': int(ticket_id)})
+        return 200, task
+
+    def _delete_task(self, query, body, ticket_id, task_id):
+        task = self.data.tasks.get(int(ticket_id), {}).pop(int(task_id), None)
+        if task is None:
+            return self._found(None)
+        return 200, None
+
+    def _task_feed(self, query, body, ticket_id, task_id):
+        if int(task_id) not in self.data.tasks.get(int(ticket_id), {}):
+            return self._found(None)
+        return 200, self.data.task_feeds[int(task_id)]
+
+    def _update_task(self, query, body, ticket_id, task_id):
+        task = self.data.tasks.get(int(ticket_id), {}).get(int(task_id))
+        if task is None:
+            return self._found(None)
+        body = body or {}
+        if 'PercentComplete' in body:
+            task['PercentComplete'] = body['PercentComplete']
+        entry = self.data.feed_entry(body.get('Comments'), bool(body.get('IsPrivate')))
+        self.data.task_feeds[task['ID']].insert(0, entry)
+        return 201, entry
+
+    def _ticket_assets(self, query, body, ticket_id):
+        return self._found(self.data.ticket_assets.get(int(ticket_id)))
+
+    def _add_ticket_asset(self, query, body, ticket_id, asset_id):
+        asset = self.data.assets.get(int(asset_id))
+        if int(ticket_id) not in self.data.tickets or asset is None:
+            return self._found(None)
+        self.data.ticket_assets[int(ticket_id)].append({'BackingItemID': asset['ID'], 'Name': asset['Name']})
+        return 200, None
+
+    # #### ASSETS #### #
+
+    def _asset_list(self, query, body, kind):
+        return 200, {'forms': self.data.asset_forms, 'statuses': self.data.asset_statuses,
+                     'models': self.data.product_models, 'vendors': self.data.vendors,
+                     'models/types': self.data.product_types}[kind]
+
+    def _create_asset_item(self, query, body, kind):
+        items = {'models': self.data.product_models, 'vendors': self.data.vendors,
+                 'models/types': self.data.product_types}[kind]
+        item = dict(body or {}, ID=max(existing['ID'] for existing in items) + 1)
+        item.setdefault('IsActive', True)
+        items.append(item)
+        return 201, item
+
+    def _edit_product_type(self, query, body, type_id):
+        product_type = next((item for item in self.data.product_types if item['ID'] == int(type_id)), None)
+        if product_type is None:
+            return self._found(None)
+        product_type.update(body or {})
+        product_type['ID'] = int(type_id)
+        return 200, product_type
+
+    def _search_product_types(self, query, body):
+        search = body or {}
+        return 200, [item for item in self.data.product_types if _contains(search.get('SearchText'), item['Name'])
+                     and ('IsActive' not in search or item['IsActive'] == _is_true(search['IsActive']))]
+
+    def _search_assets(self, query, body):
+        search = body or {}
+        filters = {'StatusIDs': 'StatusID', 'ProductModelIDs': 'ProductModelID', 'LocationIDs': 'LocationID',
+                   'ManufacturerIDs': 'ManufacturerID', 'OwningDepartmentIDs': 'OwningDepartmentID',
+                   'OwningCustomerIDs': 'OwningCustomerID', 'FormIDs': 'FormID'}
+        assets = [
+            # Search results leave out custom attributes, like TDX's do
+            {key: value for key, value in asset.items() if key != 'Attributes'}
+            for asset in self.data.assets.values()
+            if _contains(search.get('SearchText'), asset['Name'], asset['Tag'], asset['SerialNumber'])
+            and all(asset[field] in search[key] for key, field in filters.items() if search.get(key))]
+        return 200, self._limit(assets, search.get('MaxResults'))
+
+    def _create_asset(self, query, body):
+        asset = dict(body or {})
+        if 'StatusID' not in asset:
+            return 400, {'Message': 'Missing required fields: StatusID'}
+        now = _date(datetime.datetime.now(datetime.timezone.utc))
+        asset.update({'ID': next(self.data.next_asset_id), 'CreatedDate': now, 'ModifiedDate': now})
+        asset.setdefault('Attributes', [])
+        self.data.assets[asset['ID']] = asset
+        self.data.asset_users[asset['ID']] = []
+        return 201, asset
+
+    def _asset(self, query, body, asset_id):
+        return self._found(self.data.assets.get(int(asset_id)))
+
+    def _edit_asset(self, query, body, asset_id):
+        asset = self.data.assets.get(int(asset_id))
+        if asset is None:
+            return self._found(None)
+        asset.update(body or {})
+        asset['ID'] = int(asset_id)
+        asset['ModifiedDate'] = _date(datetime.datetime.now(datetime.timezone.utc))
+        return 200, asset
+
+    def _asset_users(self, query, body, asset_id):
+        users = self.data.asset_users.get(int(asset_id))
+        if users is None:
+            return self._found(None)
+        people = {person['UID']: person for person in self.data.people}
+        return 200, [{'ItemID': int(asset_id), 'Value': uid, 'Name': people.get(uid, {}).get('FullName', '')}
+                     for uid in users]
+
+    def _add_asset_user(self, query, body, asset_id, uid):
+        users = self.data.asset_users.get(int(asset_id))
+        if users is None:
+            return self._found(None)
+        if uid.lower() not in users:
+            users.append(uid.lower())
+        return 200, None
+
+    def _remove_asset_user(self, query, body, asset_id, uid):
+        users = self.data.asset_users.get(int(asset_id))
+        if users is None or uid.lower() not in users:
+            return self._found(None)
+        users.remove(uid.lower())
+        return 200, None
+
+    # #### CLIENT PORTAL #### #
+
+    def _portal_categories(self, query, body, kind):
+        return 200, self.data.article_categories if kind == 'knowledgebase' else self.data.service_categories
+
+    def _search_portal(self, query, body, kind):
+        search = body or {}
+        if kind == 'knowledgebase':
+            items = [article for article in self.data.articles.values()
+                     if _contains(search.get('SearchText'), article['Subject'], article['Body'])
+                     and (not search.get('IsPublic') or article['IsPublic'])
+                     and (not search.get('IsPublished') or article['IsPublished'])
+                     and (not search.get('Status') or article['Status'] == search['Status'])]
+        else:
+            items = [service for service in self.data.services.values()
+                     if _contains(search.get('SearchText'), service['Name'], service['ShortDescription'])]
+        if search.get('CategoryID'):
+            items = [item for item in items if item['CategoryID'] == search['CategoryID']]
+        return 200, self._limit(items, search.get('ReturnCount'))
+
+    def _portal_item(self, query, body, kind, item_id):
+        items = self.data.articles if kind == 'knowledgebase' else self.data.services
+        return self._found(items.get(int(item_id)))
+
+
+class TDXStubTransport:
+    """
+    A transport that hands requests straight to a TDXStubServer, without a socket in between, for tests and
+    benchmarks that should measure tdxlib rather than the network. The server doesn't need to be started.
+    """
+
+    def __init__(self, stub: TDXStubServer):
+        """
+        :param stub: the stub server to answer requests
+
+        """
+        self.stub = stub
+
+    def request(self, method: str, url: str, data=None, headers: dict = None, **kwargs):
+        """
+        Answers a request from the stub server.
+
+        :param method: the HTTP verb
+        :param url: the full URL
+        :param data: the request body
+        :param headers: the request headers
+        :param kwargs: other request arguments, which are ignored
+
+        :return: the stub server's response
+
+        :rtype: requests.Response
+
+        """
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path + ('?' + parts.query if parts.query else '')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        status, content, response_headers = self.stub.dispatch(method, target, (headers or {}).get('Authorization'),
+                                                               data or b'')
+        return tdxlib.tdx_replay.build_response(url, status, content, response_headers)
+
+    def close(self):
+        pass
+
+
+def main(argv: list = None):
+    """
+    Runs the stub server in the foreground, until interrupted.
+
+    :param argv: command line arguments (Default: sys.argv)
+
+    """
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the TDX web API, with synthetic data.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (Default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="TCP port to listen on (Default: 8080)")
+    parser.add_argument('--scale', type=float, default=1, help="how much synthetic data to generate (Default: 1)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the synthetic data (Default: 0)")
+    parser.add_argument('--rate-limit', type=int, default=60,
+                        help="requests allowed per rate-limit window, 0 for none (Default: 60)")
+    parser.add_argument('--rate-limit-window', type=float, default=60.0,
+                        help="length of the rate-limit window, in seconds (Default: 60)")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds to wait before answering each request (Default: 0)")
+    args = parser.parse_args(argv)
+    stub = TDXStubServer(args.host, args.port, scale=args.scale, seed=args.seed, rate_limit=args.rate_limit,
+                         rate_limit_window=args.rate_limit_window, latency=args.latency).start()
+    print(f"Serving a stub TDX API at {stub.url}/TDWebApi/api. Set full_host to {stub.url} and sandbox to false.")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,17 @@ import tdxlib.tdx_ticket
 import copy
 import datetime
 import tdxlib.tdx_integration
+import tdxlib.tdx_deadline
 import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_cache
+import tdxlib.tdx_stream
+import tdxlib.tdx_tracing
+from typing import List
 from typing import Union
 from typing import BinaryIO
 
 
+@tdxlib.tdx_tracing.traced
 class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
     # These are hard-coded by TeamDynamix and not accessible through the API
     ticket_classifications = {
@@ -33,7 +39,6 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         tdxlib.tdx_integration.TDXIntegration.__init__(self, filename, config, skip_initial_auth=skip_initial_auth)
         if self.config.ticket_app_id is None:
             raise RuntimeError("Ticket App Id is required. Check your configuration.")
-        self.clean_cache()
 
     def clean_cache(self):
         """
@@ -43,13 +48,27 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
 
         """
         super().clean_cache()
-        self.cache['ticket_type'] = {}
-        self.cache['ticket_status'] = {}
-        self.cache['ticket_priority'] = {}
-        self.cache['ticket_urgency'] = {}
-        self.cache['ticket_impact'] = {}
-        self.cache['ticket_source'] = {}
-        self.cache['ticket_form'] = {}
+        app_id = str(self.config.ticket_app_id)
+        for region in ['ticket_type', 'ticket_statuses', 'ticket_priority', 'ticket_urgency', 'ticket_impact',
+                       'ticket_source', 'ticket_form']:
+            self.cache.add_region(region, whole_list=True, persist=app_id)
+        self.cache.add_region('ticket_status', persist=app_id)
+
+    def _reference_loaders(self) -> list:
+        """
+        Internal method that adds the ticket lookup tables to the reference data warm_cache() fetches.
+        """
+        ticket_component = TDXTicketIntegration.component_ids['ticket']
+        return super()._reference_loaders() + [
+            ('ticket_type', tdxlib.tdx_cache.ALL, self.get_all_ticket_types),
+            ('ticket_statuses', tdxlib.tdx_cache.ALL, self.get_all_ticket_statuses),
+            ('ticket_priority', tdxlib.tdx_cache.ALL, self.get_all_ticket_priorities),
+            ('ticket_urgency', tdxlib.tdx_cache.ALL, self.get_all_ticket_urgencies),
+            ('ticket_impact', tdxlib.tdx_cache.ALL, self.get_all_ticket_impacts),
+            ('ticket_source', tdxlib.tdx_cache.ALL, self.get_all_ticket_sources),
+            ('ticket_form', tdxlib.tdx_cache.ALL, self.get_all_ticket_forms),
+            ('custom_attributes', str(ticket_component), lambda: self.get_all_custom_attributes(ticket_component))
+        ]
 
     def get_url_string(self):
         return '/' + str(self.config.ticket_app_id) + '/tickets'
@@ -145,7 +164,7 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
 
     # #### GETTING TICKETS #### #
 
-    def get_ticket_by_id(self, ticket_id: int) -> tdxlib.tdx_ticket.TDXTicket | None:
+    def get_ticket_by_id(self, ticket_id: int) -> Union[tdxlib.tdx_ticket.TDXTicket, None]:
         """
         Gets a ticket, based on its ID
 
@@ -159,8 +178,8 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         if ticket_data:
             return tdxlib.tdx_ticket.TDXTicket(self, ticket_data)
 
-    def search_tickets(self, criteria: dict|str, max_results: int = 25, closed: bool = False, cancelled: bool = False,
-                       other_status: bool = False) -> list:
+    def search_tickets(self, criteria: Union[dict, str], max_results: int = 25, closed: bool = False,
+                       cancelled: bool = False, other_status: bool = False, stream: bool = False) -> list:
         """
         Gets a ticket, based on a variety of criteria::
 
@@ -184,8 +203,10 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :param cancelled: include cancelled tickets in search if true
         :param closed: include closed tickets in search if true
         :param other_status: Status ID of a custom status
+        :param stream: yield each ticket as soon as it's downloaded, instead of waiting for the whole response, which
+                       keeps memory use flat for very large searches (Default: False)
 
-        :return: list of TDXTicket objects
+        :return: list of TDXTicket objects (or a TDXResponseStream of them, if stream is True)
 
         :rtype: list
 
@@ -211,6 +232,13 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
             search_body.update(criteria)
         else:
             raise TypeError("Can't search tickets with" + str(type(criteria)))
+        if stream:
+            ticket_data_stream = self.make_post(self.get_url_string() + '/search', search_body, stream=True)
+            if ticket_data_stream is None:
+                return None
+            return tdxlib.tdx_stream.TDXResponseStream(
+                (tdxlib.tdx_ticket.TDXTicket(self, ticket_data) for ticket_data in ticket_data_stream),
+                ticket_data_stream.close)
         ticket_data_list = self.make_call('search', 'post', search_body)
         ticket_list = list()
         for ticket_data in ticket_data_list:
@@ -233,7 +261,6 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: tdxlib.tdx_ticket.TDXTicket
 
         """
-        changed_custom_attributes = False
         if not isinstance(ticket, tdxlib.tdx_ticket.TDXTicket):
             full_ticket = self.get_ticket_by_id(ticket)
             if not full_ticket:
@@ -243,33 +270,13 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
             full_ticket = ticket
 
         # Separate CA changes into their own object: 'changed_custom_attributes'.
-        # need to make a full copy of this dict, so we can reuse it
-        changed_attributes_copy = copy.deepcopy(changed_attributes)
-        if 'Attributes' in changed_attributes:
-            if isinstance(changed_attributes['Attributes'], list):
-                changed_custom_attributes = changed_attributes['Attributes']
-            else:
-                changed_custom_attributes = [changed_attributes['Attributes']]
-            # Remove attributes field of "changed_attributes" so it doesn't mess up the existing asset(s) CA's
-            # need to set it to an empty list first, so it doesn't delete the object that was passed in
-            del changed_attributes_copy['Attributes']
+        changed_attributes_copy, changed_custom_attributes = \
+            tdxlib.tdx_utils.split_custom_attributes(changed_attributes)
         # not totally sure the first part is necessary. I think it always comes through as an empty list if no CA's
         if 'Attributes' not in full_ticket.ticket_data.keys():
             full_ticket.ticket_data['Attributes'] = []
         if changed_custom_attributes:
-            # Loop through each of the CAs to be changed
-            for new_attrib in changed_custom_attributes:
-                # Drop a marker so we know if
-                new_attrib_marker = True
-                # Loop through the existing CA's, to look for stuff to update
-                for attrib in full_ticket.ticket_data['Attributes']:
-                    # if we find a match, we update it in the existing asset record
-                    if str(new_attrib['ID']) == str(attrib['ID']):
-                        attrib['Value'] = new_attrib['Value']
-                        new_attrib_marker = False
-                # if we go through all the asset's  CA's, and haven't updated something, we just put it in.
-                if new_attrib_marker:
-                    full_ticket.ticket_data['Attributes'].append(new_attrib)
+            tdxlib.tdx_utils.merge_custom_attributes(full_ticket.ticket_data['Attributes'], changed_custom_attributes)
         # incorporate the non-custom changed attributes to the existing asset record, if they exist
         if changed_attributes_copy:
             full_ticket.update(changed_attributes_copy, validate=True)
@@ -281,26 +288,41 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
 
     # TODO: Implement a HTTP Patch version of this
     def edit_tickets(self, ticket_list: list, changed_attributes: dict,
-                     notify: bool = False, visual: bool = False) -> list:
+                     notify: bool = False, visual: bool = False, deadline: float = None) -> list:
         """
-        Edits one or more tickets, based on a dict of parameters to change
+        Edits one or more tickets, based on a dict of parameters to change. Tickets are edited concurrently, as
+        many at a time as the adaptive concurrency limit allows (see concurrency and max_concurrency in the config).
 
         :param ticket_list: list of TDXTicket objects, maybe from search_tickets
         :param changed_attributes: Attributes to alter in selected tickets
         :param notify: If true, will notify newly-responsible resource(s) if changed because of edit
         :param visual: If true, print a . for each successful ticket that is edited
+        :param deadline: seconds to allow for the whole edit. Tickets not yet started when it passes are
+                         left alone. (Default: no deadline)
 
-        :return: list of edited TDXTicket objects, with complete data in json format
+        :return: list of edited TDXTicket objects, with complete data in json format, in the same order as
+                 ticket_list (only those edited before the deadline, if one was set)
 
         :rtype: list
 
         """
-        edited_tickets = list()
-        for ticket in ticket_list:
-            edited_ticket = self.edit_ticket(ticket, changed_attributes, notify)
-            edited_tickets.append(edited_ticket)
+        def edit(ticket):
+            try:
+                edited_ticket = self.edit_ticket(ticket, changed_attributes, notify)
+            except tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError:
+                if tdxlib.tdx_deadline.expired():
+                    # Ran out of time while fetching this one
+                    return self._SKIPPED
+                raise
             if visual and edited_ticket:
                 print('.', end='')
+            return edited_ticket
+
+        with tdxlib.tdx_deadline.deadline(deadline):
+            edited_tickets = self._run_concurrently(edit, ticket_list)
+            if len(edited_tickets) < len(ticket_list) and tdxlib.tdx_deadline.expired():
+                self.logger.warning(f"Deadline passed after editing {len(edited_tickets)} of "
+                                    f"{len(ticket_list)} tickets. Returning partial results.")
         return edited_tickets
 
     def reassign_ticket(self, ticket_id: Union[str, int], responsible: str, group: bool = False) \
@@ -433,13 +455,9 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if not self.cache['ticket_form']:
-            self.cache['ticket_form'] = self.get_all_ticket_forms()
-        for ticket_form in self.cache['ticket_form']:
-            if ticket_form['ID'] == key:
-                return ticket_form
-            if str(key).lower() in ticket_form['Name'].lower():
-                return ticket_form
+        ticket_form = self.cache.lookup('ticket_form', self.get_all_ticket_forms).find(key)
+        if ticket_form:
+            return ticket_form
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(
                 f'No type found with ID or Name {key}')
 
@@ -466,13 +484,9 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if not self.cache['ticket_type']:
-            self.cache['ticket_type'] = self.get_all_ticket_types()
-        for ticket_type in self.cache['ticket_type']:
-            if ticket_type['ID'] == key:
-                return ticket_type
-            if str(key).lower() in ticket_type['Name'].lower():
-                return ticket_type
+        ticket_type = self.cache.lookup('ticket_type', self.get_all_ticket_types).find(key)
+        if ticket_type:
+            return ticket_type
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(
                 f'No type found with ID or Name {key}')
 
@@ -512,7 +526,7 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         """
         return self.get_ticket_status_by_status_class([4])
 
-    def get_ticket_status_by_status_class(self, status_class: list[int]) -> list:
+    def get_ticket_status_by_status_class(self, status_class: List[int]) -> list:
         """
         Gets ticket statuses based on status class.
 
@@ -523,7 +537,7 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: list
 
         """
-        all_statuses = self.get_all_ticket_statuses()
+        all_statuses = self.cache.load_all('ticket_statuses', self.get_all_ticket_statuses)
         return [x for x in all_statuses if x['StatusClass'] in status_class]
 
     def get_all_ticket_statuses(self) -> list:
@@ -550,10 +564,7 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if key not in self.cache['ticket_status']:
-            url_string = f'statuses/{key}'
-            self.cache['ticket_status'][key] = self.make_call(url_string, 'get')
-        return self.cache['ticket_status'][key]
+        return self.cache['ticket_status'].load(key, lambda: self.make_call(f'statuses/{key}', 'get'))
 
     def search_ticket_status(self, key: str) -> dict:
         """
@@ -566,8 +577,13 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if key in self.cache['ticket_status']:
-            return self.cache['ticket_status'][key]
+        cached = self.cache['ticket_status'].get(key)
+        if cached is not None:
+            return cached
+        status = self._find_in_cached_list('ticket_statuses', key)
+        if status:
+            self.cache['ticket_status'][key] = status
+            return status
         else:
             post_body = {
                 'SearchText': key
@@ -606,13 +622,9 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if not self.cache['ticket_priority']:
-            self.cache['ticket_priority'] = self.get_all_ticket_priorities()
-        for ticket_priority in self.cache['ticket_priority']:
-            if ticket_priority['ID'] == key:
-                return ticket_priority
-            if str(key).lower() in ticket_priority['Name'].lower():
-                return ticket_priority
+        ticket_priority = self.cache.lookup('ticket_priority', self.get_all_ticket_priorities).find(key)
+        if ticket_priority:
+            return ticket_priority
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(f'No priority found for {key}')
 
     def get_all_ticket_urgencies(self) -> list:
@@ -638,13 +650,9 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if not self.cache['ticket_urgency']:
-            self.cache['ticket_urgency'] = self.get_all_ticket_urgencies()
-        for ticket_urgency in self.cache['ticket_urgency']:
-            if str(ticket_urgency['ID']) == str(key):
-                return ticket_urgency
-            if str(key).lower() in ticket_urgency['Name'].lower():
-                return ticket_urgency
+        ticket_urgency = self.cache.lookup('ticket_urgency', self.get_all_ticket_urgencies).find(key)
+        if ticket_urgency:
+            return ticket_urgency
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(f'No urgency found for {key}')
     
     def get_all_ticket_impacts(self) -> list:
@@ -670,13 +678,9 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if not self.cache['ticket_impact']:
-            self.cache['ticket_impact'] = self.get_all_ticket_impacts()
-        for ticket_impact in self.cache['ticket_impact']:
-            if str(ticket_impact['ID']) == str(key):
-                return ticket_impact
-            if str(key).lower() in ticket_impact['Name'].lower():
-                return ticket_impact
+        ticket_impact = self.cache.lookup('ticket_impact', self.get_all_ticket_impacts).find(key)
+        if ticket_impact:
+            return ticket_impact
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(f'No impact found for {key}')
 
     def get_all_ticket_sources(self) -> list:
@@ -704,13 +708,9 @@ class TDXTicketIntegration(tdxlib.tdx_integration.TDXIntegration):
         :rtype: dict
 
         """
-        if not self.cache['ticket_source']:
-            self.cache['ticket_source'] = self.get_all_ticket_sources()
-        for ticket_source in self.cache['ticket_source']:
-            if str(key) == str(ticket_source['ID']):
-                return ticket_source
-            if str(key).lower() in ticket_source['Name'].lower():
-                return ticket_source
+        ticket_source = self.cache.lookup('ticket_source', self.get_all_ticket_sources).find(key)
+        if ticket_source:
+            return ticket_source
         raise tdxlib.tdx_api_exceptions.TdxApiObjectNotFoundError(f'No source found for {key}')
 
     # #### CREATING/EDITING CUSTOM TICKET STATUSES #### #
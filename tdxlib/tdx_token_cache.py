@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import time
+
+
+class TDXTokenCache:
+    """
+    Keeps TDX bearer tokens on disk, so short-lived scripts can reuse a token from an earlier run instead of
+    authenticating every time they start.
+
+    Each API URL and user gets its own file, named after a hash of the two. Files are readable by their owner only
+    (0600, in a 0700 directory), and files that other users could read are ignored.
+    """
+
+    def __init__(self, directory: str, min_validity: float = 60):
+        """
+        :param directory: directory to keep token files in. It is created if it doesn't exist.
+        :param min_validity: cached tokens that expire within this many seconds are not reused (Default: 60)
+
+        """
+        self.directory = os.path.expanduser(directory)
+        self.min_validity = min_validity
+        self.logger = logging.getLogger('tdx_integration')
+
+    def path(self, api_url: str, username: str) -> str:
+        """
+        Finds the cache file for an API URL and user.
+
+        :param api_url: the TDX API URL
+        :param username: the TDX API user
+
+        :return: path of the cache file
+
+        :rtype: str
+
+        """
+        key = hashlib.sha256(f'{api_url}|{username or ""}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{key}.json')
+
+    def load(self, config, min_validity: float = None) -> bool:
+        """
+        Loads a cached token into config.token and config.token_exp, if there is one that is still valid.
+
+        :param config: a TDXConfig object
+        :param min_validity: ignore tokens that expire within this many seconds (Default: min_validity of the cache)
+
+        :return: True if a cached token was loaded
+
+        :rtype: bool
+
+        """
+        path = self.path(config.api_url, config.username)
+        try:
+            if os.name == 'posix' and os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+                self.logger.warning(f"Ignoring token cache file {path}, since other users can read it.")
+                return False
+            with open(path, 'r') as cache_file:
+                cached = json.load(cache_file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Couldn't read token cache file {path}. {str(e)}")
+            return False
+        if min_validity is None:
+            min_validity = self.min_validity
+        if not isinstance(cached, dict) or cached.get('exp', 0) < time.time() + min_validity:
+            return False
+        config.token = cached['token']
+        config.token_exp = cached['exp']
+        self.logger.debug(f"Reusing cached token, which expires at {cached['exp']}.")
+        return True
+
+    def save(self, config):
+        """
+        Saves config.token and config.token_exp to the cache. The file is replaced atomically, so processes
+        reading it never see half a token.
+
+        :param config: a TDXConfig object
+
+        :return: None
+
+        """
+        path = self.path(config.api_url, config.username)
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as cache_file:
+                    json.dump({'token': config.token, 'exp': config.token_exp}, cache_file)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError as e:
+            self.logger.warning(f"Couldn't write token cache file {path}. {str(e)}")
+
+    def clear(self, config):
+        """
+        Removes the cached token for config's API URL and user, for example because TDX rejected it.
+
+        :param config: a TDXConfig object
+
+        :return: None
+
+        """
+        try:
+            os.unlink(self.path(config.api_url, config.username))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Couldn't remove token cache file. {str(e)}")
+
+
+def cache_from_config(config):
+    """
+    Builds the token cache for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXTokenCache, or None if token_cache isn't set (or the integration isn't using password auth)
+
+    """
+    if not config.token_cache or (config.auth_type and config.auth_type != 'password'):
+        return None
+    return TDXTokenCache(config.token_cache)
@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+import weakref
+
+
+class TDXTokenRefresher:
+    """
+    Renews an integration's token on a background (daemon) thread, some time before it expires, so requests
+    never have to stop and authenticate.
+
+    The refresher only holds a weak reference to the integration, so it stops by itself if the integration is
+    garbage collected. Call stop() (or the integration's close()) to stop it sooner.
+    """
+
+    def __init__(self, integration, margin: float = 300, retry_interval: float = 30):
+        """
+        :param integration: the TDXIntegration whose token should be kept fresh
+        :param margin: renew the token this many seconds before it expires (Default: 300)
+        :param retry_interval: seconds to wait before trying again after a failed renewal (Default: 30)
+
+        """
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self.logger = logging.getLogger('tdx_integration')
+        self._integration = weakref.ref(integration)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='tdxlib-token-refresh', daemon=True)
+
+    def start(self):
+        """
+        Starts the background thread.
+
+        :return: None
+
+        """
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread.
+
+        :return: None
+
+        """
+        self._stopped.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _next_wait(self) -> float:
+        integration = self._integration()
+        if integration is None:
+            return None
+        token_exp = integration.config.token_exp
+        if not token_exp:
+            return 0.0
+        return max(token_exp - self.margin - time.time(), 0.0)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            wait = self._next_wait()
+            if wait is None:
+                return
+            if wait > 0:
+                # Wake up now and then, so a collected integration doesn't keep this thread around
+                self._stopped.wait(min(wait, 60))
+                continue
+            integration = self._integration()
+            if integration is None:
+                return
+            try:
+                renewed = integration._refresh_token(self.margin)
+            except Exception as e:
+                self.logger.warning(f"Background token refresh failed. Exception: {str(e)}")
+                renewed = False
+            del integration
+            if not renewed or self._next_wait() == 0:
+                # Failed, or TDX handed out a token that's already inside the margin. Don't spin.
+                self._stopped.wait(self.retry_interval)
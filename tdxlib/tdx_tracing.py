@@ -0,0 +1,202 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+# Public methods that don't get a span of their own. The make_* methods are covered by the span around each HTTP
+# call, and the rest just hand back a context manager or tidy up.
+UNTRACED = frozenset({'make_get', 'make_post', 'make_put', 'make_patch', 'make_delete', 'make_file_post',
+                      'make_call', 'priority', 'deadline', 'close'})
+
+# Span of the current operation, whichever tracer opened it
+_current = contextvars.ContextVar('tdx_span', default=None)
+
+
+class _NoOpSpan:
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+class TDXTracer:
+    """
+    The default tracer, which does nothing. Every span it opens is the same do-nothing object, so tracing costs
+    next to nothing when it's turned off.
+    """
+    enabled = False
+
+    def span(self, name: str, attributes: dict = None):
+        """
+        Opens a span, for use in a with block.
+
+        :param name: name of the span, like TDXTicketIntegration.generate_ticket or GET /{id}/tickets/{id}
+        :param attributes: dict of attributes to start the span with (Default: None)
+
+        :return: a context manager that yields the span, which has a set_attribute(key, value) method
+
+        """
+        return _NOOP_SPAN
+
+
+class TDXSpan:
+    """
+    A finished or running span recorded by TDXMemoryTracer.
+    """
+
+    def __init__(self, name: str, attributes: dict = None, parent: 'TDXSpan' = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.start = time.monotonic()
+        self.duration = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __repr__(self):
+        return f'<TDXSpan {self.name} {self.attributes}>'
+
+
+class TDXMemoryTracer(TDXTracer):
+    """
+    A tracer that keeps every finished span in memory, in its spans list, so you can see where the time in a call
+    like generate_ticket() went without setting up OpenTelemetry. Each span knows its parent span.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.spans = list()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, attributes: dict = None):
+        span = TDXSpan(name, attributes, _current.get())
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_attribute('error.type', type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+            span.duration = time.monotonic() - span.start
+            with self._lock:
+                self.spans.append(span)
+
+
+class TDXOpenTelemetryTracer(TDXTracer):
+    """
+    A tracer that sends spans to OpenTelemetry, so they appear alongside the rest of your application's traces.
+    Requires the optional opentelemetry-api package, and an OpenTelemetry SDK set up to export them.
+    """
+    enabled = True
+
+    def __init__(self, tracer=None):
+        """
+        :param tracer: an OpenTelemetry Tracer (Default: the global tracer provider's tracer for 'tdxlib')
+
+        """
+        if otel_trace is None:
+            raise ImportError("OpenTelemetry tracing requires the opentelemetry-api package. Install it with "
+                              "'pip install opentelemetry-api'.")
+        self.tracer = tracer or otel_trace.get_tracer('tdxlib')
+
+    @contextlib.contextmanager
+    def span(self, name: str, attributes: dict = None):
+        attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+        with self.tracer.start_as_current_span(name, attributes=attributes) as span:
+            token = _current.set(span)
+            try:
+                yield span
+            finally:
+                _current.reset(token)
+
+
+def set_attribute(key: str, value):
+    """
+    Sets an attribute on the current span, if tracing is turned on and a span is open.
+
+    :param key: name of the attribute, like tdx.cache_hit
+    :param value: value of the attribute (a string, number or bool)
+
+    :return: None
+
+    """
+    span = _current.get()
+    if span is not None and value is not None:
+        span.set_attribute(key, value)
+
+
+def _trace_method(function, name: str):
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def traced_coroutine(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None or not tracer.enabled:
+                return await function(self, *args, **kwargs)
+            with tracer.span(name):
+                return await function(self, *args, **kwargs)
+        return traced_coroutine
+
+    @functools.wraps(function)
+    def traced_method(self, *args, **kwargs):
+        tracer = getattr(self, 'tracer', None)
+        if tracer is None or not tracer.enabled:
+            return function(self, *args, **kwargs)
+        with tracer.span(name):
+            return function(self, *args, **kwargs)
+    return traced_method
+
+
+def traced(cls):
+    """
+    Class decorator that opens a span, named like TDXTicketIntegration.generate_ticket, around every public method
+    defined in the class (methods it inherits are traced by their own class). The spans go to the tracer in the
+    instance's tracer attribute, and nothing extra happens when that tracer isn't enabled.
+
+    :param cls: an integration class
+
+    :return: the same class
+
+    """
+    for name, member in list(vars(cls).items()):
+        if name.startswith('_') or name in UNTRACED or not inspect.isfunction(member):
+            continue
+        if inspect.isgeneratorfunction(member) or inspect.isasyncgenfunction(member):
+            continue
+        setattr(cls, name, _trace_method(member, f'{cls.__name__}.{name}'))
+    return cls
+
+
+def tracer_from_config(config) -> TDXTracer:
+    """
+    Builds the tracer for an integration from its TDXConfig.
+
+    :param config: a TDXConfig object
+
+    :return: a TDXTracer that does nothing if tracing is 'none', or a TDXOpenTelemetryTracer if it's
+             'opentelemetry'
+
+    :rtype: TDXTracer
+
+    """
+    if not config.tracing or config.tracing == 'none':
+        return TDXTracer()
+    if config.tracing == 'opentelemetry':
+        return TDXOpenTelemetryTracer()
+    raise ValueError(f"Unknown tracing option {config.tracing}. Use 'none' or 'opentelemetry'.")
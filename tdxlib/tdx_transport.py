@@ -0,0 +1,168 @@
+import requests
+import requests.adapters
+import requests.structures
+import urllib3.exceptions
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class TDXTransport:
+    """
+    Pooled HTTP transport used for every call an integration makes to the TDX API.
+
+    Connections to the TDX host are kept alive and reused across requests, so only the first call
+    pays for the TCP and TLS handshakes.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 keep_alive: bool = True):
+        """
+        Sets up a requests session with a connection pool mounted for http and https.
+
+        :param pool_connections: number of per-host connection pools to keep (Default: 10)
+        :param pool_maxsize: maximum number of connections kept open to any one host (Default: 10)
+        :param pool_block: if True, wait for a free connection instead of opening extra ones beyond pool_maxsize
+                           (Default: False)
+        :param keep_alive: if False, connections are closed after each request (Default: True)
+
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                pool_block=pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a single HTTP request over the pooled session.
+
+        :param method: the HTTP verb to use (GET, POST, PUT, PATCH, DELETE)
+        :param url: the full URL to call
+        :param kwargs: any other arguments accepted by requests.Session.request()
+
+        :return: the response from the server
+
+        :rtype: requests.Response
+
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        """
+        self.session.close()
+
+
+class _HTTPXRawBody:
+    """
+    Stands in for the urllib3 response behind a streamed requests.Response, so iter_content() reads from httpx.
+    """
+
+    def __init__(self, response: 'httpx.Response'):
+        self._response = response
+
+    def stream(self, chunk_size: int, decode_content: bool = True):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def close(self):
+        self._response.close()
+
+
+class TDXHTTP2Transport:
+    """
+    HTTP/2 transport, built on httpx. Concurrent requests from several threads share a single TLS connection to the
+    TDX host, instead of each needing their own socket.
+
+    Responses and errors are translated into their requests equivalents, so integrations handle them (retries,
+    rate limiting, re-authentication) exactly the same way as with TDXTransport. Requires the httpx and h2 packages.
+    """
+
+    def __init__(self, pool_maxsize: int = 10, keep_alive: bool = True):
+        """
+        Sets up an httpx client with HTTP/2 turned on.
+
+        :param pool_maxsize: maximum number of connections to keep open. With HTTP/2, one is usually enough, and
+                             more are only opened if the server limits the number of concurrent streams.
+                             (Default: 10)
+        :param keep_alive: if False, connections are closed after each request (Default: True)
+
+        """
+        if httpx is None:
+            raise ImportError("The http2 transport requires httpx and h2. Install them with "
+                              "'pip install httpx[http2]'.")
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        limits = httpx.Limits(max_connections=pool_maxsize,
+                              max_keepalive_connections=pool_maxsize if keep_alive else 0)
+        self.client = httpx.Client(http2=True, limits=limits, timeout=None)
+
+    @staticmethod
+    def _timeout(timeout):
+        # requests takes a (connect, read) tuple; httpx takes a Timeout
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return httpx.Timeout(read, connect=connect)
+        return httpx.Timeout(timeout)
+
+    def request(self, method: str, url: str, headers: dict = None, data: bytes = None, files: dict = None,
+                timeout=None, stream: bool = False) -> requests.Response:
+        """
+        Sends a single HTTP request over the shared HTTP/2 connection.
+
+        :param method: the HTTP verb to use (GET, POST, PUT, PATCH, DELETE)
+        :param url: the full URL to call
+        :param headers: dict of headers to send
+        :param data: the request body, as bytes
+        :param files: dict of files to upload, in the format requests uses
+        :param timeout: seconds to wait, as a number or a (connect, read) tuple (Default: no timeout)
+        :param stream: don't download the body until it's read with iter_content() (Default: False)
+
+        :return: the response from the server
+
+        :rtype: requests.Response
+
+        """
+        try:
+            request = self.client.build_request(method, url, headers=headers, content=data, files=files,
+                                                timeout=self._timeout(timeout))
+            httpx_response = self.client.send(request, stream=stream)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(str(e))
+        except httpx.ConnectError as e:
+            # Wrapped the same way requests wraps a failed connection, so it's known to be safe to retry
+            raise requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(
+                None, url, urllib3.exceptions.NewConnectionError(None, str(e))))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.reason = httpx_response.reason_phrase
+        response.headers = requests.structures.CaseInsensitiveDict(httpx_response.headers)
+        response.url = str(httpx_response.url)
+        response.encoding = httpx_response.encoding
+        if stream:
+            response.raw = _HTTPXRawBody(httpx_response)
+        else:
+            response._content = httpx_response.content
+        return response
+
+    def close(self):
+        """
+        Closes the shared connection.
+        """
+        self.client.close()
@@ -1,6 +1,7 @@
 import dateutil.parser
 import datetime
 import json
+import copy
 
 
 # Prints out dict as JSON with indents
@@ -66,3 +67,35 @@ def is_id(identifier: str):
     except ValueError as e:
         pass
     return int_id
+
+
+# Splits the 'Attributes' entry out of a dict of changes, returning a copy of the other changes and the list of CA's
+def split_custom_attributes(changed_attributes: dict) -> tuple:
+    changed_custom_attributes = False
+    # need to make a full copy of this dict, so we can reuse it
+    changed_attributes_copy = copy.deepcopy(changed_attributes)
+    if 'Attributes' in changed_attributes:
+        if isinstance(changed_attributes['Attributes'], list):
+            changed_custom_attributes = changed_attributes['Attributes']
+        else:
+            changed_custom_attributes = [changed_attributes['Attributes']]
+        # Remove attributes field so it doesn't mess up the existing object's CA's
+        del changed_attributes_copy['Attributes']
+    return changed_attributes_copy, changed_custom_attributes
+
+
+# Updates a list of existing CA's in place with a list of changed CA's, adding any that aren't already there
+def merge_custom_attributes(attributes: list, changed_custom_attributes: list) -> None:
+    # Loop through each of the CAs to be changed
+    for new_attrib in changed_custom_attributes:
+        # Drop a marker so we know if we found a match
+        new_attrib_marker = True
+        # Loop through the existing CA's, to look for stuff to update
+        for attrib in attributes:
+            # if we find a match, we update it in the existing record
+            if str(new_attrib['ID']) == str(attrib['ID']):
+                attrib['Value'] = new_attrib['Value']
+                new_attrib_marker = False
+        # if we go through all the existing CA's, and haven't updated something, we just put it in.
+        if new_attrib_marker:
+            attributes.append(new_attrib)
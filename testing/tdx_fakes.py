@@ -0,0 +1,148 @@
+"""
+Stand-ins for TDX shared by the offline test cases: a transport that answers like TDX, and a factory for integrations
+that talk to it instead of a real tenant.
+"""
+import io
+import threading
+import time
+
+import jwt
+import requests
+
+import tdxlib.tdx_integration
+
+CONFIG = {
+    'full_host': 'tdx.example.edu',
+    'username': 'tester',
+    'password': 'secret'
+}
+
+
+def make_token(expires_in: float = 3600) -> str:
+    """
+    Mints a token shaped like the ones TDX hands out, so the integration can read its expiry.
+
+    :param expires_in: seconds until the token expires (Default: 3600)
+
+    :return: the signed JWT
+
+    :rtype: str
+    """
+    return jwt.encode({'exp': int(time.time() + expires_in), 'aud': 'https://www.teamdynamix.com/'},
+                      'a-test-signing-key-that-is-long-enough', algorithm='HS256')
+
+
+def make_response(status_code: int = 200, content='{}', headers: dict = None, stream: bool = False):
+    """
+    Builds a response the way requests would have received it.
+
+    :param status_code: the HTTP status code (Default: 200)
+    :param content: the body, as str or bytes (Default: an empty JSON object)
+    :param headers: response headers to set
+    :param stream: if True, the body is left unread in response.raw, as it is for a streamed request
+
+    :return: the response
+
+    :rtype: requests.Response
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = 'Test'
+    if stream:
+        response.raw = io.BytesIO(content)
+    else:
+        response._content = content
+    if headers:
+        response.headers.update(headers)
+    return response
+
+
+class FakeTransport:
+    """
+    Answers like TDX: /auth hands out a fresh token, and any other request gets the next scripted outcome (a status
+    code, a response, or an exception to raise) while there are any left, then the answer from respond(method, url,
+    kwargs), or else status_code with body. Requests are recorded, with the most in flight at once, and each can be
+    slowed down to make callers overlap.
+    """
+
+    def __init__(self, outcomes: list = None, body='{}', status_code: int = 200, delay: float = 0,
+                 auth_delay: float = 0, respond=None):
+        self.outcomes = list(outcomes or [])
+        self.body = body
+        self.status_code = status_code
+        self.delay = delay
+        self.auth_delay = auth_delay
+        self.respond = respond
+        self.calls = []
+        self.responses = []
+        self.auth_calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        if url.endswith('/auth'):
+            with self.lock:
+                self.auth_calls += 1
+            time.sleep(self.auth_delay)
+            return make_response(200, make_token())
+        with self.lock:
+            self.calls.append((method, url, kwargs))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            outcome = self.outcomes.pop(0) if self.outcomes else None
+        try:
+            time.sleep(self.delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            if isinstance(outcome, int):
+                response = make_response(outcome, self.body)
+            elif outcome is not None:
+                response = outcome
+            elif self.respond:
+                response = self.respond(method, url, kwargs)
+            else:
+                response = make_response(self.status_code, self.body)
+            self.responses.append(response)
+            return response
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def count(self, url: str) -> int:
+        """
+        Counts the requests sent to a URL, other than authentication.
+
+        :param url: the full URL
+
+        :return: the number of requests
+
+        :rtype: int
+        """
+        return sum(1 for _, called, _ in self.calls if called == url)
+
+    def close(self):
+        pass
+
+
+def make_integration(fake=None, authenticated: bool = True, **config) -> tdxlib.tdx_integration.TDXIntegration:
+    """
+    Sets up an integration for the example tenant without authenticating against it.
+
+    :param fake: a transport to swap in, such as a FakeTransport (Default: keep the configured one)
+    :param authenticated: if True, start out with a valid token, so no request needs to go to /auth first
+    :param config: settings to add to or override in CONFIG
+
+    :return: the integration
+
+    :rtype: TDXIntegration
+    """
+    tdx = tdxlib.tdx_integration.TDXIntegration(config=dict(CONFIG, **config), skip_initial_auth=True)
+    if authenticated:
+        tdx.config.token = make_token()
+        tdx.config.token_exp = time.time() + 3600
+    if fake is not None:
+        tdx.transport = fake
+    return tdx
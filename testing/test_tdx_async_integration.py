@@ -0,0 +1,221 @@
+import asyncio
+import unittest
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import tdxlib.tdx_api_exceptions
+import tdxlib.tdx_async_asset_integration
+import tdxlib.tdx_async_integration
+import tdxlib.tdx_async_ticket_integration
+import tdxlib.tdx_ticket
+from tdxlib import tdx_stub_server
+
+if httpx is not None:
+    class StubAsyncTransport(httpx.AsyncBaseTransport):
+        """
+        Answers httpx requests from a TDXStubServer in-process. Scripted failures (status codes, or exceptions to
+        raise) are used up first, one per request, except for authentication requests.
+        """
+
+        def __init__(self, stub: tdx_stub_server.TDXStubServer, failures: list = None):
+            self.stub = stub
+            self.failures = list(failures or [])
+            self.calls = []
+
+        async def handle_async_request(self, request):
+            self.calls.append((request.method, request.url.path))
+            body = await request.aread()
+            if self.failures and not request.url.path.endswith('/auth'):
+                failure = self.failures.pop(0)
+                if isinstance(failure, Exception):
+                    raise failure
+                return httpx.Response(failure, json={'Message': 'Scripted failure.'}, request=request)
+            status, content, headers = self.stub.dispatch(request.method, request.url.raw_path.decode('ascii'),
+                                                          request.headers.get('Authorization'), body)
+            return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TdxAsyncIntegrationTesting(unittest.TestCase):
+    """Test cases for the asyncio integrations, answered by the stub TDX API through an httpx transport. These
+    run offline."""
+
+    def setUp(self):
+        self.stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+
+    def integration(self, cls=tdxlib.tdx_async_integration.TDXAsyncIntegration, failures: list = None, **config):
+        transport = StubAsyncTransport(self.stub, failures)
+
+        class Offline(cls):
+            def setup_client(self):
+                return httpx.AsyncClient(transport=transport)
+
+        config = dict({'log_level': 'CRITICAL', 'retries': 2, 'retry_backoff': 0.001}, **config)
+        return Offline(config=self.stub.config(**config)), transport
+
+    def run_with(self, tdx, work):
+        async def run():
+            try:
+                return await work()
+            finally:
+                await tdx.close()
+        return asyncio.run(run())
+
+    def test_make_requests(self):
+        """Test that each make_* method sends its verb and decodes the response, authenticating first."""
+        tdx, transport = self.integration(tdxlib.tdx_async_ticket_integration.TDXAsyncTicketIntegration)
+        app_id = self.stub.ticket_app_id
+
+        async def work():
+            ticket = await tdx.make_get(f'/{app_id}/tickets/1000001')
+            found = await tdx.make_post(f'/{app_id}/tickets/search', {'MaxResults': 3})
+            patched = await tdx.make_patch(f'/{app_id}/tickets/1000001',
+                                           [{'op': 'replace', 'path': '/Title', 'value': 'Patched'}])
+            task = await tdx.make_post(f'/{app_id}/tickets/1000001/tasks', {'Title': 'Async task'})
+            edited = await tdx.make_put(f'/{app_id}/tickets/1000001/tasks/{task["ID"]}',
+                                        dict(task, Title='Edited task'))
+            await tdx.make_delete(f'/{app_id}/tickets/1000001/tasks/{task["ID"]}')
+            raw = await tdx.make_get(f'/{app_id}/tickets/1000002', raw=True)
+            return ticket, found, patched, edited, raw
+
+        ticket, found, patched, edited, raw = self.run_with(tdx, work)
+        self.assertEqual(ticket['ID'], 1000001)
+        self.assertEqual(len(found), 3)
+        self.assertEqual(patched['Title'], 'Patched')
+        self.assertEqual(edited['Title'], 'Edited task')
+        self.assertIsInstance(raw, bytes)
+        self.assertEqual([method for method, _ in transport.calls],
+                         ['POST', 'GET', 'POST', 'PATCH', 'POST', 'PUT', 'DELETE', 'GET'])
+
+    def test_retries(self):
+        """Test that failed reads are retried, writes aren't, and a request that keeps failing returns None."""
+        tdx, transport = self.integration(failures=[503, httpx.ConnectError('refused')])
+
+        async def work():
+            account = await tdx.get_account_by_id(self.stub.data.accounts[0]['ID'])
+            retried = len(transport.calls)
+            transport.failures = [503]
+            written = await tdx.make_post(f'/{self.stub.ticket_app_id}/tickets/search', {'MaxResults': 1})
+            not_retried = len(transport.calls) - retried
+            transport.failures = [503, 503, 503]
+            gave_up = await tdx.get_account_by_id(self.stub.data.accounts[0]['ID'])
+            return account, retried, written, not_retried, gave_up
+
+        account, retried, written, not_retried, gave_up = self.run_with(tdx, work)
+        self.assertEqual(account['ID'], self.stub.data.accounts[0]['ID'])
+        # Authentication, two failed attempts and the one that worked
+        self.assertEqual(retried, 4)
+        self.assertIsNone(written)
+        self.assertEqual(not_retried, 1)
+        self.assertIsNone(gave_up)
+
+    def test_reauthenticates_after_401(self):
+        """Test that a token TDX rejects is replaced once, and the request sent again."""
+        tdx, _ = self.integration()
+
+        async def work():
+            await tdx.auth(use_cache=False)
+            tdx.config.token = 'revoked'
+            requests = self.stub.requests
+            ticket = await tdx.make_get(f'/{self.stub.ticket_app_id}/tickets/1000001')
+            return ticket, self.stub.requests - requests
+
+        ticket, requests = self.run_with(tdx, work)
+        self.assertEqual(ticket['ID'], 1000001)
+        # The rejected request, authentication, and the request again
+        self.assertEqual(requests, 3)
+        self.assertNotEqual(tdx.config.token, 'revoked')
+
+    def test_circuit_breaker_and_metrics(self):
+        """Test that async calls go through the same circuit breaker, concurrency limiter and metrics as sync ones."""
+        tdx, _ = self.integration(failures=[503, 503], retries=0, circuit_breaker_threshold=2)
+        account_id = self.stub.data.accounts[0]['ID']
+
+        async def work():
+            self.assertIsNone(await tdx.get_account_by_id(account_id))
+            self.assertIsNone(await tdx.get_account_by_id(account_id))
+            with self.assertRaises(tdxlib.tdx_api_exceptions.TdxApiCircuitOpenError):
+                await tdx.get_account_by_id(account_id)
+
+        self.run_with(tdx, work)
+        calls = tdx.metrics.snapshot()['tdxlib_calls_total']
+        self.assertEqual({entry['labels']['status']: entry['value'] for entry in calls
+                          if entry['labels']['endpoint'] == '/accounts/{id}'}, {503: 2, 'circuit_open': 1})
+        self.assertEqual(tdx.circuit_state()['accounts']['state'], 'open')
+        self.assertEqual(tdx.concurrency.in_flight, 0)
+
+    def test_gather(self):
+        """Test that gather() runs coroutines concurrently and keeps their order."""
+        tdx, _ = self.integration(tdxlib.tdx_async_ticket_integration.TDXAsyncTicketIntegration)
+        ticket_ids = list(self.stub.data.tickets)[:8]
+        in_flight = []
+        peak = []
+
+        async def work():
+            async def tracked(ticket_id):
+                in_flight.append(ticket_id)
+                peak.append(len(in_flight))
+                await asyncio.sleep(0.01)
+                in_flight.remove(ticket_id)
+                return ticket_id
+
+            order = await tdx.gather(*[tracked(ticket_id) for ticket_id in ticket_ids])
+            tickets = await tdx.get_tickets_by_id(ticket_ids)
+            return order, tickets
+
+        order, tickets = self.run_with(tdx, work)
+        self.assertEqual(order, ticket_ids)
+        self.assertGreater(max(peak), 1)
+        self.assertEqual([ticket.get_id() for ticket in tickets], ticket_ids)
+
+    def test_bulk_tickets(self):
+        """Test creating and editing several tickets at once."""
+        tdx, _ = self.integration(tdxlib.tdx_async_ticket_integration.TDXAsyncTicketIntegration)
+        data = self.stub.data
+
+        async def work():
+            new_tickets = [tdxlib.tdx_ticket.TDXTicket(tdx, {
+                'TypeID': data.ticket_types[0]['ID'],
+                'AccountID': data.accounts[0]['ID'],
+                'PriorityID': data.ticket_priorities[0]['ID'],
+                'StatusID': data.ticket_statuses[0]['ID'],
+                'Title': f'Async ticket {i}'
+            }) for i in range(3)]
+            created = await tdx.create_tickets(new_tickets)
+            edited = await tdx.edit_tickets([ticket.get_id() for ticket in created], {'Title': 'Edited'})
+            return created, edited
+
+        created, edited = self.run_with(tdx, work)
+        self.assertEqual([ticket.get_attribute('Title') for ticket in created],
+                         [f'Async ticket {i}' for i in range(3)])
+        self.assertEqual([ticket.get_id() for ticket in edited], [ticket.get_id() for ticket in created])
+        self.assertTrue(all(self.stub.data.tickets[ticket.get_id()]['Title'] == 'Edited' for ticket in edited))
+
+    def test_bulk_assets(self):
+        """Test searching for full asset records, and updating and creating several assets at once."""
+        tdx, _ = self.integration(tdxlib.tdx_async_asset_integration.TDXAsyncAssetIntegration)
+        asset_ids = list(self.stub.data.assets)[:4]
+        template = self.stub.data.assets[asset_ids[0]]
+
+        async def work():
+            found = await tdx.search_assets('', max_results=5, full_record=True)
+            updated = await tdx.update_assets(asset_ids, {'Name': 'Updated'})
+            created = await tdx.create_assets([{'Name': f'Async asset {i}', 'SerialNumber': f'ASYNC-{i}',
+                                                'Tag': f'A{i}', 'StatusID': template['StatusID'],
+                                                'FormID': template['FormID']} for i in range(2)])
+            return found, updated, created
+
+        found, updated, created = self.run_with(tdx, work)
+        self.assertEqual(len(found), 5)
+        self.assertTrue(all('Attributes' in asset for asset in found))
+        self.assertEqual([asset['ID'] for asset in updated], asset_ids)
+        self.assertTrue(all(self.stub.data.assets[asset_id]['Name'] == 'Updated' for asset_id in asset_ids))
+        self.assertEqual([asset['SerialNumber'] for asset in created], ['ASYNC-0', 'ASYNC-1'])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxAsyncIntegrationTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import tdxlib.tdx_asset_integration
+import tdxlib.tdx_async_ticket_integration
+import tdxlib.tdx_ticket_integration
+from tdxlib import tdx_cache
+from tdxlib import tdx_stub_server
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TdxCacheTesting(unittest.TestCase):
+    """Test cases for the cache regions integrations keep TDX objects in. These run offline."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = tdx_cache.TDXCache(ttl=60, max_size=3, region_ttls={'people': 10}, clock=self.clock)
+
+    def test_ttl(self):
+        """Test that entries expire after the region's TTL, and that region_ttls overrides the cache's."""
+        people = self.cache.add_region('people')
+        accounts = self.cache.add_region('accounts')
+        people['ann'] = ['Ann']
+        accounts['IT'] = {'ID': 1}
+        self.clock.now += 30
+        self.assertIsNone(people.get('ann'))
+        self.assertEqual(accounts.get('IT'), {'ID': 1})
+        self.clock.now += 30
+        self.assertNotIn('IT', accounts)
+        self.assertEqual(self.cache.stats()['people']['expirations'], 1)
+        self.assertEqual(self.cache.stats()['accounts']['expirations'], 1)
+
+    def test_lru_eviction(self):
+        """Test that a full region evicts the least recently used entry."""
+        groups = self.cache.add_region('groups')
+        for name in ['a', 'b', 'c']:
+            groups[name] = name.upper()
+        groups.get('a')
+        groups['d'] = 'D'
+        self.assertEqual(sorted(groups), ['a', 'c', 'd'])
+        stats = groups.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['evictions']), (3, 1, 1))
+
+    def test_invalidate(self):
+        """Test dropping one entry, one region, and everything."""
+        groups = self.cache.add_region('groups')
+        locations = self.cache.add_region('locations')
+        groups['a'] = 'A'
+        groups['b'] = 'B'
+        locations['x'] = 'X'
+        self.cache.invalidate('groups', 'a')
+        self.assertEqual(list(groups), ['b'])
+        self.cache.invalidate('groups')
+        self.assertEqual(len(groups), 0)
+        self.assertEqual(len(locations), 1)
+        self.cache.invalidate()
+        self.assertEqual(len(locations), 0)
+
+    def test_whole_list_regions(self):
+        """Test that whole-list regions read like the old cache dicts: the list, or {} when it isn't cached."""
+        self.cache.add_region('ticket_type', whole_list=True)
+        self.assertEqual(self.cache['ticket_type'], {})
+        calls = []
+        loader = lambda: calls.append(1) or [{'ID': 1, 'Name': 'Incident'}]
+        self.assertEqual(self.cache.load_all('ticket_type', loader), [{'ID': 1, 'Name': 'Incident'}])
+        self.assertEqual(self.cache.load_all('ticket_type', loader), [{'ID': 1, 'Name': 'Incident'}])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache['ticket_type'], [{'ID': 1, 'Name': 'Incident'}])
+
+    def test_disabled(self):
+        """Test that a disabled cache stores nothing, except in regions that ask to be enabled."""
+        cache = tdx_cache.TDXCache(enabled=False)
+        people = cache.add_region('people')
+        rate_limit = cache.add_region('rate_limit', enabled=True)
+        people['ann'] = ['Ann']
+        rate_limit['limit'] = 60
+        self.assertIsNone(people.get('ann'))
+        self.assertEqual(people.stats()['misses'], 1)
+        self.assertEqual(rate_limit['limit'], 60)
+
+    def test_region_ttls_from_config(self):
+        """Test reading per-region TTLs from the config."""
+        self.assertEqual(tdx_cache._parse_region_ttls('people=600, ticket_status = 86400'),
+                         {'people': 600.0, 'ticket_status': 86400.0})
+        with self.assertRaises(ValueError):
+            tdx_cache._parse_region_ttls('people')
+
+    def test_lookup_index(self):
+        """Test that IDs win over names, exact names over partial ones, and the first partial match is remembered."""
+        items = [{'ID': 1, 'Name': 'Network Printer'}, {'ID': 2, 'Name': 'Printer'},
+                 {'ID': 3, 'Name': 'Scanner', 'IsActive': False}, {'ID': 4, 'Name': '1'}]
+        index = tdx_cache.TDXLookupIndex(items)
+        self.assertEqual(index.find('1')['ID'], 1)
+        self.assertEqual(index.find(1, ids=False)['ID'], 4)
+        self.assertEqual(index.find(' PRINTER ')['ID'], 2)
+        self.assertEqual(index.find('print')['ID'], 1)
+        self.assertIsNone(index.find('print', partial=False))
+        self.assertIn('print', index._partial)
+        self.assertEqual(index.find('scan')['ID'], 3)
+        self.assertIsNone(tdx_cache.TDXLookupIndex(items, active_only=True).find('scan'))
+
+    def test_region_index(self):
+        """Test that a region's index is reused until its list is replaced or invalidated."""
+        calls = []
+        self.cache.add_region('vendor', whole_list=True)
+
+        def loader():
+            calls.append(1)
+            return [{'ID': len(calls), 'Name': 'Vendor'}]
+
+        index = self.cache.lookup('vendor', loader)
+        self.assertIs(self.cache.lookup('vendor', loader), index)
+        self.assertEqual(index.find('vendor')['ID'], 1)
+        self.cache.invalidate('vendor')
+        self.assertEqual(self.cache.lookup('vendor', loader).find('vendor')['ID'], 2)
+        self.clock.now += 60
+        self.assertEqual(self.cache.lookup('vendor', loader).find('vendor')['ID'], 3)
+
+    def test_integration_lookups(self):
+        """Test that name lookups are answered from the cache, until it's invalidated."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+        tdx = tdxlib.tdx_ticket_integration.TDXTicketIntegration(config=stub.config(), skip_initial_auth=True)
+        self.addCleanup(tdx.close)
+        tdx.transport = tdx_stub_server.TDXStubTransport(stub)
+        for _ in range(3):
+            tdx.get_ticket_type_by_name_id('Problem')
+            tdx.get_account_by_name('Information Technology')
+        # One authentication, and one request each for the ticket types and the account
+        self.assertEqual(stub.requests, 3)
+        stats = tdx.cache.stats()
+        self.assertEqual((stats['ticket_type']['hits'], stats['ticket_type']['misses']), (2, 1))
+        self.assertEqual((stats['accounts']['hits'], stats['accounts']['misses']), (2, 1))
+        self.assertIn('tdxlib_cache_hits_total{region="accounts"} 2', tdx.metrics_text())
+        tdx.cache.invalidate('ticket_type')
+        tdx.get_ticket_type_by_name_id('Problem')
+        self.assertEqual(stub.requests, 4)
+
+    def test_asset_custom_attributes(self):
+        """Test that configuration item custom attributes are found along with asset ones."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+
+        class StubAssetIntegration(tdxlib.tdx_asset_integration.TDXAssetIntegration):
+            def setup_transport(self):
+                return tdx_stub_server.TDXStubTransport(stub)
+
+        tdx = StubAssetIntegration(config=stub.config())
+        self.addCleanup(tdx.close)
+        attribute = stub.data.custom_attributes[63][0]
+        self.assertEqual(tdx.get_asset_custom_attribute_by_name_id(attribute['ID'])['Name'], attribute['Name'])
+
+    def test_lazy_construction(self):
+        """Test that creating an asset integration only authenticates, and reference data loads on first use."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+
+        class StubAssetIntegration(tdxlib.tdx_asset_integration.TDXAssetIntegration):
+            def setup_transport(self):
+                return tdx_stub_server.TDXStubTransport(stub)
+
+        tdx = StubAssetIntegration(config=stub.config(caching='true'))
+        self.addCleanup(tdx.close)
+        self.assertEqual(stub.requests, 1)
+        self.assertEqual(tdx.cache['asset_custom_attributes'], {})
+        tdx.get_asset_custom_attribute_by_name_id('Support Tier')
+        # The asset and CI custom attributes
+        self.assertEqual(stub.requests, 3)
+
+    def test_reference_cache(self):
+        """Test that reference data kept on disk is reused by a later integration, but not across versions."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'reference.sqlite')
+
+        def lookup():
+            tdx = tdxlib.tdx_ticket_integration.TDXTicketIntegration(config=stub.config(reference_cache=path),
+                                                                      skip_initial_auth=True)
+            self.addCleanup(tdx.close)
+            tdx.transport = tdx_stub_server.TDXStubTransport(stub)
+            tdx.get_ticket_priority_by_name_id('High')
+            return tdx
+
+        # One authentication, and one request for the priorities
+        tdx = lookup()
+        self.assertEqual(stub.requests, 2)
+        self.assertEqual(tdx.cache.stats()['ticket_priority']['persistent_hits'], 0)
+        # Nothing, not even authentication, since no request is made
+        tdx = lookup()
+        self.assertEqual(stub.requests, 2)
+        self.assertEqual(tdx.cache.stats()['ticket_priority']['persistent_hits'], 1)
+        stored = tdx_cache.TDXSQLiteCacheStore(path).get(f'{tdx.config.api_url}|{stub.ticket_app_id}',
+                                                         'ticket_priority', tdx_cache.ALL)
+        self.assertEqual(stored[0], tdx.get_all_ticket_priorities())
+
+        store = tdx_cache.TDXSQLiteCacheStore(os.path.join(directory.name, 'versions.sqlite'))
+        store.set('tenant|1', 'vendor', tdx_cache.ALL, [{'ID': 1}], ttl=60)
+        self.assertEqual(store.get('tenant|1', 'vendor', tdx_cache.ALL)[0], [{'ID': 1}])
+        store.version = 'other'
+        self.assertIsNone(store.get('tenant|1', 'vendor', tdx_cache.ALL))
+
+    def test_warm_cache(self):
+        """Test that warm_cache() fetches every lookup table, so later lookups don't make requests."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+        tdx = tdxlib.tdx_ticket_integration.TDXTicketIntegration(config=stub.config(), skip_initial_auth=True)
+        self.addCleanup(tdx.close)
+        tdx.transport = tdx_stub_server.TDXStubTransport(stub)
+        warmed = tdx.warm_cache()
+        self.assertEqual(warmed['ticket_priority'], len(stub.data.ticket_priorities))
+        self.assertEqual(warmed['all_accounts'], len(stub.data.accounts))
+        self.assertEqual(warmed['custom_attributes'], len(stub.data.custom_attributes[9]))
+        requests = stub.requests
+        self.assertEqual(tdx.search_ticket_status('On Hold')['Name'], 'On Hold')
+        self.assertEqual(tdx.get_ticket_priority_by_name_id('High')['Name'], 'High')
+        self.assertEqual(tdx.get_account_by_name('Information Technology')['ID'], stub.data.accounts[0]['ID'])
+        self.assertEqual(tdx.get_group_by_name('Support Group 1')['ID'], 60001)
+        self.assertEqual(stub.requests, requests)
+        # Warming again doesn't fetch what's already cached
+        tdx.warm_cache()
+        self.assertEqual(stub.requests, requests)
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_async_warm_cache(self):
+        """Test that an async integration's warm_cache() caches what its lookups use."""
+        with tdx_stub_server.TDXStubServer(rate_limit=0) as stub:
+            async def run():
+                tdx = tdxlib.tdx_async_ticket_integration.TDXAsyncTicketIntegration(config=stub.config())
+                warmed = await tdx.warm_cache()
+                requests = stub.requests
+                statuses = await tdx.get_ticket_status_by_status_class([3])
+                await tdx.close()
+                return warmed, statuses, stub.requests - requests
+
+            warmed, statuses, requests = asyncio.run(run())
+            self.assertEqual(warmed, {'ticket_statuses': len(stub.data.ticket_statuses)})
+            self.assertEqual(sorted(status['Name'] for status in statuses), ['Closed', 'Resolved'])
+            self.assertEqual(requests, 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxCacheTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
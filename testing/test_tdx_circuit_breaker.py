@@ -0,0 +1,61 @@
+import time
+import unittest
+
+import tdxlib.tdx_api_exceptions
+from tdxlib import tdx_circuit_breaker
+
+import tdx_fakes
+
+
+class TdxCircuitBreakerTesting(unittest.TestCase):
+    """Test cases for the per-endpoint circuit breaker. These run offline."""
+
+    def test_endpoint_family(self):
+        """Test that IDs and query strings are skipped when working out the endpoint family."""
+        self.assertEqual(tdx_circuit_breaker.endpoint_family('/123/tickets/456/feed'), 'tickets')
+        self.assertEqual(tdx_circuit_breaker.endpoint_family('/12/assets/search'), 'assets')
+        self.assertEqual(tdx_circuit_breaker.endpoint_family('/people/lookup?searchText=x'), 'people')
+
+    def test_trip_and_recover(self):
+        """Test that the circuit opens after consecutive failures, probes once after the cooldown, and closes."""
+        breaker = tdx_circuit_breaker.TDXCircuitBreaker(failure_threshold=3, cooldown=0.05)
+        for _ in range(2):
+            self.assertTrue(breaker.allow('assets'))
+            breaker.record_failure('assets')
+        breaker.record_success('assets')
+        for _ in range(3):
+            breaker.record_failure('assets')
+        self.assertFalse(breaker.allow('assets'))
+        self.assertTrue(breaker.allow('tickets'))
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow('assets'))
+        self.assertFalse(breaker.allow('assets'))
+        self.assertEqual(breaker.state()['assets']['state'], tdx_circuit_breaker.HALF_OPEN)
+        breaker.record_failure('assets')
+        self.assertEqual(breaker.state()['assets']['state'], tdx_circuit_breaker.OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow('assets'))
+        breaker.record_success('assets')
+        self.assertEqual(breaker.state()['assets'], {'state': tdx_circuit_breaker.CLOSED, 'failures': 0, 'trips': 2,
+                                                     'rejected': 2, 'retry_in': 0.0})
+
+    def test_integration_fails_fast(self):
+        """Test that once an endpoint family's circuit opens, requests to it fail without reaching TDX."""
+        tdx = tdx_fakes.make_integration(tdx_fakes.FakeTransport(status_code=503), retries='5', retry_backoff='0',
+                                         circuit_breaker_threshold='3', circuit_breaker_cooldown='60')
+        with self.assertRaises(tdxlib.tdx_api_exceptions.TdxApiCircuitOpenError):
+            tdx.make_get('/12/assets/1')
+        self.assertEqual(len(tdx.transport.calls), 3)
+        with self.assertRaises(tdxlib.tdx_api_exceptions.TdxApiCircuitOpenError):
+            tdx.make_get('/12/assets/2')
+        self.assertEqual(len(tdx.transport.calls), 3)
+        self.assertEqual(tdx.circuit_state()['assets']['state'], 'open')
+        # Other families are unaffected, and client errors don't count as failures
+        tdx.transport.status_code = 404
+        self.assertIsNone(tdx.make_get('/34/tickets/1'))
+        self.assertEqual(tdx.circuit_state()['tickets']['failures'], 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxCircuitBreakerTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,119 @@
+import asyncio
+import time
+import unittest
+
+import tdxlib.tdx_deadline
+from tdxlib import tdx_concurrency
+from tdxlib import tdx_priority
+from tdxlib import tdx_retry
+
+import tdx_fakes
+
+
+class TdxConcurrencyTesting(unittest.TestCase):
+    """Test cases for the adaptive concurrency limiter. These run offline."""
+
+    def saturate(self, limiter, latency=0.001, status_code=200, headers=None, error_kind=None):
+        # Fill every slot, then let one request finish with the given outcome, a round trip after the last one
+        time.sleep(0.002)
+        while limiter.acquire(timeout=0):
+            pass
+        limiter.release(None if error_kind else latency, None if error_kind else status_code, headers, error_kind)
+        while limiter.in_flight:
+            limiter.release()
+
+    def test_grows_while_healthy(self):
+        """Test that the limit grows additively while the limit is in use and TDX is coping."""
+        limiter = tdx_concurrency.TDXConcurrencyLimiter(initial=2, maximum=4)
+        for _ in range(20):
+            self.saturate(limiter)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_idle_limit_doesnt_grow(self):
+        """Test that one request at a time doesn't push the limit up."""
+        limiter = tdx_concurrency.TDXConcurrencyLimiter(initial=2, maximum=10)
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release(0.001, 200)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_cut_on_overload(self):
+        """Test that 429s, timeouts and rising latency halve the limit, and low rate-limit headroom holds it."""
+        limiter = tdx_concurrency.TDXConcurrencyLimiter(initial=8, maximum=8)
+        self.saturate(limiter)
+        self.assertEqual(limiter.limit, 8)
+        self.saturate(limiter, status_code=429)
+        self.assertEqual(limiter.limit, 4)
+        self.saturate(limiter, error_kind=tdx_retry.NETWORK_ERROR)
+        self.assertEqual(limiter.limit, 2)
+        self.saturate(limiter, latency=0.01)
+        self.assertEqual(limiter.limit, 1)
+        self.saturate(limiter, headers={'X-RateLimit-Remaining': '3'})
+        self.assertEqual(limiter.limit, 1)
+
+    def test_acquire_times_out(self):
+        """Test that waiting for a slot gives up after the timeout."""
+        limiter = tdx_concurrency.TDXConcurrencyLimiter(initial=1)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire(timeout=0.05))
+
+    def test_async_acquire(self):
+        """Test that the async limiter waits without blocking the loop, times out, and serves interactive first."""
+        limiter = tdx_concurrency.TDXAsyncConcurrencyLimiter(initial=1)
+        order = []
+
+        async def wait(lane):
+            await limiter.acquire(lane=lane)
+            order.append(lane)
+            limiter.release()
+
+        async def main():
+            self.assertTrue(await limiter.acquire())
+            self.assertFalse(await limiter.acquire(timeout=0.05))
+            bulk = asyncio.ensure_future(wait(tdx_priority.BULK))
+            await asyncio.sleep(0.01)
+            interactive = asyncio.ensure_future(wait(tdx_priority.INTERACTIVE))
+            await asyncio.sleep(0.01)
+            limiter.release()
+            await asyncio.gather(bulk, interactive)
+
+        asyncio.run(main())
+        self.assertEqual(order, [tdx_priority.INTERACTIVE, tdx_priority.BULK])
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_run_concurrently(self):
+        """Test that bulk work runs in parallel within the limit, keeps its order, and carries the deadline over."""
+        # Each request echoes its URL back, after a short pause
+        transport = tdx_fakes.FakeTransport(delay=0.05, respond=lambda method, url, kwargs:
+                                            tdx_fakes.make_response(content='{"URL": "%s"}' % url))
+        tdx = tdx_fakes.make_integration(transport, concurrency='3', max_concurrency='3')
+        urls = [f'/accounts/{i}' for i in range(12)]
+        started = time.monotonic()
+        results = tdx._run_concurrently(tdx.make_get, urls)
+        self.assertLess(time.monotonic() - started, 12 * 0.05)
+        self.assertEqual([result['URL'] for result in results], [tdx.config.api_url + url for url in urls])
+        self.assertEqual(tdx.transport.peak, 3)
+        with tdxlib.tdx_deadline.deadline(0.12):
+            self.assertTrue(all(tdx._run_concurrently(lambda _: tdxlib.tdx_deadline.remaining() is not None,
+                                                      urls[:3])))
+            partial = tdx._run_concurrently(tdx.make_get, urls)
+        self.assertLess(len(partial), len(urls))
+
+    def test_run_concurrently_error(self):
+        """Test that when one item fails, the error is raised and items that haven't started are cancelled."""
+        tdx = tdx_fakes.make_integration(authenticated=False, max_concurrency='2')
+        started = []
+
+        def fail(item):
+            started.append(item)
+            time.sleep(0.05)
+            raise ValueError(item)
+
+        with self.assertRaises(ValueError):
+            tdx._run_concurrently(fail, list(range(20)))
+        self.assertLess(len(started), 20)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxConcurrencyTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
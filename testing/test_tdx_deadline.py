@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+
+from tdxlib import tdx_deadline
+
+try:
+    import httpx
+    import tdxlib.tdx_async_integration
+except ImportError:
+    httpx = None
+
+import tdx_fakes
+
+
+class TdxDeadlineTesting(unittest.TestCase):
+    """Test cases for request timeouts and deadlines. These run offline."""
+
+    config = dict(tdx_fakes.CONFIG, connect_timeout=2, read_timeout=20)
+
+    def setUp(self):
+        self.tdx = tdx_fakes.make_integration(**self.config)
+
+    def timeouts(self) -> list:
+        return [kwargs.get('timeout') for _, _, kwargs in self.tdx.transport.calls]
+
+    def test_nested_deadlines_only_shorten(self):
+        """Test that an inner deadline can't extend an outer one."""
+        self.assertIsNone(tdx_deadline.remaining())
+        with tdx_deadline.deadline(1):
+            with tdx_deadline.deadline(100):
+                self.assertLessEqual(tdx_deadline.remaining(), 1)
+            self.assertAlmostEqual(tdx_deadline.clamp(30), tdx_deadline.remaining(), delta=0.01)
+        self.assertIsNone(tdx_deadline.remaining())
+        self.assertEqual(tdx_deadline.clamp(30), 30)
+
+    def test_timeouts_from_config(self):
+        """Test that every request carries the configured timeouts, or a per-call override."""
+        self.tdx.transport = tdx_fakes.FakeTransport()
+        self.tdx.make_get('/accounts')
+        self.tdx.make_post('/accounts', {}, timeout=5)
+        self.assertEqual(self.timeouts(), [(2, 20), 5])
+
+    def test_timeouts_shortened_by_deadline(self):
+        """Test that timeouts don't run past the deadline."""
+        self.tdx.transport = tdx_fakes.FakeTransport()
+        with self.tdx.deadline(1):
+            self.tdx.make_get('/accounts')
+        connect, read = self.timeouts()[0]
+        self.assertLessEqual(connect, 1)
+        self.assertLessEqual(read, 1)
+
+    def test_requests_stop_at_deadline(self):
+        """Test that requests aren't sent once the deadline has passed."""
+        self.tdx.transport = tdx_fakes.FakeTransport(delay=0.05)
+        results = []
+        with self.tdx.deadline(0.12):
+            for _ in range(10):
+                results.append(self.tdx.make_get('/accounts'))
+        self.assertLess(len(self.timeouts()), 10)
+        self.assertIsNone(results[-1])
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_async_gather_returns_partial_results(self):
+        """Test that async fan-out returns what finished before the deadline."""
+        async def work(delay):
+            await asyncio.sleep(delay)
+            return delay
+
+        async def run():
+            tdx = tdxlib.tdx_async_integration.TDXAsyncIntegration(config=dict(self.config))
+            with tdx.deadline(0.2):
+                results = await tdx.gather(work(0), work(5), work(0.01))
+            await tdx.close()
+            return results
+
+        self.assertEqual(asyncio.run(run()), [0, 0.01])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxDeadlineTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
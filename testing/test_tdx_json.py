@@ -0,0 +1,54 @@
+import unittest
+
+from tdxlib import tdx_json
+
+
+class TdxJsonTesting(unittest.TestCase):
+    """Test cases for the pluggable JSON codec. These run offline."""
+
+    sample = {'ID': 12, 'Name': 'Café / Lab', 'Attributes': [{'ID': 1, 'Value': None}], 'Active': True}
+
+    def available_codecs(self) -> list:
+        codecs = ['json']
+        if tdx_json.orjson:
+            codecs.append('orjson')
+        if tdx_json.ujson:
+            codecs.append('ujson')
+        return codecs
+
+    def test_round_trip(self):
+        """Test that every installed codec encodes to UTF-8 bytes and decodes bytes and str alike."""
+        for name in self.available_codecs():
+            codec = tdx_json.TDXJSONCodec(name)
+            encoded = codec.dumps(self.sample)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(codec.loads(encoded), self.sample)
+            self.assertEqual(codec.loads(encoded.decode('utf-8')), self.sample)
+            # Every codec has to produce JSON the standard library agrees with
+            self.assertEqual(tdx_json.TDXJSONCodec('json').loads(encoded), self.sample)
+
+    def test_same_output(self):
+        """Test that every installed codec accepts what the json module does, and encodes it the same way."""
+        body = {1: 'Café', 'Path': '/tickets/1', 'Attributes': {2: 'Łódź'}, 'Big': 2 ** 70}
+        expected = '{"1":"Café","Path":"/tickets/1","Attributes":{"2":"Łódź"},"Big":1180591620717411303424}'
+        for name in self.available_codecs():
+            self.assertEqual(tdx_json.TDXJSONCodec(name).dumps(body).decode('utf-8'), expected, name)
+
+    def test_decode_error(self):
+        """Test that each codec's decode errors can be caught through decode_error."""
+        for name in self.available_codecs():
+            codec = tdx_json.TDXJSONCodec(name)
+            with self.assertRaises(codec.decode_error):
+                codec.loads(b'<html>Service Unavailable</html>')
+
+    def test_auto_prefers_fast_codec(self):
+        """Test that auto picks the fastest installed library."""
+        expected = 'orjson' if tdx_json.orjson else 'ujson' if tdx_json.ujson else 'json'
+        self.assertEqual(tdx_json.TDXJSONCodec('auto').name, expected)
+        with self.assertRaises(ValueError):
+            tdx_json.TDXJSONCodec('simplejson')
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxJsonTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
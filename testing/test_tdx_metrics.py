@@ -0,0 +1,87 @@
+import unittest
+import urllib.request
+
+import tdxlib.tdx_integration
+from tdxlib import tdx_metrics
+
+import tdx_fakes
+
+
+class TdxMetricsTesting(unittest.TestCase):
+    """Test cases for request metrics and the Prometheus exporter. These run offline."""
+
+    def make_integration(self, status_codes: list) -> tdxlib.tdx_integration.TDXIntegration:
+        return tdx_fakes.make_integration(tdx_fakes.FakeTransport(status_codes, body='{"ID": 1}'), retries='3',
+                                          retry_backoff='0', coalesce_gets='false')
+
+    @staticmethod
+    def series(snapshot: dict, name: str, **labels) -> dict:
+        for entry in snapshot.get(name, []):
+            if all(entry['labels'].get(key) == value for key, value in labels.items()):
+                return entry
+        return None
+
+    def test_endpoint_template(self):
+        """Test that IDs, GUIDs and query strings are taken out of endpoint templates."""
+        self.assertEqual(tdx_metrics.endpoint_template('/123/tickets/456/feed?x=1'), '/{id}/tickets/{id}/feed')
+        self.assertEqual(tdx_metrics.endpoint_template('/people/6b1a2c3d-0000-4e5f-8a9b-0123456789ab'),
+                         '/people/{uid}')
+        self.assertEqual(tdx_metrics.endpoint_template('/accounts'), '/accounts')
+
+    def test_requests_recorded(self):
+        """Test that attempts, whole calls, retries and bytes are counted per endpoint template."""
+        tdx = self.make_integration([503, 200, 200])
+        self.assertEqual(tdx.make_get('/12/assets/1'), {'ID': 1})
+        tdx.make_post('/12/assets/2', {'Name': 'x'})
+        snapshot = tdx.metrics.snapshot()
+        get_503 = self.series(snapshot, 'tdxlib_requests_total', method='GET', endpoint='/{id}/assets/{id}',
+                              status=503)
+        self.assertEqual(get_503['value'], 1)
+        call = self.series(snapshot, 'tdxlib_calls_total', method='GET', status=200, retries=1)
+        self.assertEqual(call['value'], 1)
+        latency = self.series(snapshot, 'tdxlib_request_duration_seconds', method='GET', status=200)
+        self.assertEqual(latency['count'], 1)
+        sent = self.series(snapshot, 'tdxlib_request_bytes_sent_total', method='POST')
+        self.assertEqual(sent['value'], len(tdx.codec.dumps({'Name': 'x'})))
+        received = self.series(snapshot, 'tdxlib_response_bytes_received_total', method='GET')
+        self.assertEqual(received['value'], 2 * len(b'{"ID": 1}'))
+        self.assertEqual(self.series(snapshot, 'tdxlib_circuit_state', family='assets')['value'], 0)
+
+    def test_prometheus_text(self):
+        """Test the Prometheus text format, including cumulative histogram buckets and label escaping."""
+        registry = tdx_metrics.TDXMetricsRegistry(buckets=(0.1, 1.0))
+        registry.observe('tdxlib_request_duration_seconds', 0.05, {'method': 'GET', 'endpoint': '/a"b'})
+        registry.observe('tdxlib_request_duration_seconds', 0.5, {'method': 'GET', 'endpoint': '/a"b'})
+        registry.record_rate_limit_wait('/accounts', 1.5)
+        text = registry.to_prometheus()
+        self.assertIn('# TYPE tdxlib_request_duration_seconds histogram', text)
+        self.assertIn('tdxlib_request_duration_seconds_bucket{endpoint="/a\\"b",method="GET",le="0.1"} 1', text)
+        self.assertIn('tdxlib_request_duration_seconds_bucket{endpoint="/a\\"b",method="GET",le="1.0"} 2', text)
+        self.assertIn('tdxlib_request_duration_seconds_bucket{endpoint="/a\\"b",method="GET",le="+Inf"} 2', text)
+        self.assertIn('tdxlib_request_duration_seconds_count{endpoint="/a\\"b",method="GET"} 2', text)
+        self.assertIn('tdxlib_rate_limit_sleep_seconds_total{endpoint="/accounts"} 1.5', text)
+
+    def test_http_server(self):
+        """Test that the metrics can be scraped over HTTP."""
+        registry = tdx_metrics.TDXMetricsRegistry()
+        registry.record_auth(200, 0.2)
+        server = registry.start_http_server(0, '127.0.0.1')
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode('utf-8')
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('tdxlib_auth_total{status="200"} 1.0', body)
+
+    def test_disabled(self):
+        """Test that nothing is recorded when metrics are turned off."""
+        registry = tdx_metrics.TDXMetricsRegistry(enabled=False)
+        registry.record_call('GET', '/accounts', 200, 0, 0.1)
+        self.assertEqual(registry.snapshot(), {})
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxMetricsTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
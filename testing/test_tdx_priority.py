@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from tdxlib import tdx_concurrency
+from tdxlib import tdx_priority
+from tdxlib import tdx_rate_limit
+
+import tdx_fakes
+
+
+class TdxPriorityTesting(unittest.TestCase):
+    """Test cases for the interactive and bulk priority lanes. These run offline."""
+
+    def make_limiter(self, remaining: int, limit: int = 100) -> tdx_rate_limit.TDXRateLimiter:
+        limiter = tdx_rate_limit.TDXRateLimiter(burst=1, skew_mitigation_secs=0, bulk_reserve=0.2)
+        with limiter.store.transaction(limiter.key) as budget:
+            budget.update({'limit': limit, 'remaining': remaining, 'reset_time': time.time() + 60})
+        return limiter
+
+    def test_lane_from_context(self):
+        """Test that the lane follows priority() blocks, and that override=False keeps an enclosing lane."""
+        self.assertEqual(tdx_priority.current(), tdx_priority.INTERACTIVE)
+        with tdx_priority.priority(tdx_priority.BULK):
+            self.assertEqual(tdx_priority.current(), tdx_priority.BULK)
+            with tdx_priority.priority(tdx_priority.INTERACTIVE, override=False):
+                self.assertEqual(tdx_priority.current(), tdx_priority.BULK)
+        with self.assertRaises(ValueError):
+            with tdx_priority.priority('urgent'):
+                pass
+
+    def test_bulk_leaves_reserve(self):
+        """Test that bulk requests stop at the reserved share of the budget, and interactive ones carry on."""
+        limiter = self.make_limiter(remaining=20)
+        self.assertGreater(limiter.reserve(lane=tdx_priority.BULK), 50)
+        self.assertEqual(limiter.reserve(lane=tdx_priority.INTERACTIVE), 0)
+        self.assertEqual(limiter.state()['remaining'], 19)
+
+    def test_interactive_not_queued_behind_bulk(self):
+        """Test that a backlog of paced bulk requests doesn't delay an interactive request."""
+        limiter = self.make_limiter(remaining=80)
+        for _ in range(20):
+            bulk_wait = limiter.reserve(lane=tdx_priority.BULK)
+        self.assertGreater(bulk_wait, 10)
+        self.assertLess(limiter.reserve(lane=tdx_priority.INTERACTIVE), 1)
+
+    def test_interactive_gets_next_slot(self):
+        """Test that when a request slot frees up, a waiting interactive request gets it before bulk ones."""
+        limiter = tdx_concurrency.TDXConcurrencyLimiter(initial=1)
+        limiter.acquire(lane=tdx_priority.INTERACTIVE)
+        order = []
+
+        def wait(lane):
+            limiter.acquire(lane=lane)
+            order.append(lane)
+            limiter.release()
+
+        bulk = threading.Thread(target=wait, args=(tdx_priority.BULK,))
+        bulk.start()
+        time.sleep(0.05)
+        interactive = threading.Thread(target=wait, args=(tdx_priority.INTERACTIVE,))
+        interactive.start()
+        time.sleep(0.05)
+        limiter.release()
+        bulk.join()
+        interactive.join()
+        self.assertEqual(order, [tdx_priority.INTERACTIVE, tdx_priority.BULK])
+
+    def test_bulk_operations_use_bulk_lane(self):
+        """Test that work run by bulk operations goes in the bulk lane, unless the caller picked a lane."""
+        tdx = tdx_fakes.make_integration()
+        lanes = tdx._run_concurrently(lambda _: tdx_priority.current(), [1, 2, 3])
+        self.assertEqual(lanes, [tdx_priority.BULK] * 3)
+        with tdx.priority('interactive'):
+            lanes = tdx._run_concurrently(lambda _: tdx_priority.current(), [1, 2, 3])
+        self.assertEqual(lanes, [tdx_priority.INTERACTIVE] * 3)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxPriorityTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import types
+import unittest
+from email.utils import formatdate
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import tdxlib.tdx_async_integration
+from tdxlib import tdx_rate_limit
+
+import tdx_fakes
+
+
+def rate_limit_headers(limit: int, remaining: int, reset_in: float) -> dict:
+    now = time.time()
+    return {
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': formatdate(now + reset_in, usegmt=True),
+        'Date': formatdate(now, usegmt=True)
+    }
+
+
+class TdxRateLimitTesting(unittest.TestCase):
+    """Test cases for the TDX rate-limit pacer. These run offline."""
+
+    def test_no_pacing_before_first_response(self):
+        """Test that requests aren't delayed before any rate-limit headers have been seen."""
+        limiter = tdx_rate_limit.TDXRateLimiter(burst=1)
+        for _ in range(20):
+            self.assertEqual(limiter.reserve(), 0)
+
+    def test_parse_http_date(self):
+        """Test parsing the X-RateLimit-Reset header format."""
+        self.assertEqual(tdx_rate_limit.parse_http_date('Thu, 01 Jan 1970 00:01:00 GMT'), 60.0)
+
+    def test_requests_spread_across_window(self):
+        """Test that the remaining budget is spread evenly over the rest of the window."""
+        limiter = tdx_rate_limit.TDXRateLimiter(burst=1)
+        limiter.update(rate_limit_headers(60, 10, 10))
+        waits = [limiter.reserve() for _ in range(5)]
+        self.assertEqual(waits[0], 0)
+        # 10 requests left in ~10 seconds means about one request per second
+        self.assertAlmostEqual(waits[4] - waits[3], 1.0, delta=0.3)
+
+    def test_burst_allowed(self):
+        """Test that a burst of requests goes out without waiting."""
+        limiter = tdx_rate_limit.TDXRateLimiter(burst=3)
+        limiter.update(rate_limit_headers(60, 30, 30))
+        waits = [limiter.reserve() for _ in range(4)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertGreater(waits[3], 0)
+
+    def test_spent_budget_waits_for_reset(self):
+        """Test that an exhausted budget waits until the window resets."""
+        limiter = tdx_rate_limit.TDXRateLimiter(burst=5, skew_mitigation_secs=1)
+        limiter.update(rate_limit_headers(60, 0, 20))
+        self.assertAlmostEqual(limiter.reserve(), 21, delta=1.5)
+
+    def test_state(self):
+        """Test reporting the current budget."""
+        limiter = tdx_rate_limit.TDXRateLimiter()
+        self.assertIsNone(limiter.update({}))
+        budget = limiter.update(rate_limit_headers(60, 42, 30), '/locations')
+        self.assertEqual((budget['limit'], budget['remaining'], budget['last_url']), (60, 42, '/locations'))
+        state = limiter.state()
+        self.assertEqual(state['limit'], 60)
+        self.assertEqual(state['remaining'], 42)
+        self.assertEqual(state['last_url'], '/locations')
+        self.assertAlmostEqual(state['reset_in'], 30, delta=1.5)
+
+    def test_threads_get_distinct_slots(self):
+        """Test that concurrent callers are each given their own slot."""
+        limiter = tdx_rate_limit.TDXRateLimiter(burst=1)
+        limiter.update(rate_limit_headers(60, 100, 100))
+        waits = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(10):
+                wait = limiter.reserve()
+                with lock:
+                    waits.append(wait)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(waits), 40)
+        # Every slot is about one second after the previous one, so no two callers share a slot
+        self.assertGreater(max(waits), 38)
+        self.assertEqual(limiter.state()['remaining'], 60)
+
+    def test_limiters_share_store(self):
+        """Test that two limiters with the same store and key draw from one budget."""
+        store = tdx_rate_limit.TDXMemoryRateLimitStore()
+        first = tdx_rate_limit.TDXRateLimiter(burst=1, store=store, key='tenant|user')
+        second = tdx_rate_limit.TDXRateLimiter(burst=1, store=store, key='tenant|user')
+        other = tdx_rate_limit.TDXRateLimiter(burst=1, store=store, key='tenant|someone-else')
+        first.update(rate_limit_headers(60, 10, 10))
+        self.assertEqual(first.reserve(), 0)
+        self.assertGreater(second.reserve(), 0.5)
+        self.assertEqual(second.state()['remaining'], 8)
+        self.assertIsNone(other.state()['remaining'])
+
+    def test_sqlite_store_shared_between_processes(self):
+        """Test that separate SQLite stores on one file (as separate processes would have) share a budget,
+        and that consumption is logged per owner."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'rate_limit.db')
+            worker_a = tdx_rate_limit.TDXRateLimiter(burst=1, store=tdx_rate_limit.TDXSQLiteRateLimitStore(path),
+                                                     owner='worker-a')
+            worker_b = tdx_rate_limit.TDXRateLimiter(burst=1, store=tdx_rate_limit.TDXSQLiteRateLimitStore(path),
+                                                     owner='worker-b')
+            worker_a.update(rate_limit_headers(60, 10, 10), '/tickets')
+            self.assertEqual(worker_a.reserve('/tickets/1'), 0)
+            self.assertGreater(worker_b.reserve('/assets/1'), 0.5)
+            worker_b.reserve('/assets/2')
+            self.assertEqual(worker_a.state()['remaining'], 7)
+            usage = {row['owner']: row['requests'] for row in worker_a.usage()}
+            self.assertEqual(usage, {'worker-a': 1, 'worker-b': 2})
+
+    def test_sqlite_store_prunes_occasionally(self):
+        """Test that the consumption log is pruned at most once every prune_interval, not on every request."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = tdx_rate_limit.TDXSQLiteRateLimitStore(os.path.join(tmp, 'rate_limit.db'), retention_secs=0,
+                                                           prune_interval=3600)
+            for _ in range(3):
+                store.record('tenant|user', 'worker', '/tickets', 0.0)
+            self.assertEqual(store.usage()[0]['requests'], 3)
+            store._last_prune = 0.0
+            time.sleep(0.01)
+            store.record('tenant|user', 'worker', '/tickets', 0.0)
+            self.assertEqual(store.usage()[0]['requests'], 1)
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_async_sqlite_store_off_loop(self):
+        """Test that an async integration uses a SQLite store from a worker thread, not the event loop."""
+        threads = []
+
+        class RecordingStore(tdx_rate_limit.TDXSQLiteRateLimitStore):
+            def transaction(self, key):
+                threads.append(threading.get_ident())
+                return super().transaction(key)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            async def run():
+                tdx = tdxlib.tdx_async_integration.TDXAsyncIntegration(config=dict(tdx_fakes.CONFIG))
+                tdx.rate_limiter.store = RecordingStore(os.path.join(tmp, 'rate_limit.db'))
+                await tdx._rate_limit('/tickets/1')
+                await tdx._update_rate_limit(types.SimpleNamespace(headers=rate_limit_headers(60, 10, 10)),
+                                             '/tickets/1')
+                await tdx.close()
+                return threading.get_ident()
+
+            loop_thread = asyncio.run(run())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxRateLimitTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+try:
+    import httpx
+    import tdxlib.tdx_async_integration
+except ImportError:
+    httpx = None
+
+import tdxlib.tdx_integration
+from tdxlib import tdx_replay
+
+import tdx_fakes
+
+
+def fake_tdx() -> tdx_fakes.FakeTransport:
+    """Answers like TDX: a token from /auth, and numbered responses with rate-limit headers for anything else."""
+    def respond(method, url, kwargs):
+        calls = transport.auth_calls + len(transport.calls)
+        return tdx_replay.build_response(url, 200, json.dumps({'Call': calls}).encode('utf-8'), {
+            'Content-Type': 'application/json',
+            'Set-Cookie': 'session=abc',
+            'X-RateLimit-Limit': '6000',
+            'X-RateLimit-Remaining': str(6000 - calls),
+            'Date': time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime()),
+            'X-RateLimit-Reset': time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 60))
+        })
+
+    transport = tdx_fakes.FakeTransport(respond=respond)
+    return transport
+
+
+class TdxReplayTesting(unittest.TestCase):
+    """Test cases for recording and replaying TDX traffic. These run offline."""
+
+    config = tdx_fakes.CONFIG
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def record(self, filename: str) -> str:
+        path = os.path.join(self.directory.name, filename)
+        tdx = tdx_fakes.make_integration(tdx_replay.TDXRecordingTransport(fake_tdx(), path), authenticated=False)
+        self.assertTrue(tdx.auth(use_cache=False))
+        tdx.make_get('/12/tickets/1')
+        tdx.make_get('/12/tickets/1')
+        tdx.make_post('/12/tickets/search', {'SearchText': 'printer', 'MaxResults': 5})
+        tdx.close()
+        return path
+
+    def test_recording_has_no_credentials(self):
+        """Test that recordings leave out passwords, tokens and headers that aren't needed."""
+        path = self.record('session.jsonl')
+        with open(path) as recording:
+            text = recording.read()
+        self.assertNotIn('secret', text)
+        self.assertNotIn('Bearer', text)
+        self.assertNotIn('Set-Cookie', text)
+        entries = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual([entry['url'] for entry in entries],
+                         ['/auth', '/12/tickets/1', '/12/tickets/1', '/12/tickets/search'])
+        self.assertEqual(entries[0]['content'], tdx_replay.PLACEHOLDER_TOKEN)
+        self.assertEqual(entries[1]['headers']['X-RateLimit-Remaining'], '5998')
+
+    def test_replay(self):
+        """Test that an integration set up with replay_file authenticates and gets recorded answers, in order."""
+        path = self.record('session.jsonl.gz')
+        tdx = tdxlib.tdx_integration.TDXIntegration(config=dict(self.config, replay_file=path))
+        self.assertIsInstance(tdx.transport, tdx_replay.TDXReplayTransport)
+        self.assertEqual(tdx.make_get('/12/tickets/1'), {'Call': 2})
+        self.assertEqual(tdx.make_get('/12/tickets/1'), {'Call': 3})
+        self.assertEqual(tdx.make_get('/12/tickets/1'), {'Call': 3})
+        # Bodies match even when encoded differently
+        self.assertEqual(tdx.make_post('/12/tickets/search', {'MaxResults': 5, 'SearchText': 'printer'}),
+                         {'Call': 4})
+        self.assertIsNone(tdx.make_get('/12/tickets/2'))
+        self.assertEqual(tdx.transport.misses, 1)
+        self.assertEqual(tdx.rate_limit_state()['limit'], 6000)
+
+    def test_simulated_rate_limit(self):
+        """Test that replays can simulate a rate limit, answering 429 once it's used up."""
+        replay = tdx_replay.TDXReplayTransport(self.record('session.jsonl'), rate_limit=2, strict=True)
+        url = 'https://tdx.example.edu/TDWebApi/api/12/tickets/1'
+        first = replay.request('GET', url)
+        self.assertEqual(first.headers['X-RateLimit-Remaining'], '1')
+        self.assertEqual(replay.request('GET', url).status_code, 200)
+        self.assertEqual(replay.request('GET', url).status_code, 429)
+        with self.assertRaises(LookupError):
+            replay.request('GET', url + '?other=1')
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_async_record_and_replay(self):
+        """Test that async integrations record sessions in the same format, and replay them."""
+        path = os.path.join(self.directory.name, 'async.jsonl')
+        answered = []
+
+        def answer(request):
+            answered.append(request.url.path)
+            if request.url.path.endswith('/auth'):
+                return httpx.Response(200, content=tdx_fakes.make_token().encode('utf-8'))
+            return httpx.Response(200, json={'Call': len(answered)})
+
+        async def record():
+            tdx = tdxlib.tdx_async_integration.TDXAsyncIntegration(config=dict(self.config))
+            await tdx.client.aclose()
+            tdx.client = httpx.AsyncClient(transport=tdx_replay.TDXAsyncRecordingTransport(
+                httpx.MockTransport(answer), path))
+            await tdx.make_get('/12/tickets/1')
+            await tdx.make_post('/12/tickets/search', {'SearchText': 'printer'})
+            await tdx.close()
+
+        async def replay():
+            tdx = tdxlib.tdx_async_integration.TDXAsyncIntegration(config=dict(self.config, replay_file=path))
+            try:
+                return [await tdx.make_get('/12/tickets/1'),
+                        await tdx.make_post('/12/tickets/search', {'SearchText': 'printer'}),
+                        await tdx.make_get('/12/tickets/2')]
+            finally:
+                await tdx.close()
+
+        asyncio.run(record())
+        with open(path) as recording:
+            entries = [json.loads(line) for line in recording]
+        self.assertEqual([entry['url'] for entry in entries], ['/auth', '/12/tickets/1', '/12/tickets/search'])
+        self.assertEqual(entries[0]['content'], tdx_replay.PLACEHOLDER_TOKEN)
+        self.assertEqual(entries[2]['body'], '{"SearchText":"printer"}')
+        self.assertEqual(asyncio.run(replay()), [{'Call': 2}, {'Call': 3}, None])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxReplayTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
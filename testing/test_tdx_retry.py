@@ -0,0 +1,79 @@
+import unittest
+
+import requests
+
+from tdxlib import tdx_retry
+
+import tdx_fakes
+from tdx_fakes import make_response
+
+
+class TdxRetryTesting(unittest.TestCase):
+    """Test cases for the TDX retry policy. These run offline."""
+
+    def setUp(self):
+        self.tdx = tdx_fakes.make_integration(retries=2, retry_backoff=0.001)
+
+    def test_parse_retry_after(self):
+        """Test parsing both forms of the Retry-After header."""
+        self.assertEqual(tdx_retry.parse_retry_after('7'), 7)
+        self.assertEqual(tdx_retry.parse_retry_after('Thu, 01 Jan 1970 00:00:00 GMT'), 0)
+        self.assertIsNone(tdx_retry.parse_retry_after('soon'))
+
+    def test_writes_only_retried_when_safe(self):
+        """Test which failures each method is allowed to retry."""
+        policy = tdx_retry.TDXRetryPolicy()
+        self.assertTrue(policy.is_retryable('GET', status_code=503))
+        self.assertTrue(policy.is_retryable('PUT', error_kind=tdx_retry.NETWORK_ERROR))
+        self.assertTrue(policy.is_retryable('POST', status_code=429))
+        self.assertTrue(policy.is_retryable('POST', error_kind=tdx_retry.CONNECT_ERROR))
+        self.assertFalse(policy.is_retryable('POST', status_code=503))
+        self.assertFalse(policy.is_retryable('PATCH', error_kind=tdx_retry.NETWORK_ERROR))
+        self.assertFalse(policy.is_retryable('GET', status_code=404))
+        self.assertTrue(tdx_retry.TDXRetryPolicy(retry_writes=True).is_retryable('POST', status_code=503))
+
+    def test_backoff_grows_and_is_capped(self):
+        """Test that backoff delays stay within the exponential envelope."""
+        policy = tdx_retry.TDXRetryPolicy(backoff=1, backoff_max=5)
+        for attempt in range(6):
+            self.assertLessEqual(policy.backoff_delay(attempt), min(5, 2 ** attempt))
+        self.assertEqual(policy.next_delay('GET', 0, 429, {'Retry-After': '3'}), 3)
+        self.assertIsNone(policy.next_delay('GET', 3, 503))
+
+    def test_get_retries_transient_failures(self):
+        """Test that a GET is retried after a 503 and a dropped connection."""
+        self.tdx.transport = tdx_fakes.FakeTransport([
+            make_response(503),
+            requests.exceptions.ConnectionError('reset'),
+            make_response(200, '{"ID": 1}')
+        ])
+        self.assertEqual(self.tdx.make_get('/accounts/1'), {'ID': 1})
+        self.assertEqual(len(self.tdx.transport.calls), 3)
+
+    def test_get_gives_up(self):
+        """Test that retries stop after the configured count, and that client errors aren't retried."""
+        self.tdx.transport = tdx_fakes.FakeTransport([make_response(500)] * 3)
+        self.assertIsNone(self.tdx.make_get('/accounts/1'))
+        self.assertEqual(len(self.tdx.transport.calls), 3)
+        self.tdx.transport = tdx_fakes.FakeTransport([make_response(404)])
+        self.assertIsNone(self.tdx.make_get('/accounts/1'))
+        self.assertEqual(len(self.tdx.transport.calls), 1)
+
+    def test_post_not_retried_after_server_error(self):
+        """Test that a POST is retried after a 429, but not after a 500 the server may have acted on."""
+        self.tdx.transport = tdx_fakes.FakeTransport([make_response(429), make_response(200, '{"ID": 2}')])
+        self.assertEqual(self.tdx.make_post('/accounts', {'Name': 'x'}), {'ID': 2})
+        self.tdx.transport = tdx_fakes.FakeTransport([make_response(500), make_response(200)])
+        self.assertIsNone(self.tdx.make_post('/accounts', {'Name': 'x'}))
+        self.assertEqual(len(self.tdx.transport.calls), 1)
+
+    def test_per_call_retries(self):
+        """Test overriding the number of retries for one call."""
+        self.tdx.transport = tdx_fakes.FakeTransport([make_response(503), make_response(200)])
+        self.assertIsNone(self.tdx.make_put('/accounts/1', {}, retries=0))
+        self.assertEqual(len(self.tdx.transport.calls), 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxRetryTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import tdxlib.tdx_integration
+from tdxlib import tdx_single_flight
+
+import tdx_fakes
+
+
+class TdxSingleFlightTesting(unittest.TestCase):
+    """Test cases for coalescing identical concurrent GETs. These run offline."""
+
+    def make_integration(self, **config) -> tdxlib.tdx_integration.TDXIntegration:
+        transport = tdx_fakes.FakeTransport(body='{"ID": 7, "Rooms": [{"ID": 1}]}', delay=0.2)
+        return tdx_fakes.make_integration(transport, **config)
+
+    def get_concurrently(self, tdx, urls: list) -> list:
+        results = [None] * len(urls)
+
+        def get(index):
+            results[index] = tdx.make_get(urls[index])
+
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(len(urls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_duplicate_gets_coalesced(self):
+        """Test that identical concurrent GETs send one request, and each caller gets its own copy."""
+        tdx = self.make_integration()
+        results = self.get_concurrently(tdx, ['/locations/7'] * 8 + ['/locations/8'] * 2)
+        self.assertEqual(len(tdx.transport.calls), 2)
+        self.assertEqual(tdx.transport.count(tdx.config.api_url + '/locations/7'), 1)
+        self.assertEqual(tdx.transport.count(tdx.config.api_url + '/locations/8'), 1)
+        self.assertTrue(all(result == {'ID': 7, 'Rooms': [{'ID': 1}]} for result in results))
+        self.assertEqual(len({id(result['Rooms']) for result in results}), len(results))
+        self.assertEqual(tdx.single_flight.coalesced, 8)
+        # Once the first request finishes, the next GET goes to TDX again
+        tdx.make_get('/locations/7')
+        self.assertEqual(tdx.transport.count(tdx.config.api_url + '/locations/7'), 2)
+
+    def test_coalescing_can_be_turned_off(self):
+        """Test that coalesce_gets = false sends every GET."""
+        tdx = self.make_integration(coalesce_gets='false')
+        self.get_concurrently(tdx, ['/locations/7'] * 3)
+        self.assertEqual(tdx.transport.count(tdx.config.api_url + '/locations/7'), 3)
+
+    def test_leader_error_shared(self):
+        """Test that followers see the leader's exception, and that the key is freed afterwards."""
+        flight = tdx_single_flight.TDXSingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError('boom')
+
+        def follow():
+            started.wait()
+            try:
+                flight.do('key', fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        with self.assertRaises(RuntimeError):
+            flight.do('key', fail)
+        follower.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(flight.do('key', lambda: 5), 5)
+
+    def test_async_duplicate_gets_coalesced(self):
+        """Test that identical concurrent awaits of one coroutine function only run it once."""
+        calls = []
+
+        async def fetch(url):
+            calls.append(url)
+            await asyncio.sleep(0.05)
+            return {'URL': url}
+
+        async def main():
+            flight = tdx_single_flight.TDXAsyncSingleFlight()
+            return await asyncio.gather(*[flight.do(url, fetch, url) for url in ['/a', '/a', '/a', '/b']])
+
+        results = asyncio.run(main())
+        self.assertEqual(calls, ['/a', '/b'])
+        self.assertEqual(results, [{'URL': '/a'}] * 3 + [{'URL': '/b'}])
+        self.assertIsNot(results[0], results[1])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxSingleFlightTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,101 @@
+import json
+import unittest
+
+import tdxlib.tdx_api_exceptions
+from tdxlib import tdx_stream
+
+import tdx_fakes
+
+
+def streaming_transport(body: bytes) -> tdx_fakes.FakeTransport:
+    """Answers every request with the same body, read from a file-like object the way a streamed response is."""
+    def respond(method, url, kwargs):
+        return tdx_fakes.make_response(content=body, stream=True)
+
+    return tdx_fakes.FakeTransport(respond=respond)
+
+
+class TdxStreamTesting(unittest.TestCase):
+    """Test cases for incremental JSON array parsing. These run offline."""
+
+    rows = [
+        {'ID': 1, 'Title': 'Has "quotes", commas, and [brackets]', 'Tags': ['a', 'b']},
+        {'ID': 2, 'Title': 'Escaped \\ backslash and é', 'Nested': {'Rows': [1, 2, {'x': None}]}},
+        {'ID': 3, 'Title': '}]', 'Empty': []}
+    ]
+
+    def chunked(self, data: bytes, size: int):
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_array_any_chunk_size(self):
+        """Test that elements come out the same no matter where the chunk boundaries fall."""
+        body = json.dumps(self.rows).encode('utf-8')
+        for size in (1, 2, 3, 7, 64, len(body)):
+            self.assertEqual(list(tdx_stream.iter_json_array(self.chunked(body, size))), self.rows)
+
+    def test_array_under_key(self):
+        """Test streaming the array under a key, skipping lookalike keys in strings and nested objects."""
+        body = json.dumps({
+            'Name': 'DataRows',
+            'Meta': {'DataRows': ['not', 'these']},
+            'DataRows': self.rows,
+            'After': [4, 5]
+        }).encode('utf-8')
+        for size in (1, 5, len(body)):
+            elements = list(tdx_stream.iter_json_array(self.chunked(body, size), key='DataRows'))
+            self.assertEqual(elements, self.rows)
+        self.assertEqual(list(tdx_stream.iter_json_array([b'{"DataRows": null}'], key='DataRows')), [])
+        self.assertEqual(list(tdx_stream.iter_json_array([b'[]'])), [])
+
+    def test_elements_yielded_before_end(self):
+        """Test that an element is yielded as soon as it is complete, and that the buffer doesn't grow."""
+        stream = tdx_stream.TDXJSONArrayStream()
+        self.assertEqual(stream.feed(b'[{"ID": 1}, {"ID"'), [{'ID': 1}])
+        self.assertLess(len(stream._buffer), 10)
+        self.assertEqual(stream.feed(b': 2}'), [])
+        self.assertEqual(stream.feed(b']'), [{'ID': 2}])
+        self.assertTrue(stream.done)
+
+    def test_truncated_stream_raises(self):
+        """Test that a response cut off partway through the array isn't mistaken for a complete one."""
+        with self.assertRaises(ValueError):
+            list(tdx_stream.iter_json_array([b'[{"ID": 1}, {"ID": 2']))
+
+    def test_make_post_stream(self):
+        """Test that make_post(stream=True) streams the response through the transport and decodes elements."""
+        tdx = tdx_fakes.make_integration(streaming_transport(json.dumps(self.rows).encode('utf-8')),
+                                         stream_chunk_size=4)
+        results = tdx.make_post('/1/tickets/search', {'SearchText': 'x'}, stream=True)
+        self.assertTrue(tdx.transport.calls[0][2]['stream'])
+        self.assertEqual(next(results), self.rows[0])
+        self.assertEqual(list(results), self.rows[1:])
+        tdx.transport = streaming_transport(b'[{"ID": 1}, {"I')
+        with self.assertRaises(tdxlib.tdx_api_exceptions.TdxApiHTTPError):
+            list(tdx.make_get('/1/assets', stream=True))
+
+    def test_stream_holds_slot_until_closed(self):
+        """Test that a stream keeps its concurrency slot until it's read, closed or dropped, even if never read."""
+        tdx = tdx_fakes.make_integration(streaming_transport(json.dumps(self.rows).encode('utf-8')))
+        results = tdx.make_get('/1/assets', stream=True)
+        self.assertEqual(tdx.concurrency.in_flight, 1)
+        self.assertEqual(list(results), self.rows)
+        self.assertEqual(tdx.concurrency.in_flight, 0)
+
+        # Never iterated, then closed
+        results = tdx.make_get('/1/assets', stream=True)
+        results.close()
+        self.assertTrue(tdx.transport.responses[-1].raw.closed)
+        self.assertEqual(tdx.concurrency.in_flight, 0)
+
+        # Never iterated, then thrown away
+        tdx.make_get('/1/assets', stream=True)
+        self.assertTrue(tdx.transport.responses[-1].raw.closed)
+        self.assertEqual(tdx.concurrency.in_flight, 0)
+        with tdx.make_post('/1/tickets/search', {}, stream=True) as results:
+            self.assertEqual(next(results), self.rows[0])
+        self.assertEqual(tdx.concurrency.in_flight, 0)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxStreamTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
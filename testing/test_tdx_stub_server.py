@@ -0,0 +1,84 @@
+import json
+import unittest
+
+import tdxlib.tdx_integration
+import tdxlib.tdx_ticket
+import tdxlib.tdx_ticket_integration
+from tdxlib import tdx_stub_server
+
+
+class TdxStubServerTesting(unittest.TestCase):
+    """Test cases for the local stub TDX API. These run offline, against a server on localhost."""
+
+    def setUp(self):
+        self.stub = tdx_stub_server.TDXStubServer(rate_limit=0).start()
+        self.addCleanup(self.stub.stop)
+
+    def test_synthetic_data(self):
+        """Test that the same seed makes the same data, and scale sets how much there is."""
+        first = tdx_stub_server.TDXStubData(scale=0.5, seed=3)
+        second = tdx_stub_server.TDXStubData(scale=0.5, seed=3)
+        self.assertEqual(len(first.tickets), 100)
+        self.assertEqual(first.tickets, second.tickets)
+        self.assertEqual(first.people, second.people)
+        self.assertEqual(len(tdx_stub_server.TDXStubData(scale=2).assets), 400)
+
+    def test_ticket_integration(self):
+        """Test that a ticket integration pointed at the stub authenticates, searches, reads and writes."""
+        tdx = tdxlib.tdx_ticket_integration.TDXTicketIntegration(config=self.stub.config())
+        self.addCleanup(tdx.close)
+        self.assertTrue(tdx.config.api_url.startswith(self.stub.url + '/TDWebApi/api'))
+        self.assertEqual(len(tdx.search_tickets('', max_results=5)), 5)
+        self.assertEqual(tdx.search_ticket_status('Open')['Name'], 'Open')
+        self.assertEqual(tdx.get_ticket_by_id(1000001).get_id(), 1000001)
+        self.assertTrue(tdx.get_ticket_feed(1000001))
+        ticket = tdxlib.tdx_ticket.TDXTicket(tdx, {
+            'TypeID': tdx.get_ticket_type_by_name_id('Service Request')['ID'],
+            'AccountID': tdx.get_account_by_name('Information Technology')['ID'],
+            'PriorityID': tdx.get_ticket_priority_by_name_id('Medium')['ID'],
+            'StatusID': tdx.search_ticket_status('New')['ID'],
+            'Title': 'Stub ticket'
+        })
+        created = tdx.create_ticket(ticket)
+        self.assertEqual(tdx.get_ticket_by_id(created.get_id()).get_attribute('Title'), 'Stub ticket')
+
+    def test_stub_transport(self):
+        """Test that an integration can be answered by the stub in-process, without a socket."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=0)
+        tdx = tdxlib.tdx_integration.TDXIntegration(config=stub.config(), skip_initial_auth=True)
+        self.addCleanup(tdx.close)
+        tdx.transport = tdx_stub_server.TDXStubTransport(stub)
+        self.assertTrue(tdx.auth(use_cache=False))
+        self.assertEqual(tdx.make_get('/12/tickets/1000003')['ID'], 1000003)
+        self.assertEqual(tdx.get_group_by_name('Support Group 2')['ID'], 60002)
+        self.assertEqual(stub.requests, 3)
+
+    def test_rate_limit_headers(self):
+        """Test that the stub sends rate-limit headers, answers 429 when over the limit, and checks tokens."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=2)
+        status, token, _ = stub.dispatch('POST', '/SBTDWebApi/api/auth', body=b'{"username": "a", "password": "b"}')
+        self.assertEqual(status, 200)
+        status, content, headers = stub.dispatch('GET', '/TDWebApi/api/12/tickets/1000001', 'Bearer ' + token.decode())
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content)['ID'], 1000001)
+        self.assertEqual(headers['X-RateLimit-Limit'], '2')
+        self.assertEqual(headers['X-RateLimit-Remaining'], '0')
+        self.assertIn('X-RateLimit-Reset', headers)
+        self.assertEqual(stub.dispatch('GET', '/TDWebApi/api/12/tickets/1000001', 'Bearer ' + token.decode())[0], 429)
+        self.assertEqual(self.stub.dispatch('GET', '/TDWebApi/api/12/tickets/1000001', 'Bearer made-up')[0], 401)
+
+    def test_rate_limit_seen_by_integration(self):
+        """Test that an integration reads the stub's rate-limit headers."""
+        stub = tdx_stub_server.TDXStubServer(rate_limit=100).start()
+        self.addCleanup(stub.stop)
+        tdx = tdxlib.tdx_integration.TDXIntegration(config=stub.config())
+        self.addCleanup(tdx.close)
+        self.assertEqual(len(tdx.search_people('a', max_results=3)), 3)
+        state = tdx.rate_limit_state()
+        self.assertEqual(state['limit'], 100)
+        self.assertEqual(state['remaining'], 98)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxStubServerTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import unittest
+
+import tdxlib.tdx_integration
+from tdxlib import tdx_token_cache
+
+import tdx_fakes
+
+
+class TdxTokenCacheTesting(unittest.TestCase):
+    """Test cases for the on-disk token cache. These run offline."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = dict(tdx_fakes.CONFIG, token_cache=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_integration(self) -> tdxlib.tdx_integration.TDXIntegration:
+        return tdx_fakes.make_integration(tdx_fakes.FakeTransport(), authenticated=False, **self.config)
+
+    def test_token_reused_across_instances(self):
+        """Test that a second integration reuses the first one's token instead of calling /auth."""
+        first = self.make_integration()
+        self.assertTrue(first.auth())
+        self.assertEqual(first.transport.auth_calls, 1)
+        second = self.make_integration()
+        self.assertEqual(second.make_get('/accounts'), {})
+        self.assertEqual(second.transport.auth_calls, 0)
+        self.assertEqual(second.config.token, first.config.token)
+
+    def test_cache_file_is_private(self):
+        """Test that the cache file can only be read by its owner, and that readable files are ignored."""
+        tdx = self.make_integration()
+        tdx.auth()
+        path = tdx.token_cache.path(tdx.config.api_url, tdx.config.username)
+        if os.name != 'posix':
+            self.skipTest("File permissions are only checked on POSIX systems")
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+        os.chmod(path, 0o644)
+        self.assertFalse(tdx.token_cache.load(tdx.config))
+
+    def test_expiring_token_not_reused(self):
+        """Test that a cached token close to expiry is ignored."""
+        tdx = self.make_integration()
+        tdx.config.token = tdx_fakes.make_token(30)
+        tdx.config.token_exp = time.time() + 30
+        tdx.token_cache.save(tdx.config)
+        self.assertFalse(tdx.token_cache.load(tdx.config))
+
+    def test_rejected_token_cleared(self):
+        """Test that a token TDX rejects is dropped from the cache and replaced."""
+        tdx = self.make_integration()
+        tdx.config.token = 'revoked'
+        tdx.config.token_exp = time.time() + 3600
+        tdx.token_cache.save(tdx.config)
+
+        def respond(method, url, kwargs):
+            if kwargs['headers']['Authorization'] == 'Bearer revoked':
+                return tdx_fakes.make_response(401, '')
+            return tdx_fakes.make_response()
+
+        tdx.transport.respond = respond
+        self.assertEqual(tdx.make_get('/accounts'), {})
+        self.assertEqual([response.status_code for response in tdx.transport.responses], [401, 200])
+        self.assertNotEqual(tdx.config.token, 'revoked')
+        self.assertTrue(tdx_token_cache.TDXTokenCache(self.directory.name).load(tdx.config))
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxTokenCacheTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
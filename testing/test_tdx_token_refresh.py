@@ -0,0 +1,50 @@
+import threading
+import time
+import unittest
+
+import tdxlib.tdx_integration
+
+import tdx_fakes
+
+
+class TdxTokenRefreshTesting(unittest.TestCase):
+    """Test cases for single-flight and background token renewal. These run offline."""
+
+    def make_integration(self, background: bool) -> tdxlib.tdx_integration.TDXIntegration:
+        # Authentication is slow, so callers overlap
+        return tdx_fakes.make_integration(tdx_fakes.FakeTransport(auth_delay=0.05), authenticated=False,
+                                          background_token_refresh=background, token_refresh_margin=60)
+
+    def test_concurrent_renewal_is_single_flight(self):
+        """Test that threads finding an expired token together only authenticate once."""
+        tdx = self.make_integration(background=False)
+        threads = [threading.Thread(target=tdx._check_auth_exp) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tdx.transport.auth_calls, 1)
+        self.assertIsNone(tdx.token_refresher)
+
+    def test_background_refresh(self):
+        """Test that the token is renewed ahead of expiry without any request waiting on it."""
+        tdx = self.make_integration(background=True)
+        tdx.config.token = 'old'
+        tdx.config.token_exp = time.time() + 61
+        tdx._start_token_refresh()
+        for _ in range(50):
+            if tdx.config.token != 'old':
+                break
+            time.sleep(0.1)
+        self.assertNotEqual(tdx.config.token, 'old')
+        self.assertEqual(tdx.transport.auth_calls, 1)
+        # The request path now only reads the fresh expiry
+        self.assertTrue(tdx._check_auth_exp())
+        self.assertEqual(tdx.transport.auth_calls, 1)
+        tdx.close()
+        self.assertIsNone(tdx.token_refresher)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxTokenRefreshTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
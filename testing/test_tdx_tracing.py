@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+from tdxlib import tdx_tracing
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+import tdx_fakes
+
+
+@tdx_tracing.traced
+class Sample:
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def outer(self):
+        return self.inner()
+
+    def inner(self):
+        tdx_tracing.set_attribute('tdx.cache_hit', True)
+        return 'done'
+
+    async def fetch(self):
+        await asyncio.sleep(0)
+        return self.inner()
+
+    def make_get(self):
+        return 'untraced'
+
+
+class TdxTracingTesting(unittest.TestCase):
+    """Test cases for tracing spans. These run offline."""
+
+    def test_disabled_by_default(self):
+        """Test that the default tracer records nothing and traced methods still work."""
+        tdx = tdx_fakes.make_integration(authenticated=False)
+        self.assertFalse(tdx.tracer.enabled)
+        self.assertEqual(Sample(tdx.tracer).outer(), 'done')
+        with self.assertRaises(ValueError):
+            tdx_fakes.make_integration(tracing='zipkin')
+
+    def test_nested_spans(self):
+        """Test that public methods open spans nested under their callers, in threads and coroutines alike."""
+        tracer = tdx_tracing.TDXMemoryTracer()
+        sample = Sample(tracer)
+        sample.outer()
+        asyncio.run(sample.fetch())
+        self.assertEqual(sample.make_get(), 'untraced')
+        names = [(span.name, span.parent.name if span.parent else None) for span in tracer.spans]
+        self.assertEqual(names, [('Sample.inner', 'Sample.outer'), ('Sample.outer', None),
+                                 ('Sample.inner', 'Sample.fetch'), ('Sample.fetch', None)])
+        self.assertEqual(tracer.spans[0].attributes, {'tdx.cache_hit': True})
+        self.assertEqual(Sample.outer.__name__, 'outer')
+
+    def test_http_spans(self):
+        """Test that HTTP calls are child spans with their endpoint template and status, and cache hits show."""
+        tdx = tdx_fakes.make_integration(tdx_fakes.FakeTransport(body='[{"UID": "1", "FullName": "Test Person"}]'))
+        tdx.tracer = tdx_tracing.TDXMemoryTracer()
+        tdx.search_people('test')
+        tdx.search_people('test')
+        first_http, first_call, second_call = tdx.tracer.spans
+        self.assertEqual(first_http.name, 'GET /people/lookup')
+        self.assertIs(first_http.parent, first_call)
+        self.assertEqual(first_http.attributes['http.response.status_code'], 200)
+        self.assertEqual(first_http.attributes['tdx.retries'], 0)
+        self.assertEqual(first_call.name, 'TDXIntegration.search_people')
+        self.assertFalse(first_call.attributes['tdx.cache_hit'])
+        self.assertTrue(second_call.attributes['tdx.cache_hit'])
+
+    @unittest.skipIf(TracerProvider is None, "OpenTelemetry tracing needs opentelemetry-api and opentelemetry-sdk")
+    def test_opentelemetry(self):
+        """Test that spans go to an OpenTelemetry tracer, nested, with attributes set along the way."""
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        Sample(tdx_tracing.TDXOpenTelemetryTracer(provider.get_tracer('tdxlib'))).outer()
+        inner, outer = exporter.get_finished_spans()
+        self.assertEqual(inner.name, 'Sample.inner')
+        self.assertEqual(inner.parent.span_id, outer.context.span_id)
+        self.assertEqual(dict(inner.attributes), {'tdx.cache_hit': True})
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxTracingTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)
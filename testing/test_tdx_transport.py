@@ -0,0 +1,67 @@
+import json
+import unittest
+
+try:
+    import httpx
+    import h2
+except ImportError:
+    httpx = None
+
+import tdxlib.tdx_integration
+import tdxlib.tdx_transport
+
+import tdx_fakes
+
+
+@unittest.skipIf(httpx is None, "The http2 transport needs httpx and h2")
+class TdxHTTP2TransportTesting(unittest.TestCase):
+    """Test cases for the HTTP/2 transport, with httpx's mock transport standing in for TDX. These run offline."""
+
+    def make_integration(self, handler) -> tdxlib.tdx_integration.TDXIntegration:
+        tdx = tdx_fakes.make_integration(transport='http2', retry_backoff='0')
+        self.assertIsInstance(tdx.transport, tdxlib.tdx_transport.TDXHTTP2Transport)
+        tdx.transport.client.close()
+        tdx.transport.client = httpx.Client(transport=httpx.MockTransport(handler))
+        return tdx
+
+    def test_requests_and_responses_translated(self):
+        """Test that bodies, headers and status codes make it through the transport in both directions."""
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            if request.method == 'GET':
+                return httpx.Response(200, json=[{'ID': 1}, {'ID': 2}], headers={'X-RateLimit-Remaining': '50'})
+            return httpx.Response(201, json=json.loads(request.content))
+
+        tdx = self.make_integration(handler)
+        self.assertEqual(tdx.make_post('/accounts', {'Name': 'Ünïcode'}), {'Name': 'Ünïcode'})
+        self.assertEqual(seen[0].headers['Authorization'], 'Bearer ' + tdx.config.token)
+        self.assertEqual(tdx.make_get('/accounts'), [{'ID': 1}, {'ID': 2}])
+        self.assertEqual(list(tdx.make_get('/locations', stream=True)), [{'ID': 1}, {'ID': 2}])
+
+    def test_errors_retried(self):
+        """Test that server and connection errors from httpx are retried like requests errors."""
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise httpx.ConnectError("Connection refused", request=request)
+            if len(attempts) == 2:
+                return httpx.Response(503)
+            return httpx.Response(200, json={'ID': 1})
+
+        tdx = self.make_integration(handler)
+        self.assertEqual(tdx.make_get('/accounts/1'), {'ID': 1})
+        self.assertEqual(len(attempts), 3)
+
+    def test_unknown_transport(self):
+        """Test that a misspelled transport name is reported."""
+        with self.assertRaises(ValueError):
+            tdx_fakes.make_integration(transport='http3')
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TdxHTTP2TransportTesting)
+    unittest.TextTestRunner(verbosity=2).run(suite)